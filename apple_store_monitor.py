@@ -6,11 +6,12 @@ Apple Store 库存监控器 - 优化版（随机打散策略）
 
 import requests
 import json
-import time
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime
 import random
+from rate_limiter import create_rate_limiter
+from timer_core import wait_for_stop
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -31,6 +32,7 @@ class AppleStoreMonitor:
         self.stop_event = stop_event
         self.session = requests.Session()
         self.stock_history = {}
+        self.rate_limiter = create_rate_limiter(config, name='CN')
         
         # API endpoints
         self.api_url = 'https://www.apple.com.cn/shop/retail/pickup-message'
@@ -65,16 +67,8 @@ class AppleStoreMonitor:
             return {}
     
     def _interruptible_sleep(self, seconds: float):
-        """可中断的sleep"""
-        if not self.stop_event:
-            time.sleep(seconds)
-            return
-        
-        end_time = time.time() + seconds
-        while time.time() < end_time:
-            if self.stop_event.is_set():
-                return
-            time.sleep(min(0.1, end_time - time.time()))
+        """可中断的sleep（收到停止信号时立即返回）"""
+        wait_for_stop(self.stop_event, seconds)
     
     def check_product_availability(self, part_number: str, store_number: str) -> Dict:
         """检查单个产品在单个门店的库存"""
@@ -200,12 +194,12 @@ class AppleStoreMonitor:
         logger.info(f"📦 {len(products)} 个产品 × {len(target_stores)} 个门店")
         logger.info(f"{'='*80}\n")
         
-        # 步骤3: 逐个发送请求，随机间隔
+        # 步骤3: 逐个发送请求，节奏由限速器控制
         error_count = 0  # 连续错误计数
         
         for i, combo in enumerate(combinations, 1):
-            # 检查是否收到停止信号
-            if self.stop_event and self.stop_event.is_set():
+            # 等待限速器放行（收到停止信号时立即返回）
+            if not self.rate_limiter.acquire(self.stop_event):
                 logger.info("检测到停止信号，中断查询")
                 break
             
@@ -247,15 +241,6 @@ class AppleStoreMonitor:
             
             except Exception as e:
                 logger.error(f"查询失败 {product_name} @ {store_number}: {e}")
-            
-            # 随机延迟（最后一个不延迟）
-            if i < len(combinations):
-                # 随机延迟：1.5-2.5秒（正态分布更自然）
-                delay = random.gauss(2.0, 0.3)  # 均值2.0秒，标准差0.3
-                delay = max(1.5, min(2.5, delay))  # 限制在1.5-2.5秒
-                
-                logger.debug(f"⏳ [{i}/{len(combinations)}] 等待 {delay:.3f}秒 后发送下一个请求...")
-                self._interruptible_sleep(delay)
         
         logger.info(f"\n✅ 本轮完成，共检查 {len(combinations)} 个组合")
         logger.info(f"📊 结果: {len(results)} 个产品")
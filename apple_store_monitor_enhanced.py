@@ -9,12 +9,127 @@ Apple Store 库存监控核心模块 - 增强版
 import requests
 import time
 import json
-from typing import Dict, List, Optional, Tuple
+import random
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 from logger_config import setup_logger
+from coverage_planner import CoveragePlanner
+from rate_limiter import create_rate_limiter, AdaptiveRateController, is_throttle_status
+from circuit_breaker import get_circuit_breaker
+from response_cache import get_response_cache, split_cached
+from response_decoder import decode_json, iter_store_availability
+from result_model import StoreInfo, StoreStock, ProductStock
+from priority_scheduler import PriorityScheduler
+from restock_learner import RestockLearner
+from restock_profile import RestockProfile
+from rolling_scheduler import RollingScheduler, unit_key
+from rate_calculator import plan_staleness, staleness_target
+from timer_core import wait_for_stop
+from burst_confirm import BurstConfirm
+from transition_log import TransitionLog
+from history_store import SQLiteHistoryStore
+from history_exporter import JSONLHistoryExporter, iter_transitions
+from availability_matrix import AvailabilityMatrix
+from checkpoint import MonitorCheckpoint
 
 logger = setup_logger()
 
+# 尝试导入异步HTTP客户端（异步引擎需要）
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+def stores_for_product(product: Dict, target_stores: List[str]) -> List[str]:
+    """该商品要查询的门店（商品配置了 stores 时只保留其中的门店）"""
+    only = product.get('stores')
+    if not only:
+        return target_stores
+    only = set(only)
+    return [store_number for store_number in target_stores if store_number in only]
+
+
+def build_combinations(products: List[Dict], target_stores: List[str],
+                       per_product_stores: bool = True) -> List[Dict]:
+    """
+    生成所有"产品-门店"组合
+    
+    Args:
+        products: 商品列表
+        target_stores: 门店编号列表
+        per_product_stores: 是否按商品的 stores 字段只生成该商品关注的门店
+        
+    Returns:
+        组合列表
+    """
+    combinations = []
+    for product in products:
+        part_number = product.get('part_number')
+        if not part_number:
+            logger.warning(f"商品缺少 part_number: {product}")
+            continue
+        
+        stores = stores_for_product(product, target_stores) if per_product_stores else target_stores
+        for store_number in stores:
+            combinations.append({
+                'product': product,
+                'part_number': part_number,
+                'product_name': product.get('name', part_number),
+                'store_number': store_number
+            })
+    
+    return combinations
+
+
+def build_query_units(combinations: List[Dict], config: dict, shuffle: bool = True) -> List[Dict]:
+    """
+    将"产品-门店"组合打包成请求单元并随机打散（每轮都不同）
+    
+    普通模式下每个组合一个请求；批量模式（batch_parts）下同一门店的型号
+    按 max_parts_per_request 分组，一次请求查询多个型号。
+    监控器和 rate_calculator.py 的离线规划共用，保证两者的请求单元一致
+    
+    Args:
+        combinations: 组合列表
+        config: 配置字典（读取 batch_parts、max_parts_per_request）
+        shuffle: 是否随机打散（连续模式需要固定的分组，传 False）
+        
+    Returns:
+        请求单元列表，每个单元包含 store_number 和 combos
+    """
+    if not config.get('batch_parts', False):
+        units = [{'store_number': combo['store_number'], 'combos': [combo]}
+                 for combo in combinations]
+        if shuffle:
+            random.shuffle(units)
+        return units
+    
+    # 按门店分组（同一门店内型号去重）
+    by_store = {}
+    for combo in combinations:
+        store_combos = by_store.setdefault(combo['store_number'], {})
+        store_combos.setdefault(combo['part_number'], combo)
+    
+    max_parts = max(1, int(config.get('max_parts_per_request', 6)))
+    units = []
+    for store_number, store_combos in by_store.items():
+        combos = list(store_combos.values())
+        if shuffle:
+            random.shuffle(combos)
+        for start in range(0, len(combos), max_parts):
+            units.append({
+                'store_number': store_number,
+                'combos': combos[start:start + max_parts]
+            })
+    
+    if shuffle:
+        random.shuffle(units)
+    return units
+
 
 class AppleStoreMonitorEnhanced:
     """Apple Store 库存监控器 - 增强版"""
@@ -60,31 +175,151 @@ class AppleStoreMonitorEnhanced:
         
         self.session = self._create_session()
         self.stores = self._load_stores()
-        self.stock_history = {}
+        self.store_refs: Dict[str, StoreInfo] = {}  # 门店元数据（所有结果共享引用）
+        self.history = TransitionLog.from_config(config, self.region)  # 只记录库存状态变化
+        self.history_store = SQLiteHistoryStore.from_config(config)
+        if self.history_store is not None:
+            # 接着数据库中的当前状态判断变化，重启后不会重复记录"首次观测"
+            self.history.current.update(self.history_store.load_current(self.region))
+        self.history_exporter = JSONLHistoryExporter.from_config(config, self.region)  # 流式追加 JSONL
+        self.availability = AvailabilityMatrix.from_config(config)  # 型号 × 门店 状态矩阵（需要 numpy）
+        self.round_changes: List = []  # 最近一次比较状态矩阵得到的变化
+        self.coverage_planner = CoveragePlanner()
+        self.rate_limiter = create_rate_limiter(config, name=self.region,
+                                                budget_key=self.region_config['api_url'])
+        self.pacing = AdaptiveRateController.from_config(config, self.rate_limiter, self.region)
+        self.circuit_breaker = get_circuit_breaker(config, self.region)
+        self.response_cache = get_response_cache(config)
+        self.scheduler = PriorityScheduler.from_config(config)
+        self.restock_learner = RestockLearner.from_config(config)
+        self.restock_profile = RestockProfile.from_config(config)
+        self.rolling_scheduler = RollingScheduler.from_config(config)
+        self.staleness_sla = config.get('staleness_sla') if (config.get('staleness_sla') or {}).get('enabled') else None
+        self.staleness_plan: Optional[Dict] = None
+        self.burst_confirm = BurstConfirm.from_config(config, self.region, self.stores)
+        self._pending_config: Optional[dict] = None
+        self._config_lock = threading.Lock()
+        
+        # 从检查点热启动：恢复各组合的状态、请求单元到期时间和响应缓存
+        self.checkpoint = MonitorCheckpoint.from_config(config, self.region)
+        if self.checkpoint is not None:
+            self.checkpoint.restore(self)
+        if self.history.current:
+            # 已知的状态作为状态矩阵和突发确认的比较基准，重启后第一轮只处理真正的变化
+            states = {key: entry[0] for key, entry in self.history.current.items()}
+            if self.availability is not None:
+                self.availability.restore_states(states)
+            if self.burst_confirm is not None:
+                self.burst_confirm.restore_states(states)
+        if self.restock_learner is not None:
+            self._warm_start_learner()
+    
+    def _warm_start_learner(self):
+        """用之前运行留下的历史（SQLite 数据库或 JSONL 导出文件）热启动补货学习"""
+        transitions = self.history.transitions
+        try:
+            if self.history_store is not None:
+                transitions = self.history_store.load_transitions(self.region)
+            elif self.history_exporter is not None:
+                # 轮转后的文件在前，当前文件在后（按时间顺序）
+                transitions = [transition for path in self.history_exporter.iter_all_paths()
+                               for transition in iter_transitions(path) if transition[1] == self.region]
+        except Exception as e:
+            logger.warning(f"读取历史记录失败，补货学习从先验开始: {e}")
+        self.restock_learner.learn_from_transitions(transitions, self.history.current)
     
     def _interruptible_sleep(self, seconds: float):
         """
-        可中断的sleep，每0.1秒检查一次stop_event
+        可中断的sleep：一直睡到时间结束，收到停止信号时立即返回
+        
+        stop_event 为 WakeupEvent 时，调度队列加入新任务（notify）也会提前返回
         
         Args:
             seconds: 睡眠时间（秒）
         """
-        if not self.stop_event:
-            time.sleep(seconds)
-            return
+        wait_for_stop(self.stop_event, seconds)
+    
+    def _notify_waiters(self):
+        """唤醒正在等待的监控循环（调度有变化，需要重新计算下一次到期时间）"""
+        if hasattr(self.stop_event, 'notify'):
+            self.stop_event.notify()
+    
+    def get_targets(self) -> Tuple[List[Dict], Optional[List[str]]]:
+        """当前配置的 (商品列表, 门店编号列表)，all_stores 时门店列表为 None"""
+        stores = None if self.config.get('all_stores', False) else self.config.get('target_stores', [])
+        return self.config.get('target_products', []), stores
+    
+    def request_config_reload(self, new_config: dict):
+        """
+        登记新配置（可在任意线程调用，例如配置文件监视线程）
         
-        # 分成小段sleep，每段检查stop_event
-        end_time = time.time() + seconds
-        while time.time() < end_time:
-            if self.stop_event.is_set():
-                return
-            time.sleep(min(0.1, end_time - time.time()))
+        监控循环在下一个安全时机调用 apply_pending_config() 应用，
+        等待中的循环会被立即唤醒
+        """
+        with self._config_lock:
+            self._pending_config = new_config
+        self._notify_waiters()
+    
+    def has_pending_config(self) -> bool:
+        """是否有尚未应用的新配置"""
+        return self._pending_config is not None
+    
+    def apply_pending_config(self) -> bool:
+        """
+        应用已登记的新配置（在监控线程中调用）
         
-    def _create_session(self) -> requests.Session:
-        """创建HTTP会话"""
-        session = requests.Session()
+        Returns:
+            是否应用了新配置
+        """
+        with self._config_lock:
+            new_config, self._pending_config = self._pending_config, None
+        if new_config is None:
+            return False
         
-        headers = {
+        self._apply_config(new_config)
+        return True
+    
+    def _apply_config(self, new_config: dict):
+        """
+        在运行中切换到新配置
+        
+        self.config 原地更新，调用方持有的同一个配置字典也随之生效；
+        连续模式下新增的组合立即加入调度队列，移除的组合从队列中删除。
+        历史记录、响应缓存、会话连接池、限速器和节奏状态都保留，区域不能在运行中切换
+        """
+        if new_config.get('region', self.region) != self.region:
+            logger.warning(f"⚠️  运行中不能切换区域（{self.region} → {new_config.get('region')}），忽略该项")
+        
+        old_products, old_stores = self.get_targets()
+        old_parts = {product['part_number'] for product in old_products}
+        old_store_set = set(old_stores) if old_stores is not None else set(self.stores)
+        
+        self.config.clear()
+        self.config.update(new_config)
+        self.config['region'] = self.region
+        
+        products, stores = self.get_targets()
+        new_parts = {product['part_number'] for product in products}
+        new_store_set = set(stores) if stores is not None else set(self.stores)
+        logger.info(f"🔁 新配置已生效 - 商品 {len(new_parts)} 个"
+                    f"（+{len(new_parts - old_parts)} / -{len(old_parts - new_parts)}），"
+                    f"门店 {len(new_store_set)} 个（+{len(new_store_set - old_store_set)} / "
+                    f"-{len(old_store_set - new_store_set)}）")
+        
+        sla_config = new_config.get('staleness_sla') or {}
+        self.staleness_sla = sla_config if sla_config.get('enabled') else None
+        if self.staleness_sla is None:
+            self.staleness_plan = None
+        
+        if self.rolling_scheduler is not None:
+            added, removed = self.sync_continuous_schedule(products, stores)
+            logger.info(f"🔄 调度队列已更新: 新增 {added} 个请求单元，移除 {removed} 个")
+        elif self.staleness_sla is not None:
+            self.plan_staleness(products, stores)
+    
+    def _build_headers(self) -> Dict:
+        """构建请求头（同步/异步会话共用）"""
+        return {
             'User-Agent': self.config.get('user_agent', 
                 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'),
             'Accept': 'application/json',
@@ -95,7 +330,11 @@ class AppleStoreMonitorEnhanced:
             'Connection': 'keep-alive',
             'Cache-Control': 'no-cache',
         }
-        session.headers.update(headers)
+    
+    def _create_session(self) -> requests.Session:
+        """创建HTTP会话"""
+        session = requests.Session()
+        session.headers.update(self._build_headers())
         
         # 设置重试策略
         adapter = requests.adapters.HTTPAdapter(
@@ -108,6 +347,24 @@ class AppleStoreMonitorEnhanced:
         
         return session
     
+    def _create_async_session(self) -> 'aiohttp.ClientSession':
+        """
+        创建异步HTTP会话（异步引擎使用）
+        
+        连接池大小与并发上限一致，超时沿用 timeout 配置
+        """
+        connector = aiohttp.TCPConnector(limit=self._get_max_concurrency())
+        timeout = aiohttp.ClientTimeout(total=self.config.get('timeout', 10))
+        return aiohttp.ClientSession(
+            headers=self._build_headers(),
+            connector=connector,
+            timeout=timeout
+        )
+    
+    def _get_max_concurrency(self) -> int:
+        """异步引擎的最大并发请求数"""
+        return max(1, int(self.config.get('max_concurrency', 4)))
+    
     def _load_stores(self) -> Dict:
         """加载Apple Store列表"""
         try:
@@ -137,6 +394,32 @@ class AppleStoreMonitorEnhanced:
         """
         return self.stores.get(store_number)
     
+    def _build_query_params(self, part_numbers, store_number: str) -> Dict:
+        """
+        构建 pickup-message 查询参数
+        
+        香港和大陆都使用 pickup-message API（参数相同），
+        多个型号依次放入 parts.0 .. parts.N
+        
+        Args:
+            part_numbers: 商品型号编号，或型号编号列表（批量查询）
+            store_number: 门店编号
+        """
+        if isinstance(part_numbers, str):
+            part_numbers = [part_numbers]
+        
+        params = {
+            'pl': 'true',
+            'mts.0': 'regular',
+            'mts.1': 'compact',
+            'cppart': 'UNLOCKED/WW',  # 使用全球解锁版
+        }
+        for index, part_number in enumerate(part_numbers):
+            params[f'parts.{index}'] = part_number
+        params['store'] = store_number
+        
+        return params
+    
     def check_product_availability(self, part_number: str, store_number: str = None) -> Dict:
         """
         检查商品在指定门店的库存
@@ -148,24 +431,46 @@ class AppleStoreMonitorEnhanced:
         Returns:
             库存信息字典
         """
-        try:
-            # 香港和大陆现在都使用 pickup-message API（参数相同）
-            params = {
-                'pl': 'true',
-                'mts.0': 'regular',
-                'mts.1': 'compact',
-                'cppart': 'UNLOCKED/WW',  # 使用全球解锁版
-                'parts.0': part_number,
-            }
+        return self.check_store_availability([part_number], store_number)[part_number]
+    
+    def check_store_availability(self, part_numbers: List[str], store_number: str = None) -> Dict:
+        """
+        批量检查多个商品在指定门店的库存（一次请求）
+        
+        启用响应缓存时，有效期内已缓存的型号直接使用缓存，只请求其余型号
+        
+        Args:
+            part_numbers: 商品型号编号列表
+            store_number: 门店编号
             
-            # 指定门店（如果提供）
-            if store_number:
-                params['store'] = store_number
-            else:
+        Returns:
+            {part_number: 库存信息字典}，每个型号的格式与 check_product_availability 相同
+        """
+        results, missing = self._lookup_cache(part_numbers, store_number)
+        if missing:
+            results.update(self._fetch_store_availability(missing, store_number))
+        return results
+    
+    def _fetch_store_availability(self, part_numbers: List[str], store_number: str = None) -> Dict:
+        """
+        发送一次 pickup-message 请求，查询多个商品在指定门店的库存
+        
+        Args:
+            part_numbers: 商品型号编号列表
+            store_number: 门店编号
+            
+        Returns:
+            {part_number: 库存信息字典}
+        """
+        try:
+            # 必须指定门店
+            if not store_number:
                 logger.warning("未指定门店编号，无法查询")
-                return {'success': False, 'error': 'Store number required'}
+                return self._failure_results(part_numbers, 'Store number required')
+            
+            params = self._build_query_params(part_numbers, store_number)
             
-            logger.debug(f"查询库存: {part_number} @ {store_number or '全部门店'} ({self.region_config['name']})")
+            logger.debug(f"查询库存: {', '.join(part_numbers)} @ {store_number} ({self.region_config['name']})")
             
             response = self.session.get(
                 self.region_config['api_url'],
@@ -174,18 +479,132 @@ class AppleStoreMonitorEnhanced:
             )
             
             if response.status_code == 200:
-                data = response.json()
-                return self._parse_availability_response(data, part_number, store_number)
+                data = decode_json(response.content)
+                return self._store_in_cache(self._parse_multi_part_response(data, part_numbers))
             else:
                 logger.warning(f"库存查询失败: HTTP {response.status_code}")
-                return {'success': False, 'error': f'HTTP {response.status_code}'}
+                return self._failure_results(part_numbers, f'HTTP {response.status_code}', response.status_code)
                 
         except requests.RequestException as e:
             logger.error(f"库存查询网络错误: {e}")
-            return {'success': False, 'error': str(e)}
+            return self._failure_results(part_numbers, str(e))
+        except Exception as e:
+            logger.error(f"库存查询出错: {e}")
+            return self._failure_results(part_numbers, str(e))
+    
+    async def check_product_availability_async(self, session: 'aiohttp.ClientSession',
+                                               part_number: str, store_number: str = None) -> Dict:
+        """
+        检查商品在指定门店的库存（异步版本）
+        
+        Args:
+            session: 异步HTTP会话
+            part_number: 商品型号编号
+            store_number: 门店编号
+            
+        Returns:
+            库存信息字典（与 check_product_availability 格式相同）
+        """
+        results = await self.check_store_availability_async(session, [part_number], store_number)
+        return results[part_number]
+    
+    async def check_store_availability_async(self, session: 'aiohttp.ClientSession',
+                                             part_numbers: List[str], store_number: str = None) -> Dict:
+        """
+        批量检查多个商品在指定门店的库存（异步版本）
+        
+        Args:
+            session: 异步HTTP会话
+            part_numbers: 商品型号编号列表
+            store_number: 门店编号
+            
+        Returns:
+            {part_number: 库存信息字典}（与 check_store_availability 格式相同）
+        """
+        results, missing = self._lookup_cache(part_numbers, store_number)
+        if missing:
+            results.update(await self._fetch_store_availability_async(session, missing, store_number))
+        return results
+    
+    async def _fetch_store_availability_async(self, session: 'aiohttp.ClientSession',
+                                              part_numbers: List[str], store_number: str = None) -> Dict:
+        """发送一次 pickup-message 请求（异步版本，参见 _fetch_store_availability）"""
+        try:
+            if not store_number:
+                logger.warning("未指定门店编号，无法查询")
+                return self._failure_results(part_numbers, 'Store number required')
+            
+            params = self._build_query_params(part_numbers, store_number)
+            
+            logger.debug(f"[异步] 查询库存: {', '.join(part_numbers)} @ {store_number} ({self.region_config['name']})")
+            
+            async with session.get(self.region_config['api_url'], params=params) as response:
+                if response.status == 200:
+                    data = decode_json(await response.read())
+                    return self._store_in_cache(self._parse_multi_part_response(data, part_numbers))
+                else:
+                    logger.warning(f"库存查询失败: HTTP {response.status}")
+                    return self._failure_results(part_numbers, f'HTTP {response.status}', response.status)
+        
+        except asyncio.CancelledError:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"库存查询网络错误: {e!r}")
+            return self._failure_results(part_numbers, repr(e))
         except Exception as e:
             logger.error(f"库存查询出错: {e}")
-            return {'success': False, 'error': str(e)}
+            return self._failure_results(part_numbers, str(e))
+    
+    def _lookup_cache(self, part_numbers: List[str], store_number: str) -> Tuple[Dict, List[str]]:
+        """
+        从响应缓存中查找各型号在指定门店的库存
+        
+        Returns:
+            ({part_number: 库存信息字典（来自缓存）}, 需要请求的型号列表)
+        """
+        cached, missing = split_cached(self.response_cache, self.region, part_numbers, store_number)
+        
+        timestamp = datetime.now().isoformat()
+        results = {
+            part_number: ProductStock(part_number, stores={store_number: stock}, timestamp=timestamp,
+                                      region=self.region, from_cache=True)
+            for part_number, stock in cached.items()
+        }
+        
+        return results, missing
+    
+    def _store_in_cache(self, results: Dict) -> Dict:
+        """把一次请求解析出的所有门店结果（含附近门店）写入响应缓存"""
+        if self.response_cache is not None:
+            for part_number, result in results.items():
+                if result.success:
+                    self.response_cache.put(self.region, part_number, result.stores)
+        return results
+    
+    def _failure_results(self, part_numbers: List[str], error: str, status_code: int = None) -> Dict:
+        """为批量查询中的每个型号生成相同的失败结果"""
+        return {part_number: ProductStock.failure(part_number, error, status_code) for part_number in part_numbers}
+    
+    def _store_ref(self, store_number: str, store_name: Optional[str] = None) -> StoreInfo:
+        """
+        获取门店元数据（每个门店只创建一次）
+        
+        Args:
+            store_number: 门店编号
+            store_name: 响应中的门店名称（本地门店列表中没有该门店时使用）
+        """
+        info = self.store_refs.get(store_number)
+        if info is None:
+            store_info = self.get_store_info(store_number)
+            info = StoreInfo(
+                store_number=store_number,
+                store_name=store_info['storeName'] if store_info else (store_name or 'Unknown'),
+                city=store_info.get('city', '') if store_info else '',
+                district=store_info.get('district', '') if store_info else '',
+                region=self.region
+            )
+            self.store_refs[store_number] = info
+        return info
     
     def _parse_availability_response(self, data: Dict, part_number: str, store_number: str = None) -> Dict:
         """
@@ -199,167 +618,827 @@ class AppleStoreMonitorEnhanced:
         Returns:
             解析后的库存信息
         """
-        result = {
-            'success': True,
-            'part_number': part_number,
-            'stores': {},
-            'available_stores': [],
-            'timestamp': datetime.now().isoformat(),
-            'region': self.region
+        return self._parse_multi_part_response(data, [part_number])[part_number]
+    
+    def _parse_multi_part_response(self, data: Dict, part_numbers: List[str]) -> Dict:
+        """
+        解析批量库存查询响应，按型号拆分
+        
+        每个门店的 partsAvailability 中包含所有请求的型号，
+        这里拆分成每个型号各自的结果（格式与单型号查询相同）
+        
+        Args:
+            data: API响应数据
+            part_numbers: 请求的商品型号编号列表
+            
+        Returns:
+            {part_number: 解析后的库存信息}
+        """
+        timestamp = datetime.now().isoformat()
+        results = {
+            part_number: ProductStock(part_number, timestamp=timestamp, region=self.region)
+            for part_number in part_numbers
         }
         
         try:
-            # 香港和大陆都使用 pickup-message API，响应格式相同
-            if 'body' in data and 'stores' in data['body']:
-                stores_data = data['body']['stores']
-                
-                for store in stores_data:
-                    store_num = store.get('storeNumber')
-                    store_info = self.get_store_info(store_num)
-                    
-                    # 检查该门店的商品库存
-                    parts_availability = store.get('partsAvailability', {})
-                    product_info = parts_availability.get(part_number, {})
-                    
-                    pickup_display = product_info.get('pickupDisplay', 'unavailable')
-                    is_available = pickup_display == 'available'
-                    
-                    store_result = {
-                        'store_number': store_num,
-                        'store_name': store_info['storeName'] if store_info else store.get('storeName', 'Unknown'),
-                        'city': store_info.get('city', '') if store_info else '',
-                        'district': store_info.get('district', '') if store_info else '',
-                        'available': is_available,
-                        'pickup_display': pickup_display,
-                        'pickup_quote': product_info.get('pickupSearchQuote', ''),
-                        'region': self.region
-                    }
-                    
-                    result['stores'][store_num] = store_result
-                    
-                    if is_available:
-                        result['available_stores'].append(store_result)
+            # 香港和大陆都使用 pickup-message API，响应格式相同；
+            # 只读取库存相关字段，地址、营业时间等不访问
+            for store_num, store_name, part_number, pickup_display, pickup_quote in \
+                    iter_store_availability(data, part_numbers):
+                info = self._store_ref(store_num, store_name)
+                results[part_number].stores[info.store_number] = StoreStock(info, pickup_display, pickup_quote)
             
-            return result
+            return results
             
         except Exception as e:
             logger.error(f"解析库存数据失败: {e}")
-            result['success'] = False
-            result['error'] = str(e)
-            return result
+            return self._failure_results(part_numbers, str(e))
     
-    def check_multiple_products(self, products: List[Dict], stores: List[str] = None) -> Dict:
+    def _build_combinations(self, products: List[Dict], target_stores: List[str],
+                            per_product_stores: bool = True) -> List[Dict]:
+        """生成所有"产品-门店"组合（见 build_combinations）"""
+        return build_combinations(products, target_stores, per_product_stores)
+    
+    def _build_query_units(self, combinations: List[Dict], shuffle: bool = True) -> List[Dict]:
+        """将"产品-门店"组合打包成请求单元（见 build_query_units）"""
+        return build_query_units(combinations, self.config, shuffle)
+    
+    def _describe_unit(self, unit: Dict) -> str:
+        """请求单元的简短描述（用于日志）"""
+        names = ', '.join(combo['product_name'] for combo in unit['combos'])
+        return f"{names} @ {unit['store_number']}"
+    
+    def _init_product_result(self, results: Dict, combo: Dict, target_stores: List[str]):
+        """初始化该产品的结果字典（包含所有必要的统计字段）"""
+        part_number = combo['part_number']
+        if part_number in results:
+            return
+        
+        results[part_number] = {
+            'part_number': part_number,
+            'name': combo['product_name'],
+            'product': combo['product'],
+            'result': ProductStock(part_number, requested_stores=target_stores, region=self.region)
+        }
+    
+    def _merge_unit_results(self, results: Dict, unit: Dict, unit_results: Dict) -> Tuple[bool, Optional[int]]:
         """
-        检查多个商品在多个门店的库存（优化版：随机打散策略）
+        将一个请求单元的结果分发合并到各产品的本轮结果
         
         Args:
-            products: 商品列表，每个商品包含 part_number 等信息
-            stores: 门店编号列表，None表示所有门店
+            results: 本轮结果
+            unit: 请求单元
+            unit_results: {part_number: 库存信息字典}
             
         Returns:
-            所有商品的库存信息
+            (是否查询成功, 失败时的HTTP状态码)
         """
-        import random
+        success = False
+        status_code = None
         
-        results = {}
+        for combo in unit['combos']:
+            result = unit_results.get(combo['part_number'])
+            if result is None:
+                continue
+            if result.success:
+                results[combo['part_number']]['result'].stores.update(result.stores)
+                success = True
+                if self.burst_confirm is not None:
+                    self.burst_confirm.observe(combo['part_number'], result.stores)
+            elif result.status_code is not None:
+                status_code = result.status_code
         
-        # 确定要查询的门店列表
-        target_stores = stores if stores else list(self.stores.keys())
+        # 记录该门店的响应带回了哪些附近门店（供覆盖规划使用）
+        fresh_stores = next((r.stores for r in unit_results.values()
+                             if r.success and not r.from_cache), None)
+        if fresh_stores is not None:
+            self.coverage_planner.observe(unit['store_number'], fresh_stores.keys())
         
-        # 步骤1: 生成所有"产品-门店"组合
-        combinations = []
-        for product in products:
-            part_number = product.get('part_number')
-            if not part_number:
-                logger.warning(f"商品缺少 part_number: {product}")
-                continue
-            
-            for store_number in target_stores:
-                combinations.append({
-                    'product': product,
-                    'part_number': part_number,
-                    'product_name': product.get('name', part_number),
-                    'store_number': store_number
-                })
+        return success, status_code
+    
+    def _record_outcome(self, success: bool, status_code: Optional[int]):
+        """把请求结果反馈给自适应节奏控制器和熔断器（未启用时忽略）"""
+        if self.pacing is not None:
+            if success:
+                self.pacing.on_success()
+            elif is_throttle_status(status_code):
+                self.pacing.on_throttle(status_code)
         
-        # 步骤2: 随机打散顺序（每轮都不同）
-        random.shuffle(combinations)
+        if self.circuit_breaker is not None:
+            # 限流、服务端错误和网络错误计入失败；其他4xx是请求本身的问题，接口仍然正常
+            if not success and (status_code is None or is_throttle_status(status_code)):
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+    
+    def _breaker_allows(self) -> bool:
+        """熔断器是否放行下一个请求（未启用熔断器时总是放行）"""
+        return self.circuit_breaker is None or self.circuit_breaker.allow_request()
+    
+    def _log_breaker_skip(self, skipped: int):
+        """输出因熔断跳过请求的日志"""
+        remaining = self.circuit_breaker.remaining_cooldown()
+        logger.warning(f"⛔ 区域 {self.region} 熔断中，跳过本轮剩余 {skipped} 个请求"
+                       f"（{remaining:.0f}秒后发送试探请求）")
+    
+    def get_check_interval(self, base_interval: float) -> float:
+        """
+        当前时段的检查间隔
         
+        启用新鲜度目标时由规划结果决定（忽略 base_interval）；
+        启用补货时段分布时，热门时段缩短、冷门时段拉长（每天总轮数不变）；否则为 base_interval
+        """
+        plan = self.staleness_plan
+        if plan is not None and plan['round_interval'] is not None:
+            # 新鲜度目标决定检查间隔；补货时段分布只能在此基础上缩短
+            base_interval = plan['round_interval']
+            if self.restock_profile is not None:
+                return min(base_interval, self.restock_profile.interval_for(base_interval))
+            return base_interval
+        
+        if self.restock_profile is None:
+            return base_interval
+        return self.restock_profile.interval_for(base_interval)
+    
+    def get_circuit_state(self) -> Optional[Dict]:
+        """获取本区域熔断器状态（未启用时返回 None）"""
+        if self.circuit_breaker is None:
+            return None
+        return self.circuit_breaker.get_stats()
+    
+    def _warn_rate_limited(self, error_count: int):
+        """输出连续触发API限制的警告"""
+        if self.pacing is None:
+            logger.warning(f"⚠️  API限制警告 ({error_count}/3)")
+        else:
+            logger.warning(f"⚠️  API限制警告 (连续{error_count}次，当前速率 {self.pacing.rate_per_minute:.1f} 次/分钟)")
+    
+    def _should_abort_round(self) -> bool:
+        """
+        连续触发限制时是否放弃本轮剩余请求
+        
+        启用自适应节奏时先降速继续，只有降到速率下限仍被限制才放弃
+        """
+        return self.pacing is None or self.pacing.at_floor
+    
+    def _finalize_results(self, results: Dict, combination_count: int, request_count: int) -> Dict:
+        """记录历史、反馈给补货学习器并输出本轮汇总"""
+        for part_number, data in results.items():
+            self._save_to_history(part_number, data)
+            if self.availability is not None:
+                self.availability.update(part_number, data['result'])
+            if self.restock_learner is not None:
+                self.restock_learner.observe_result(part_number, data['result'])
+            if self.restock_profile is not None:
+                self.restock_profile.observe_result(part_number, data['result'])
+        
+        if self.restock_profile is not None:
+            self.restock_profile.save()
+        if self.history_exporter is not None:
+            self.history_exporter.write_round(self.region, {
+                'products': len(results),
+                'combinations': combination_count,
+                'requests': request_count,
+                'available': sum(1 for data in results.values() if data['result'].get('available_stores')),
+                'failed': sum(1 for data in results.values() if not data['result'].get('success'))
+            })
+        self._flush_history()
+        self._diff_availability()
+        self.save_checkpoint(force=False)
+        
+        logger.info(f"\n✅ 本轮完成，共检查 {combination_count} 个组合（{request_count} 次请求）")
+        logger.info(f"📊 结果: {len(results)} 个产品")
+        
+        if self.response_cache is not None:
+            cache_stats = self.response_cache.get_stats()
+            logger.info(f"💾 响应缓存: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']} "
+                        f"(命中率 {cache_stats['hit_rate']:.0%}, {cache_stats['entries']} 条)")
+        
+        # 保存学到的请求速率（下一轮和重启后继续使用）
+        if self.pacing is not None:
+            logger.info(f"📶 当前请求速率: {self.pacing.rate_per_minute:.1f} 次/分钟")
+            self.pacing.save()
+        
+        return results
+    
+    def _log_round_start(self, products: List[Dict], target_stores: List[str],
+                         combinations: List[Dict], units: List[Dict], extra: str = ''):
+        """输出本轮检查的概要"""
         logger.info(f"\n{'='*80}")
-        logger.info(f"🎲 本轮检查 {len(combinations)} 个组合（已随机打散）")
+        if len(units) == len(combinations):
+            logger.info(f"🎲 本轮检查 {len(combinations)} 个组合（已随机打散{extra}）")
+        else:
+            logger.info(f"🎲 本轮检查 {len(combinations)} 个组合，批量打包为 {len(units)} 次请求（已随机打散{extra}）")
         logger.info(f"📦 {len(products)} 个产品 × {len(target_stores)} 个门店 - 区域: {self.region}")
         logger.info(f"{'='*80}\n")
+    
+    def _plan_query_stores(self, target_stores: List[str]) -> List[str]:
+        """
+        确定本轮实际需要直接查询的门店
         
-        # 步骤3: 逐个发送请求，随机间隔
+        启用覆盖规划时，只查询能覆盖全部目标门店的锚点门店
+        （以及还没有观测记录的门店）；否则逐个查询目标门店。
+        """
+        if not self.config.get('coverage_planning', False):
+            return target_stores
+        
+        anchors, unknown = self.coverage_planner.plan(target_stores)
+        query_stores = anchors + unknown
+        
+        if len(query_stores) < len(target_stores):
+            logger.info(f"🗺️  覆盖规划: {len(target_stores)} 个目标门店 → "
+                        f"{len(anchors)} 个锚点 + {len(unknown)} 个直接查询")
+        
+        return query_stores
+    
+    def _plan_round(self, products: List[Dict], target_stores: List[str]) -> Tuple[Dict, List[Dict], int]:
+        """
+        生成本轮的结果骨架和要发送的组合
+        
+        启用优先级调度时只包含本轮到期的"产品-门店"组合；
+        启用覆盖规划时，组合中的门店换成能覆盖到期门店的锚点门店
+        
+        Returns:
+            (本轮结果, 要发送的组合列表, 本轮检查的组合数)
+        """
+        pairs = self._build_combinations(products, target_stores)
+        # 只在各商品关注的门店中选择（多人订阅合并后的商品带 stores 字段）
+        product_stores = {product['part_number']: stores_for_product(product, target_stores)
+                          for product in products if product.get('part_number')}
+        due = None
+        if self.burst_confirm is not None:
+            self.burst_confirm.set_targets(products, target_stores)
+        if self.restock_learner is not None:
+            # 按学到的库存变化率采样（同时启用优先级调度时按优先级加权）
+            weight_fn = self.scheduler.pair_weight if self.scheduler is not None else None
+            due = self.restock_learner.select(products, target_stores, weight_fn, product_stores)
+            total_pairs = len(pairs)
+            pairs = [combo for combo in pairs if combo['store_number'] in due.get(combo['part_number'], ())]
+            logger.info(f"🧠 自适应采样: 本轮查询 {len(pairs)}/{total_pairs} 个组合")
+        elif self.scheduler is not None:
+            due = self.scheduler.select(products, target_stores, product_stores)
+            total_pairs = len(pairs)
+            pairs = [combo for combo in pairs if combo['store_number'] in due.get(combo['part_number'], ())]
+            logger.info(f"⚖️  优先级调度: 本轮 {len(pairs)}/{total_pairs} 个组合到期")
+        
+        results = {}
+        for combo in pairs:
+            requested = due[combo['part_number']] if due is not None else target_stores
+            self._init_product_result(results, combo, stores_for_product(combo['product'], requested))
+        
+        if not self.config.get('coverage_planning', False):
+            return results, pairs, len(pairs)
+        
+        # 覆盖规划：到期门店的并集换成锚点门店
+        round_stores = list(dict.fromkeys(combo['store_number'] for combo in pairs))
+        round_products = [data['product'] for data in results.values()]
+        combinations = self._build_combinations(round_products, self._plan_query_stores(round_stores),
+                                                per_product_stores=False)
+        return results, combinations, len(pairs)
+    
+    def _build_fallback_combinations(self, results: Dict) -> List[Dict]:
+        """
+        找出锚点响应中缺失的目标门店，生成直接查询的组合
+        
+        附近门店列表会变化，锚点未返回的目标门店需要回退为直接查询
+        """
+        combinations = []
+        dropped_stores = set()
+        
+        for part_number, data in results.items():
+            responded = data['result'].stores
+            for store_number in data['result'].requested_stores:
+                if store_number not in responded:
+                    dropped_stores.add(store_number)
+                    combinations.append({
+                        'product': data['product'],
+                        'part_number': part_number,
+                        'product_name': data['name'],
+                        'store_number': store_number
+                    })
+        
+        if combinations:
+            logger.info(f"🔁 覆盖规划: {len(dropped_stores)} 个目标门店未被锚点覆盖，回退为直接查询")
+        
+        return combinations
+    
+    def _execute_units(self, results: Dict, units: List[Dict]) -> bool:
+        """
+        逐个发送请求单元，请求节奏由限速器控制
+        
+        Args:
+            results: 本轮结果（原地合并）
+            units: 请求单元列表
+            
+        Returns:
+            是否因停止信号或连续限制而中断
+        """
         error_count = 0  # 连续错误计数
         
-        for i, combo in enumerate(combinations, 1):
-            # 检查是否收到停止信号
-            if self.stop_event and self.stop_event.is_set():
-                logger.info("检测到停止信号，中断查询")
-                break
+        for i, unit in enumerate(units, 1):
+            # 刚检测到有货时，先查询到期的相关组合
+            if not self._run_burst_probes(results):
+                return True
             
-            part_number = combo['part_number']
-            product_name = combo['product_name']
-            store_number = combo['store_number']
+            part_numbers = [combo['part_number'] for combo in unit['combos']]
             
-            # 初始化该产品的结果字典（包含所有必要的统计字段）
-            if part_number not in results:
-                results[part_number] = {
-                    'part_number': part_number,
-                    'name': product_name,
-                    'product': combo['product'],
-                    'result': {
-                        'success': True,
-                        'stores': {},
-                        'available_stores': [],
-                        'requested_stores': target_stores,  # 添加
-                        'requested_stores_count': len(target_stores),  # 添加
-                        'responded_stores_count': 0  # 添加，稍后更新
-                    }
-                }
+            # 缓存中已有的型号直接合并，全部命中时不发请求、不消耗令牌
+            cached_results, part_numbers = self._lookup_cache(part_numbers, unit['store_number'])
+            self._merge_unit_results(results, unit, cached_results)
+            if not part_numbers:
+                logger.info(f"💾 [{i}/{len(units)}] 缓存命中 {self._describe_unit(unit)}")
+                continue
+            
+            # 熔断中不再消耗请求预算
+            if not self._breaker_allows():
+                self._log_breaker_skip(len(units) - i + 1)
+                return True
+            
+            # 等待限速器放行（收到停止信号时立即返回）
+            if not self.rate_limiter.acquire(self.stop_event):
+                logger.info("检测到停止信号，中断查询")
+                return True
+            
+            logger.info(f"📤 [{i}/{len(units)}] 查询 {self._describe_unit(unit)}")
             
             try:
-                # 发送请求
-                result = self.check_product_availability(part_number, store_number)
+                # 发送请求（只请求缓存中没有的型号）
+                unit_results = self._fetch_store_availability(part_numbers, unit['store_number'])
+                success, status_code = self._merge_unit_results(results, unit, unit_results)
+                self._record_outcome(success, status_code)
                 
-                if result.get('success') and 'stores' in result:
-                    # 合并门店数据
-                    results[part_number]['result']['stores'].update(result['stores'])
-                    results[part_number]['result']['available_stores'].extend(result.get('available_stores', []))
+                if success:
                     error_count = 0  # 重置错误计数
-                elif 'HTTP 541' in str(result.get('error', '')):
+                elif status_code == 541:
                     # 检测到HTTP 541错误
                     error_count += 1
-                    logger.warning(f"⚠️  API限制警告 ({error_count}/3)")
+                    self._warn_rate_limited(error_count)
                     
-                    if error_count >= 3:
-                        logger.error(f"🛑 连续触发限制，停止本轮剩余 {len(combinations) - i} 个请求")
-                        logger.error(f"💡 建议：增加 check_interval 或减少产品/门店数量")
-                        break
+                    if error_count >= 3 and self._should_abort_round():
+                        logger.error(f"🛑 连续触发限制，停止本轮剩余 {len(units) - i} 个请求")
+                        logger.error("💡 建议：增加 check_interval 或减少产品/门店数量")
+                        return True
             
             except Exception as e:
-                logger.error(f"查询失败 {product_name} @ {store_number}: {e}")
+                logger.error(f"查询失败 {self._describe_unit(unit)}: {e}")
+        
+        # 本轮最后几个请求触发的突发确认不必等到下一轮
+        return not self._run_burst_probes(results)
+    
+    async def _execute_units_async(self, session: 'aiohttp.ClientSession',
+                                   results: Dict, units: List[Dict]) -> bool:
+        """
+        按限速器节奏发出请求单元，响应并发等待
+        
+        Args:
+            session: 异步HTTP会话
+            results: 本轮结果（原地合并）
+            units: 请求单元列表
             
-            # 随机延迟（最后一个不延迟）
-            if i < len(combinations):
-                # 随机延迟：1.5-2.5秒（正态分布更自然）
-                delay = random.gauss(2.0, 0.3)  # 均值2.0秒，标准差0.3
-                delay = max(1.5, min(2.5, delay))  # 限制在1.5-2.5秒
-                
-                logger.info(f"⏳ [{i}/{len(combinations)}] 等待 {delay:.3f}秒 后发送下一个请求...")
-                self._interruptible_sleep(delay)
+        Returns:
+            是否因停止信号或连续限制而中断
+        """
+        semaphore = asyncio.Semaphore(self._get_max_concurrency())
+        error_count = 0  # 连续错误计数（按响应返回顺序）
+        abort_round = asyncio.Event()
+        interrupted = False
         
-        # 步骤4: 更新响应门店数量
-        for part_number in results:
-            responded_count = len(results[part_number]['result']['stores'])
-            results[part_number]['result']['responded_stores_count'] = responded_count
+        async def run_unit(unit, part_numbers):
+            nonlocal error_count
+            try:
+                unit_results = await self._fetch_store_availability_async(
+                    session, part_numbers, unit['store_number']
+                )
+            finally:
+                semaphore.release()
+            
+            success, status_code = self._merge_unit_results(results, unit, unit_results)
+            self._record_outcome(success, status_code)
+            if success:
+                error_count = 0
+            elif status_code == 541:
+                error_count += 1
+                self._warn_rate_limited(error_count)
+                if error_count >= 3 and self._should_abort_round() and not abort_round.is_set():
+                    logger.error("🛑 连续触发限制，停止本轮剩余请求")
+                    logger.error("💡 建议：增加 check_interval 或减少产品/门店数量")
+                    abort_round.set()
         
-        logger.info(f"\n✅ 本轮完成，共检查 {len(combinations)} 个组合")
-        logger.info(f"📊 结果: {len(results)} 个产品")
+        async def dispatch_burst_probes() -> bool:
+            for burst_unit in self._due_burst_units():
+                burst_combo = burst_unit['combos'][0]
+                await semaphore.acquire()
+                if not await self.rate_limiter.acquire_async(self.stop_event):
+                    semaphore.release()
+                    return False
+                self._init_product_result(results, burst_combo, [burst_unit['store_number']])
+                logger.info(f"⚡ 突发确认 {self._describe_unit(burst_unit)}")
+                tasks.append(asyncio.create_task(run_unit(burst_unit, [burst_combo['part_number']])))
+            return True
+        
+        tasks = []
+        for i, unit in enumerate(units, 1):
+            if abort_round.is_set():
+                break
+            
+            # 刚检测到有货时，先发出到期的相关组合
+            if not await dispatch_burst_probes():
+                interrupted = True
+                break
+            
+            # 缓存中已有的型号直接合并，全部命中时不发请求
+            part_numbers = [combo['part_number'] for combo in unit['combos']]
+            cached_results, part_numbers = self._lookup_cache(part_numbers, unit['store_number'])
+            self._merge_unit_results(results, unit, cached_results)
+            if not part_numbers:
+                logger.info(f"💾 [{i}/{len(units)}] 缓存命中 {self._describe_unit(unit)}")
+                continue
+            
+            # 熔断中不再消耗请求预算；半开状态下先等试探请求返回
+            if not await self._wait_breaker_async(tasks):
+                self._log_breaker_skip(len(units) - i + 1)
+                abort_round.set()
+                break
+            
+            # 并发上限：等待空闲槽位后再发出
+            await semaphore.acquire()
+            
+            # 请求节奏：按发出时间由限速器控制，不等待响应
+            if not await self.rate_limiter.acquire_async(self.stop_event):
+                semaphore.release()
+                logger.info("检测到停止信号，中断查询")
+                interrupted = True
+                break
+            
+            logger.info(f"📤 [{i}/{len(units)}] 已发出 {self._describe_unit(unit)}")
+            tasks.append(asyncio.create_task(run_unit(unit, part_numbers)))
+        
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # 本轮最后几个响应触发的突发确认不必等到下一轮
+        if not interrupted and not abort_round.is_set():
+            tasks = []
+            interrupted = not await dispatch_burst_probes()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        
+        return interrupted or abort_round.is_set()
+    
+    def _due_burst_units(self):
+        """依次取出到期的突发确认请求单元（受突发预算和熔断器限制）"""
+        if self.burst_confirm is None:
+            return
+        while self.circuit_breaker is None or self.circuit_breaker.can_attempt():
+            unit = self.burst_confirm.peek_unit(self.rate_limiter.rate_per_minute)
+            if unit is None:
+                return
+            # 确实有到期单元要发送时才占用半开状态的试探名额，占到后才扣减突发预算、拉长查询间隔
+            if not self._breaker_allows():
+                return
+            self.burst_confirm.commit_unit(unit)
+            yield unit
+    
+    def _run_burst_probes(self, results: Dict) -> bool:
+        """
+        发送到期的突发确认请求（不使用缓存），结果合并到本轮结果
+        
+        Returns:
+            是否继续（收到停止信号时返回 False）
+        """
+        for unit in self._due_burst_units():
+            combo = unit['combos'][0]
+            if not self.rate_limiter.acquire(self.stop_event):
+                return False
+            
+            logger.info(f"⚡ 突发确认 {self._describe_unit(unit)}")
+            self._init_product_result(results, combo, [unit['store_number']])
+            unit_results = self._fetch_store_availability([combo['part_number']], unit['store_number'])
+            success, status_code = self._merge_unit_results(results, unit, unit_results)
+            self._record_outcome(success, status_code)
+        return True
+    
+    async def _wait_breaker_async(self, tasks: List['asyncio.Task']) -> bool:
+        """
+        等待熔断器放行下一个请求
+        
+        半开状态下试探请求还在途时，等在途请求返回后再判断
+        
+        Returns:
+            是否放行（熔断器打开时返回 False）
+        """
+        while not self._breaker_allows():
+            pending = [task for task in tasks if not task.done()]
+            if not (self.circuit_breaker.probe_in_flight and pending):
+                return False
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        return True
+    
+    def check_multiple_products(self, products: List[Dict], stores: List[str] = None) -> Dict:
+        """
+        检查多个商品在多个门店的库存（优化版：随机打散策略）
+        
+        Args:
+            products: 商品列表，每个商品包含 part_number 等信息
+            stores: 门店编号列表，None表示所有门店
+            
+        Returns:
+            所有商品的库存信息
+        """
+        # 确定要查询的门店列表
+        target_stores = stores if stores else list(self.stores.keys())
+        
+        # 步骤1: 生成本轮的"产品-门店"组合（优先级调度时只包含到期组合，覆盖规划时只包含锚点门店）
+        results, combinations, pair_count = self._plan_round(products, target_stores)
+        
+        # 步骤2: 打包成请求单元并随机打散顺序（每轮都不同）
+        units = self._build_query_units(combinations)
+        self._log_round_start(products, target_stores, combinations, units)
+        
+        # 步骤3: 逐个发送请求，随机间隔
+        interrupted = self._execute_units(results, units)
+        request_count = len(units)
+        
+        # 步骤3b: 锚点未覆盖的目标门店回退为直接查询
+        if not interrupted and self.config.get('coverage_planning', False):
+            fallback_units = self._build_query_units(self._build_fallback_combinations(results))
+            if fallback_units:
+                self._execute_units(results, fallback_units)
+                request_count += len(fallback_units)
+        
+        # 步骤4: 输出本轮汇总
+        return self._finalize_results(results, pair_count, request_count)
+    
+    async def check_multiple_products_async(self, products: List[Dict], stores: List[str] = None) -> Dict:
+        """
+        检查多个商品在多个门店的库存（异步引擎）
+        
+        与 check_multiple_products 返回相同的结果格式。请求仍按随机间隔
+        由限速器控制依次发出，但不等待上一个响应返回，网络等待相互重叠，
+        因此一轮耗时只由请求节奏决定，而不是单个请求的延迟。
+        
+        Args:
+            products: 商品列表，每个商品包含 part_number 等信息
+            stores: 门店编号列表，None表示所有门店
+            
+        Returns:
+            所有商品的库存信息
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("异步引擎需要 aiohttp，请先执行: pip install aiohttp")
+        
+        target_stores = stores if stores else list(self.stores.keys())
+        results, combinations, pair_count = self._plan_round(products, target_stores)
+        
+        units = self._build_query_units(combinations)
+        self._log_round_start(products, target_stores, combinations, units,
+                              f"，异步并发上限 {self._get_max_concurrency()}")
+        
+        async with self._create_async_session() as session:
+            interrupted = await self._execute_units_async(session, results, units)
+            request_count = len(units)
+            
+            # 锚点未覆盖的目标门店回退为直接查询
+            if not interrupted and self.config.get('coverage_planning', False):
+                fallback_units = self._build_query_units(self._build_fallback_combinations(results))
+                if fallback_units:
+                    await self._execute_units_async(session, results, fallback_units)
+                    request_count += len(fallback_units)
+        
+        return self._finalize_results(results, pair_count, request_count)
+    
+    def sync_continuous_schedule(self, products: List[Dict], stores: List[str] = None) -> Tuple[int, int]:
+        """
+        按商品和门店列表更新连续模式的请求单元队列
+        
+        启用新鲜度目标时按规划结果分配权重；否则启用优先级调度时，单元权重取其中组合权重的最大值
+        
+        Returns:
+            (新增单元数, 移除单元数)
+        """
+        if self.rolling_scheduler is None:
+            self.rolling_scheduler = RollingScheduler()
+        
+        target_stores = stores if stores else list(self.stores.keys())
+        if self.burst_confirm is not None:
+            self.burst_confirm.set_targets(products, target_stores)
+        units = self._build_query_units(self._build_combinations(products, target_stores), shuffle=False)
+        weights = None
+        if self.staleness_sla is not None:
+            # 按新鲜度规划：权重与计划刷新频率成正比，预算不足时按规划放宽
+            plan = self.plan_staleness(products, stores, units)
+            weights = {key: 1.0 / max(period, 1e-3) for key, period in plan['periods'].items()}
+        elif self.scheduler is not None:
+            weights = {
+                unit_key(unit): max(self.scheduler.pair_weight(combo['product'], unit['store_number'])
+                                    for combo in unit['combos'])
+                for unit in units
+            }
+        added, removed = self.rolling_scheduler.sync(units, weights)
+        if added:
+            self._notify_waiters()
+        return added, removed
+    
+    def _request_budget(self) -> float:
+        """本区域的请求预算（次/分钟），启用整机共享预算时取两者中较小的值"""
+        rate = self.rate_limiter.rate_per_minute
+        ledger = getattr(self.rate_limiter, 'ledger', None)
+        if ledger is not None:
+            rate = min(rate, ledger.rate_per_minute)
+        return rate
+    
+    def plan_staleness(self, products: List[Dict], stores: List[str] = None,
+                       units: List[Dict] = None) -> Optional[Dict]:
+        """
+        按 staleness_sla 配置规划请求（未启用时返回 None）
+        
+        连续模式下计划刷新周期决定各请求单元的权重；轮询模式下决定 check_interval。
+        预算不足时输出必须放宽目标的组合
+        
+        Args:
+            products: 商品列表
+            stores: 门店编号列表，None表示所有门店
+            units: 已生成的请求单元（连续模式传入，保证与调度队列一致）
+        
+        Returns:
+            规划结果（格式见 rate_calculator.plan_staleness）
+        """
+        if self.staleness_sla is None:
+            return None
+        
+        if units is None:
+            target_stores = stores if stores else list(self.stores.keys())
+            units = self._build_query_units(self._build_combinations(products, target_stores), shuffle=False)
+        
+        unit_by_key = {unit_key(unit): unit for unit in units}
+        targets = {
+            key: min(staleness_target(self.staleness_sla, combo['product'], unit['store_number'])
+                     for combo in unit['combos'])
+            for key, unit in unit_by_key.items()
+        }
+        plan = plan_staleness(targets, self._request_budget(), continuous=self.rolling_scheduler is not None)
+        
+        previous = self.staleness_plan
+        self.staleness_plan = plan
+        if previous is None or previous['periods'] != plan['periods']:
+            self._log_staleness_plan(plan, targets, unit_by_key)
+        return plan
+    
+    def _log_staleness_plan(self, plan: Dict, targets: Dict, unit_by_key: Dict):
+        """输出新鲜度规划结果（预算不足时列出需要放宽的组合）"""
+        logger.info(f"📐 新鲜度规划: {len(targets)} 个请求单元，满足全部目标需要 "
+                    f"{plan['required_rate']:.1f} 次/分钟，预算 {plan['budget']:.1f} 次/分钟")
+        if plan['round_interval'] is not None:
+            logger.info(f"📐 轮询模式: 检查间隔设为 {plan['round_interval']:.0f}秒")
+        
+        if plan['feasible']:
+            logger.info(f"✅ 新鲜度目标可以满足（预算利用率 {plan['utilization']:.0%}）")
+            return
+        
+        logger.warning(f"❌ 请求预算不足，以下 {len(plan['relax'])} 个请求单元的新鲜度目标需要放宽:")
+        for key, achievable in sorted(plan['relax'].items(), key=lambda item: targets[item[0]])[:20]:
+            unit = unit_by_key[key]
+            logger.warning(f"   • {self._describe_unit(unit)}: 目标 {targets[key]:.0f}秒 → 最快 {achievable:.0f}秒")
+        if len(plan['relax']) > 20:
+            logger.warning(f"   ... 还有 {len(plan['relax']) - 20} 个")
+    
+    def _check_continuous_unit(self, unit: Dict) -> Optional[Dict]:
+        """
+        连续模式下查询一个请求单元（突发确认单元不使用缓存）
+        
+        Returns:
+            {part_number: 结果字典}（格式与 check_multiple_products 的单个产品相同，
+            requested_stores 只含该单元的门店）；收到停止信号时返回 None，
+            缓存未命中且熔断器不放行时返回空字典
+        """
+        store_number = unit['store_number']
+        results = {}
+        for combo in unit['combos']:
+            self._init_product_result(results, combo, [store_number])
+        
+        part_numbers = [combo['part_number'] for combo in unit['combos']]
+        if not unit.get('burst'):
+            cached_results, part_numbers = self._lookup_cache(part_numbers, store_number)
+            self._merge_unit_results(results, unit, cached_results)
+            if not part_numbers:
+                logger.debug(f"💾 缓存命中 {self._describe_unit(unit)}")
+                return results
+            
+            # 确实要发请求时才占用半开状态的试探名额（突发确认单元取出时已占用）
+            if not self._breaker_allows():
+                return {}
+        
+        if not self.rate_limiter.acquire(self.stop_event):
+            return None
+        
+        logger.info(f"{'⚡ 突发确认' if unit.get('burst') else '📤 查询'} {self._describe_unit(unit)}")
+        unit_results = self._fetch_store_availability(part_numbers, store_number)
+        success, status_code = self._merge_unit_results(results, unit, unit_results)
+        self._record_outcome(success, status_code)
+        
+        # 请求失败的型号直接返回失败结果
+        for part_number in part_numbers:
+            result = unit_results.get(part_number)
+            if result is not None and not result.success:
+                results[part_number]['result'] = result
         
         return results
     
+    def _log_continuous_stats(self):
+        """输出连续模式的统计，并保存学到的请求速率和补货时段分布"""
+        stats = self.rolling_scheduler.get_stats()
+        logger.info(f"🔄 连续模式: {stats['units']} 个请求单元，已查询 {stats['dispatched']} 次，"
+                    f"数据平均 {stats['mean_staleness']:.0f}秒 / 最旧 {stats['max_staleness']:.0f}秒，"
+                    f"当前速率 {self.rate_limiter.rate_per_minute:.1f} 次/分钟")
+        
+        self._diff_availability()
+        
+        if self.pacing is not None:
+            self.pacing.save()
+        if self.restock_profile is not None:
+            self.restock_profile.save()
+    
+    def _emit_continuous_results(self, results: Dict, on_result: Optional[Callable[[str, Dict], None]]):
+        """连续模式下每个响应到达后：记录历史、反馈给学习器，再交给回调输出和通知"""
+        for part_number, data in results.items():
+            self._save_to_history(part_number, data)
+            if self.availability is not None:
+                self.availability.update(part_number, data['result'])
+            if self.restock_learner is not None:
+                self.restock_learner.observe_result(part_number, data['result'])
+            if self.restock_profile is not None:
+                self.restock_profile.observe_result(part_number, data['result'])
+            if on_result is not None:
+                on_result(part_number, data)
+        self._flush_history(force=False)
+        self.save_checkpoint(force=False)
+    
+    def run_continuous(self, products: List[Dict], stores: List[str] = None,
+                       on_result: Optional[Callable[[str, Dict], None]] = None):
+        """
+        连续滚动模式：不分轮次，按到期时间不间断地查询各请求单元，直到收到停止信号
+        
+        每个响应到达后立即记录历史、反馈给学习器，并通过 on_result 回调输出和通知；
+        请求节奏仍由限速器控制，熔断器打开时等待冷却结束再发送试探请求。
+        覆盖规划和自适应采样按轮次工作，连续模式下不使用（自适应采样仍会学习）
+        
+        Args:
+            products: 商品列表
+            stores: 门店编号列表，None表示所有门店
+            on_result: 回调 (part_number, 结果字典)，每个型号的结果到达时调用
+        """
+        added, _ = self.sync_continuous_schedule(products, stores)
+        logger.info(f"🔄 连续模式启动: {added} 个请求单元 - 区域: {self.region}")
+        next_stats = time.monotonic() + self.rolling_scheduler.stats_interval
+        
+        while not (self.stop_event and self.stop_event.is_set()):
+            # 配置热加载：新组合加入队列，移除的组合不再查询
+            self.apply_pending_config()
+            
+            head = self.rolling_scheduler.peek()
+            if head is None:
+                logger.warning("没有需要查询的组合，连续模式退出")
+                return
+            
+            unit, wait = head
+            burst_unit = next(self._due_burst_units(), None)
+            if burst_unit is not None:
+                # 刚检测到有货：相关组合优先于常规队列
+                results = self._check_continuous_unit(burst_unit)
+                if results is None:
+                    break
+                self._emit_continuous_results(results, on_result)
+            elif wait > 0:
+                # 睡到单元到期（最迟到下一个突发确认或下一次输出统计）
+                burst_wait = self.burst_confirm.next_due() if self.burst_confirm is not None else None
+                if burst_wait is not None:
+                    if self.circuit_breaker is not None and not self.circuit_breaker.can_attempt():
+                        # 熔断中突发确认单元发不出去，等到冷却结束，不空转
+                        burst_wait = max(burst_wait, self.circuit_breaker.remaining_cooldown(), 1.0)
+                    wait = min(wait, max(burst_wait, 0.01))
+                self._interruptible_sleep(max(0.0, min(wait, next_stats - time.monotonic())))
+            else:
+                # 先查缓存，缓存未命中时才由熔断器决定是否发请求
+                results = self._check_continuous_unit(unit)
+                if results is None:
+                    break
+                if results:
+                    self.rolling_scheduler.complete(unit, self.rate_limiter.rate_per_minute)
+                    self._emit_continuous_results(results, on_result)
+                else:
+                    remaining = self.circuit_breaker.remaining_cooldown()
+                    logger.warning(f"⛔ 区域 {self.region} 熔断中，{remaining:.0f}秒后发送试探请求")
+                    self._interruptible_sleep(max(remaining, 1.0))
+            
+            if time.monotonic() >= next_stats:
+                self._log_continuous_stats()
+                next_stats = time.monotonic() + self.rolling_scheduler.stats_interval
+        
+        logger.info("检测到停止信号，连续模式退出")
+        self._log_continuous_stats()
+        self._flush_history()
+        self.save_checkpoint()
+    
     def check_multiple_products_old(self, products: List[Dict], stores: List[str] = None) -> Dict:
         """
         检查多个商品在多个门店的库存（支持单门店+多产品）
@@ -384,7 +1463,7 @@ class AppleStoreMonitorEnhanced:
         
         # 香港API：一次查询返回所有门店
         if self.region == 'HK':
-            logger.info(f"香港区域：使用优化查询（每个产品一次API调用）")
+            logger.info("香港区域：使用优化查询（每个产品一次API调用）")
             
             for i, product in enumerate(products, 1):
                 # 检查是否收到停止信号
@@ -400,6 +1479,11 @@ class AppleStoreMonitorEnhanced:
                 product_name = product.get('name', part_number)
                 logger.info(f"[{i}/{len(products)}] 检查商品: {product_name} ({part_number})")
                 
+                # 请求节奏由限速器控制
+                if not self.rate_limiter.acquire(self.stop_event):
+                    logger.info("检测到停止信号，中断商品查询")
+                    break
+                
                 try:
                     # 香港API：一次调用返回所有门店
                     result = self.check_product_availability(part_number, None)
@@ -424,10 +1508,6 @@ class AppleStoreMonitorEnhanced:
                             logger.info(f"✅ 找到库存！{len(available_stores)} 个门店有货")
                     else:
                         logger.warning(f"查询失败: {result.get('error', 'Unknown error')}")
-                    
-                    # 产品间延迟（香港API已经很高效了，延迟可以更短）
-                    if i < len(products):
-                        self._interruptible_sleep(2)
                         
                 except Exception as e:
                     logger.error(f"查询产品 {part_number} 时出错: {e}")
@@ -468,6 +1548,11 @@ class AppleStoreMonitorEnhanced:
                     logger.info(f"跳过门店 {store_number}（已触发限制保护）")
                     continue
                 
+                # 请求节奏由限速器控制
+                if not self.rate_limiter.acquire(self.stop_event):
+                    logger.info("检测到停止信号，中断门店查询")
+                    break
+                
                 try:
                     result = self.check_product_availability(part_number, store_number)
                     
@@ -480,33 +1565,12 @@ class AppleStoreMonitorEnhanced:
                         
                         if error_count >= 3:
                             logger.warning(f"⚠️  连续{error_count}次遇到API限制！")
-                            logger.warning(f"为保护IP，跳过该产品的剩余查询")
+                            logger.warning("为保护IP，跳过该产品的剩余查询")
                             skip_remaining = True
                             continue
                     
-                    # 单门店模式：产品间延迟
-                    # 多门店模式：门店间延迟
-                    if is_single_store:
-                        # 单门店：产品间延迟1秒
-                        if i < len(target_stores):  # 不是最后一个
-                            self._interruptible_sleep(1)
-                    else:
-                        # 多门店：按原逻辑
-                        if len(target_stores) > 30:
-                            if i > 30:
-                                self._interruptible_sleep(2)
-                            else:
-                                self._interruptible_sleep(1.5)
-                        else:
-                            self._interruptible_sleep(1)
-                        
-                        if i % 5 == 0:
-                            self._interruptible_sleep(3)
-                            logger.info(f"已查询 {i}/{len(target_stores)} 个门店，继续...")
-                        
-                        if i % 20 == 0 and i < len(target_stores):
-                            logger.info(f"已查询{i}个门店，休息10秒以避免限制...")
-                            self._interruptible_sleep(10)
+                    if i % 5 == 0:
+                        logger.info(f"已查询 {i}/{len(target_stores)} 个门店，继续...")
                     
                 except Exception as e:
                     logger.warning(f"查询门店 {store_number} 时出错: {e}")
@@ -534,21 +1598,52 @@ class AppleStoreMonitorEnhanced:
         return results
     
     def _save_to_history(self, part_number: str, data: Dict):
-        """保存库存历史记录"""
+        """记录库存历史（只在某个门店的库存状态变化时追加记录）"""
         if not self.config.get('save_history', True):
             return
         
-        if part_number not in self.stock_history:
-            self.stock_history[part_number] = []
+        changes = self.history.record(part_number, data['result'])
+        if self.history_store is not None:
+            self.history_store.add(changes, self.history.drain_touched())
+        if self.history_exporter is not None:
+            self.history_exporter.write_transitions(changes)
+    
+    def _diff_availability(self):
+        """
+        比较状态矩阵，得到上次比较以来的变化（保存在 round_changes）并输出汇总
         
-        self.stock_history[part_number].append({
-            'timestamp': datetime.now().isoformat(),
-            'data': data
-        })
+        变化检测和统计都是整矩阵运算，不再逐个型号、逐个门店遍历结果字典
+        """
+        if self.availability is None:
+            return
         
-        # 只保留最近100条记录
-        if len(self.stock_history[part_number]) > 100:
-            self.stock_history[part_number] = self.stock_history[part_number][-100:]
+        self.round_changes = self.availability.diff()
+        restocked = AvailabilityMatrix.newly_available(self.round_changes)
+        stats = self.availability.get_stats()
+        logger.info(f"🔀 状态变化 {len(self.round_changes)} 个组合（新增有货 {len(restocked)} 个）｜"
+                    f"有货 {stats['available']} / 无货 {stats['unavailable']} / "
+                    f"不可取货 {stats['ineligible']} / 未观测 {stats['unknown']}")
+        for change in restocked:
+            logger.info(f"   🆕 {AvailabilityMatrix.describe(change)}")
+    
+    def _flush_history(self, force: bool = True):
+        """把本轮的历史记录批量写入数据库和导出文件（连续模式下按 flush_interval 合并写入）"""
+        for sink in (self.history_store, self.history_exporter):
+            if sink is None:
+                continue
+            if force:
+                sink.flush()
+            else:
+                sink.maybe_flush()
+    
+    def save_checkpoint(self, force: bool = True):
+        """保存检查点（force 为 False 时按 checkpoint.interval 限制频率）"""
+        if self.checkpoint is None:
+            return
+        if force:
+            self.checkpoint.save(self)
+        else:
+            self.checkpoint.maybe_save(self)
     
     def get_all_stores(self) -> List[Dict]:
         """获取所有门店列表"""
@@ -563,14 +1658,31 @@ class AppleStoreMonitorEnhanced:
         return [store for store in self.stores.values() if store.get('district') == district]
     
     def export_history(self, filename: str = None):
-        """导出库存历史记录"""
+        """
+        导出库存历史记录（当前状态表 + 状态变化记录）
+        
+        启用流式导出时记录已经逐条追加到 JSONL 文件，这里只写完缓冲区，不再生成整个 JSON 文件
+        """
+        if self.history_store is not None:
+            self._flush_history()
+            logger.info(f"历史记录已写入数据库: {self.history_store.db_file}"
+                        f"（本次运行 {self.history_store.written} 次状态变化）")
+        
+        if self.history_exporter is not None and not filename:
+            self.history_exporter.close()
+            logger.info(f"历史记录已流式导出到: {self.history_exporter.path}"
+                        f"（本次运行 {self.history_exporter.lines} 行，轮转 {self.history_exporter.rotations} 次）")
+            return True
+        
         if not filename:
             filename = f"stock_history_{self.region}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.stock_history, f, ensure_ascii=False, indent=2)
-            logger.info(f"历史记录已导出到: {filename}")
+                json.dump(self.history.to_dict(), f, ensure_ascii=False)
+            stats = self.history.get_stats()
+            logger.info(f"历史记录已导出到: {filename}"
+                        f"（{stats['pairs']} 个组合，{stats['transitions']} 次状态变化）")
             return True
         except Exception as e:
             logger.error(f"导出历史记录失败: {e}")
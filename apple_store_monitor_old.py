@@ -9,9 +9,10 @@ Apple Store 库存监控核心模块
 import requests
 import time
 import json
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 from datetime import datetime
 from logger_config import setup_logger
+from rate_limiter import create_rate_limiter
 
 logger = setup_logger()
 
@@ -37,6 +38,7 @@ class AppleStoreMonitor:
         self.session = self._create_session()
         self.stores = self._load_stores()
         self.stock_history = {}
+        self.rate_limiter = create_rate_limiter(config, name='CN')
     
     def _interruptible_sleep(self, seconds: float):
         """
@@ -264,12 +266,12 @@ class AppleStoreMonitor:
         logger.info(f"📦 {len(products)} 个产品 × {len(target_stores)} 个门店")
         logger.info(f"{'='*80}\n")
         
-        # 步骤3: 逐个发送请求，随机间隔
+        # 步骤3: 逐个发送请求，节奏由限速器控制
         error_count = 0  # 连续错误计数
         
         for i, combo in enumerate(combinations, 1):
-            # 检查是否收到停止信号
-            if self.stop_event and self.stop_event.is_set():
+            # 等待限速器放行（收到停止信号时立即返回）
+            if not self.rate_limiter.acquire(self.stop_event):
                 logger.info("检测到停止信号，中断查询")
                 break
             
@@ -302,92 +304,15 @@ class AppleStoreMonitor:
                     
                     if error_count >= 3:
                         logger.error(f"🛑 连续触发限制，停止本轮剩余 {len(combinations) - i} 个请求")
-                        logger.error(f"💡 建议：增加 check_interval 或减少产品/门店数量")
+                        logger.error("💡 建议：增加 check_interval 或减少产品/门店数量")
                         break
             
             except Exception as e:
                 logger.error(f"查询失败 {product_name} @ {store_number}: {e}")
-            
-            # 随机延迟（最后一个不延迟）
-            if i < len(combinations):
-                # 随机延迟：3-6秒（正态分布更自然）
-                delay = random.gauss(4.5, 0.8)  # 均值4.5秒，标准差0.8
-                delay = max(3, min(6, delay))  # 限制在3-6秒
-                
-                logger.debug(f"⏳ [{i}/{len(combinations)}] 等待 {delay:.1f}秒 后发送下一个请求...")
-                self._interruptible_sleep(delay)
         
         logger.info(f"\n✅ 本轮完成，共检查 {len(combinations)} 个组合")
         logger.info(f"📊 结果: {len(results)} 个产品")
         
-        return results
-                # 如果已决定跳过，直接跳过
-                if skip_remaining:
-                    logger.info(f"跳过门店 {store_number}（已触发限制保护）")
-                    continue
-                
-                try:
-                    result = self.check_product_availability(part_number, store_number)
-                    
-                    if result.get('success') and 'stores' in result:
-                        # 合并门店数据
-                        all_stores.update(result['stores'])
-                        available_stores.extend(result.get('available_stores', []))
-                        error_count = 0  # 重置错误计数
-                    elif 'HTTP 541' in str(result.get('error', '')):
-                        # 检测到HTTP 541错误
-                        error_count += 1
-                        
-                        if error_count >= 3:
-                            # 连续3次错误，跳过该产品的剩余门店
-                            logger.warning(f"⚠️  连续{error_count}次遇到API限制！")
-                            logger.warning(f"为保护IP，跳过该产品的剩余 {len(target_stores) - i} 个门店")
-                            logger.warning(f"建议：减少监控门店数量，或增加检查间隔")
-                            skip_remaining = True
-                            continue
-                    
-                    # 基础延迟：每个门店查询后延迟
-                    # 根据门店总数和当前查询数调整延迟时间
-                    if len(target_stores) > 30:
-                        # 大量门店时
-                        if i > 30:
-                            self._interruptible_sleep(2)  # 查询30个后，延迟更长
-                        else:
-                            self._interruptible_sleep(1.5)
-                    else:
-                        self._interruptible_sleep(1)
-                    
-                    # 每5个门店额外延迟
-                    if i % 5 == 0:
-                        self._interruptible_sleep(3)
-                        logger.info(f"已查询 {i}/{len(target_stores)} 个门店，继续...")
-                    
-                    # 每查询20个门店，额外休息10秒
-                    if i % 20 == 0 and i < len(target_stores):
-                        logger.info(f"已查询{i}个门店，休息10秒以避免限制...")
-                        self._interruptible_sleep(10)
-                    
-                except Exception as e:
-                    logger.warning(f"查询门店 {store_number} 时出错: {e}")
-                    continue
-            
-            results[part_number] = {
-                'product': product,
-                'result': {
-                    'success': True,
-                    'part_number': part_number,
-                    'stores': all_stores,
-                    'available_stores': available_stores,
-                    'requested_stores_count': len(target_stores),  # 实际请求的门店数
-                    'responded_stores_count': len(all_stores),     # API返回数据的门店数
-                    'requested_stores': target_stores,  # 请求的门店列表
-                    'timestamp': datetime.now().isoformat()
-                }
-            }
-            
-            # 记录历史
-            self._save_to_history(part_number, results[part_number])
-        
         return results
     
     def _save_to_history(self, part_number: str, data: Dict):
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+库存状态矩阵模块
+按 型号 × 门店 维护一张 uint8 状态码矩阵和一张最近观测时间矩阵，每个响应到达时原地更新。
+本轮变化由当前矩阵与上一轮矩阵的向量化比较得出，汇总统计（各状态组合数、各型号有货门店数、
+过期组合数）也都是整矩阵运算，不需要逐个型号、逐个门店遍历嵌套字典。
+几百个型号 × 全部门店时，每轮的变化检测和统计只需要常数次 Python 调用
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# 状态码
+UNKNOWN = 0       # 尚未观测
+UNAVAILABLE = 1   # 无货
+INELIGIBLE = 2    # 该门店不支持取货
+AVAILABLE = 3     # 有货
+
+STATE_CODES = {'unavailable': UNAVAILABLE, 'ineligible': INELIGIBLE, 'available': AVAILABLE}
+STATE_NAMES = ('unknown', 'unavailable', 'ineligible', 'available')
+
+# 一条变化: (型号, 门店, 原状态码, 新状态码)
+Change = Tuple[str, str, int, int]
+
+
+def state_code(stock) -> int:
+    """门店结果（StoreStock 或同结构的字典）对应的状态码"""
+    display = stock.get('pickup_display')
+    if display is None:
+        return AVAILABLE if stock.get('available') else UNAVAILABLE
+    return STATE_CODES.get(display, UNAVAILABLE)
+
+
+class AvailabilityMatrix:
+    """
+    型号 × 门店 状态矩阵
+    
+    codes[行, 列] 为状态码，last_seen[行, 列] 为最近观测时间（Unix 时间戳，0 表示未观测）；
+    行列下标分别由 part_index / store_index 给出，出现新的型号或门店时矩阵自动扩展
+    """
+    
+    def __init__(self, part_numbers: Optional[List[str]] = None, store_numbers: Optional[List[str]] = None):
+        """
+        初始化状态矩阵
+        
+        Args:
+            part_numbers: 预先分配行的型号
+            store_numbers: 预先分配列的门店编号
+        """
+        self.part_index: Dict[str, int] = {}
+        self.store_index: Dict[str, int] = {}
+        self.part_numbers: List[str] = []
+        self.store_numbers: List[str] = []
+        
+        self.codes = np.zeros((0, 0), dtype=np.uint8)
+        self.last_seen = np.zeros((0, 0), dtype=np.float64)
+        self._previous = np.zeros((0, 0), dtype=np.uint8)  # 上次 diff() 时的状态码
+        
+        self.updates = 0
+        self._ensure(part_numbers or [], store_numbers or [])
+    
+    @classmethod
+    def from_config(cls, config: dict) -> Optional['AvailabilityMatrix']:
+        """
+        根据配置文件的 availability_matrix 段创建状态矩阵
+        
+        availability_matrix.enabled 为 false 或未安装 numpy 时返回 None
+        """
+        if not (config.get('availability_matrix', {}) or {}).get('enabled', False):
+            return None
+        if not NUMPY_AVAILABLE:
+            logger.warning("未安装 numpy，库存状态矩阵已禁用（pip install numpy）")
+            return None
+        
+        products = config.get('target_products', [])
+        return cls([product['part_number'] for product in products if product.get('part_number')],
+                   config.get('target_stores') or [])
+    
+    def _ensure(self, part_numbers: List[str], store_numbers: List[str]):
+        """为新出现的型号和门店分配行列（三张矩阵同步扩展）"""
+        new_parts = [part for part in dict.fromkeys(part_numbers) if part not in self.part_index]
+        new_stores = [store for store in dict.fromkeys(store_numbers) if store not in self.store_index]
+        if not new_parts and not new_stores:
+            return
+        
+        for part_number in new_parts:
+            self.part_index[part_number] = len(self.part_numbers)
+            self.part_numbers.append(part_number)
+        for store_number in new_stores:
+            self.store_index[store_number] = len(self.store_numbers)
+            self.store_numbers.append(store_number)
+        
+        padding = ((0, len(new_parts)), (0, len(new_stores)))
+        self.codes = np.pad(self.codes, padding)
+        self.last_seen = np.pad(self.last_seen, padding)
+        self._previous = np.pad(self._previous, padding)
+    
+    def update(self, part_number: str, result, when: Optional[float] = None):
+        """
+        用一个型号的查询结果原地更新对应的行
+        
+        失败的结果和没有响应的门店保持原状态
+        
+        Args:
+            part_number: 商品型号编号
+            result: 查询结果（ProductStock 或同结构的字典）
+            when: 观测时间（Unix 时间戳），默认为当前时间
+        """
+        if not result.get('success', False):
+            return
+        stores = result.get('stores') or {}
+        if not stores:
+            return
+        
+        self._ensure([part_number], list(stores))
+        row = self.part_index[part_number]
+        columns = [self.store_index[store_number] for store_number in stores]
+        self.codes[row, columns] = [state_code(stock) for stock in stores.values()]
+        self.last_seen[row, columns] = time.time() if when is None else when
+        self.updates += 1
+    
+    def restore_states(self, states: Dict[Tuple[str, str], str]):
+        """
+        用已知的状态（重启前的当前状态表）填充矩阵，并作为 diff() 的基准
+        
+        Args:
+            states: {(型号, 门店): 状态（pickupDisplay）}
+        """
+        self._ensure([part for part, _ in states], [store for _, store in states])
+        for (part_number, store_number), state in states.items():
+            self.codes[self.part_index[part_number], self.store_index[store_number]] = \
+                STATE_CODES.get(state, UNAVAILABLE)
+        np.copyto(self._previous, self.codes)
+    
+    def diff(self) -> List[Change]:
+        """
+        与上次调用时的矩阵比较，返回其间状态变化的组合，并把当前矩阵记为新的基准
+        
+        首次观测（未知 → 某状态）也算变化
+        """
+        rows, columns = np.nonzero(self.codes != self._previous)
+        changes = [(self.part_numbers[row], self.store_numbers[column],
+                    int(self._previous[row, column]), int(self.codes[row, column]))
+                   for row, column in zip(rows.tolist(), columns.tolist())]
+        np.copyto(self._previous, self.codes)
+        return changes
+    
+    @staticmethod
+    def newly_available(changes: List[Change]) -> List[Change]:
+        """变化中由无货（或未知）变为有货的组合"""
+        return [change for change in changes if change[3] == AVAILABLE and change[2] != AVAILABLE]
+    
+    def available_pairs(self) -> List[Tuple[str, str]]:
+        """当前有货的 (型号, 门店) 列表"""
+        rows, columns = np.nonzero(self.codes == AVAILABLE)
+        return [(self.part_numbers[row], self.store_numbers[column])
+                for row, column in zip(rows.tolist(), columns.tolist())]
+    
+    def available_by_part(self) -> Dict[str, int]:
+        """各型号当前有货的门店数（只列出有货的型号）"""
+        counts = np.count_nonzero(self.codes == AVAILABLE, axis=1)
+        return {self.part_numbers[row]: int(counts[row]) for row in np.flatnonzero(counts).tolist()}
+    
+    def stale_count(self, max_age: float, now: Optional[float] = None) -> int:
+        """观测过、但最近一次观测早于 max_age 秒之前的组合数"""
+        cutoff = (time.time() if now is None else now) - max_age
+        return int(np.count_nonzero((self.last_seen > 0) & (self.last_seen < cutoff)))
+    
+    def get_stats(self) -> Dict:
+        """各状态的组合数和矩阵大小"""
+        counts = np.bincount(self.codes.ravel(), minlength=len(STATE_NAMES))
+        stats = {name: int(counts[code]) for code, name in enumerate(STATE_NAMES)}
+        stats.update(parts=len(self.part_numbers), stores=len(self.store_numbers), updates=self.updates)
+        return stats
+    
+    @staticmethod
+    def describe(change: Change) -> str:
+        """一条变化的可读描述"""
+        part_number, store_number, old, new = change
+        return f"{part_number} @ {store_number}: {STATE_NAMES[old]} → {STATE_NAMES[new]}"
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+有货后的突发确认模块
+某个"产品-门店"组合刚变为有货时，同系列的其他型号（颜色、容量）和同城门店
+很可能同时补货。常规的随机打散要等一整轮才会查到它们，这里在检测到有货后
+立即用预留的一部分请求预算优先查询这些相关组合，查询间隔逐步拉长，
+窗口结束后回到常规调度
+"""
+
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+from logger_config import setup_logger
+from rate_limiter import TokenBucket
+from transition_log import is_available_state
+
+logger = setup_logger()
+
+DEFAULT_MODELS_FILES = {
+    'CN': 'iphone17_all_models.json',
+    'HK': 'iphone17_promax_hongkong_complete.json'
+}
+DEFAULT_BUDGET_FRACTION = 0.3   # 突发确认最多使用的请求预算比例
+DEFAULT_WINDOW = 120            # 每次检测后的确认窗口（秒）
+DEFAULT_INITIAL_INTERVAL = 5    # 相关组合的首个重复查询间隔（秒）
+DEFAULT_DECAY_FACTOR = 2.0      # 每查询一次，间隔乘以该系数
+DEFAULT_MAX_ACTIVE = 40         # 同时处于确认中的组合上限
+
+
+def load_model_catalog(filename: str) -> Dict[str, Dict]:
+    """
+    加载型号目录，返回 {型号编号: 型号信息（含 series）}
+    
+    支持 iphone17_all_models.json（列表，每项有 series）和
+    香港型号文件（{'device': 系列, 'models': [...]}）两种格式
+    """
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"找不到型号目录 {filename}，突发确认只查询已监控的型号")
+        return {}
+    except Exception as e:
+        logger.warning(f"加载型号目录失败: {e}")
+        return {}
+    
+    if isinstance(data, dict):
+        series = data.get('device', '')
+        models = [dict(model, series=model.get('series', series)) for model in data.get('models', [])]
+    else:
+        models = data
+    
+    catalog = {}
+    for model in models:
+        part_number = model.get('part_number')
+        if part_number:
+            if not model.get('name'):
+                model = dict(model, name=f"{model.get('series', '')} {model.get('color', '')} {model.get('storage', '')}".strip())
+            catalog[part_number] = model
+    return catalog
+
+
+def product_series(product: Dict) -> str:
+    """商品所属系列（配置中没有 series 时从名称中去掉颜色和容量）"""
+    if product.get('series'):
+        return product['series']
+    name = product.get('name', '')
+    for field in ('color', 'storage'):
+        if product.get(field):
+            name = name.replace(product[field], '')
+    return ' '.join(name.split())
+
+
+class ProbeState:
+    """一个处于确认中的相关组合"""
+    
+    __slots__ = ('product', 'due', 'interval', 'expires')
+    
+    def __init__(self, product: Dict, due: float, interval: float, expires: float):
+        self.product = product
+        self.due = due
+        self.interval = interval
+        self.expires = expires
+
+
+class BurstConfirm:
+    """
+    有货检测后的相关组合突发查询
+    
+    检测到 (型号, 门店) 变为有货时，相关组合为：
+    同系列其他型号 × (该门店 + 同城门店)，以及该型号 × 同城门店。
+    相关组合立即到期，之后查询间隔从 initial_interval 开始每次乘以 decay_factor，
+    window 秒后不再查询。突发请求另有一个速率为 主预算 × budget_fraction 的令牌桶，
+    同时仍经过主限速器，所以总请求速率不变，只是临时让出一部分给相关组合
+    """
+    
+    def __init__(self, stores: Dict[str, Dict], catalog: Optional[Dict[str, Dict]] = None,
+                 budget_fraction: float = DEFAULT_BUDGET_FRACTION, window: float = DEFAULT_WINDOW,
+                 initial_interval: float = DEFAULT_INITIAL_INTERVAL, decay_factor: float = DEFAULT_DECAY_FACTOR,
+                 max_active: int = DEFAULT_MAX_ACTIVE, monitored_only: bool = True):
+        """
+        初始化突发确认
+        
+        Args:
+            stores: 区域门店列表 {门店编号: 门店信息}（用于查找同城门店）
+            catalog: 型号目录 {型号编号: 型号信息}（用于查找同系列型号）
+            budget_fraction: 突发确认最多使用的请求预算比例
+            window: 每次检测后的确认窗口（秒）
+            initial_interval: 首个重复查询间隔（秒）
+            decay_factor: 查询间隔的增长系数
+            max_active: 同时处于确认中的组合上限
+            monitored_only: 是否只查询已监控的型号和门店
+        """
+        self.stores = stores
+        self.catalog = catalog or {}
+        self.budget_fraction = min(max(0.01, float(budget_fraction)), 1.0)
+        self.window = max(1.0, float(window))
+        self.initial_interval = max(0.1, float(initial_interval))
+        self.decay_factor = max(1.0, float(decay_factor))
+        self.max_active = max(1, int(max_active))
+        self.monitored_only = monitored_only
+        
+        self.products: Dict[str, Dict] = {}
+        self.target_stores: List[str] = []
+        self.last_state: Dict[Tuple[str, str], bool] = {}
+        self.active: Dict[Tuple[str, str], ProbeState] = {}
+        self.limiter: Optional[TokenBucket] = None
+        
+        self.detections = 0
+        self.probes = 0
+        self.confirmed = 0
+    
+    @classmethod
+    def from_config(cls, config: dict, region: str, stores: Dict[str, Dict]) -> Optional['BurstConfirm']:
+        """
+        根据配置文件的 burst_confirm 段创建
+        
+        burst_confirm.enabled 为 false 时返回 None
+        """
+        burst_config = config.get('burst_confirm', {}) or {}
+        if not burst_config.get('enabled', False):
+            return None
+        
+        models_file = burst_config.get('models_file', DEFAULT_MODELS_FILES.get(region))
+        return cls(
+            stores=stores,
+            catalog=load_model_catalog(models_file) if models_file else {},
+            budget_fraction=burst_config.get('budget_fraction', DEFAULT_BUDGET_FRACTION),
+            window=burst_config.get('window', DEFAULT_WINDOW),
+            initial_interval=burst_config.get('initial_interval', DEFAULT_INITIAL_INTERVAL),
+            decay_factor=burst_config.get('decay_factor', DEFAULT_DECAY_FACTOR),
+            max_active=burst_config.get('max_active', DEFAULT_MAX_ACTIVE),
+            monitored_only=burst_config.get('monitored_only', True)
+        )
+    
+    def set_targets(self, products: List[Dict], target_stores: List[str]):
+        """更新当前监控的商品和门店"""
+        self.products = {product['part_number']: product for product in products if product.get('part_number')}
+        self.target_stores = list(target_stores)
+    
+    def restore_states(self, states: Dict[Tuple[str, str], str]):
+        """
+        用已知的状态（重启前的当前状态表）作为比较基准，重启后已经有货的组合不会被当成新出现的有货
+        
+        Args:
+            states: {(型号, 门店): 状态（pickupDisplay）}
+        """
+        self.last_state.update({key: is_available_state(state) for key, state in states.items()})
+    
+    def _siblings(self, part_number: str) -> List[Dict]:
+        """同系列的其他型号"""
+        product = self.catalog.get(part_number) or self.products.get(part_number)
+        if product is None:
+            return []
+        series = product_series(product)
+        if not series:
+            return []
+        
+        candidates = dict(self.products)
+        if not self.monitored_only:
+            for catalog_part, model in self.catalog.items():
+                candidates.setdefault(catalog_part, model)
+        
+        return [candidate for candidate_part, candidate in candidates.items()
+                if candidate_part != part_number
+                and product_series(self.catalog.get(candidate_part, candidate)) == series]
+    
+    def _nearby_stores(self, store_number: str) -> List[str]:
+        """同城门店（不含该门店本身）"""
+        city = (self.stores.get(store_number) or {}).get('city')
+        if not city:
+            return []
+        pool = self.target_stores if self.monitored_only else self.stores.keys()
+        return [other for other in pool
+                if other != store_number and (self.stores.get(other) or {}).get('city') == city]
+    
+    def _related_pairs(self, part_number: str, store_number: str) -> List[Tuple[Dict, str]]:
+        """检测到有货的组合的相关组合"""
+        product = self.products.get(part_number) or self.catalog.get(part_number) or {'part_number': part_number}
+        nearby = self._nearby_stores(store_number)
+        
+        pairs = [(product, other) for other in nearby]
+        for sibling in self._siblings(part_number):
+            pairs.extend((sibling, other) for other in [store_number] + nearby)
+        return pairs
+    
+    def observe(self, part_number: str, stores: Dict):
+        """
+        记录一个响应中各门店的库存状态，由无货变为有货的组合触发突发确认
+        
+        首次观测的组合只记录状态（启动时已经有货不代表刚刚补货）
+        
+        Args:
+            part_number: 商品型号编号
+            stores: {门店编号: 门店库存}
+        """
+        now = time.monotonic()
+        for store_number, stock in stores.items():
+            available = bool(stock.get('available'))
+            key = (part_number, store_number)
+            previous = self.last_state.get(key)
+            self.last_state[key] = available
+            
+            if key in self.active and available and not previous:
+                self.confirmed += 1
+            if previous is None or previous or not available:
+                continue
+            if self.monitored_only and (part_number not in self.products or store_number not in self.target_stores):
+                continue
+            
+            self.detections += 1
+            added = 0
+            for product, other_store in self._related_pairs(part_number, store_number):
+                related_key = (product['part_number'], other_store)
+                if related_key in self.active or len(self.active) >= self.max_active:
+                    continue
+                self.active[related_key] = ProbeState(product, now, self.initial_interval, now + self.window)
+                added += 1
+            
+            if added:
+                logger.info(f"⚡ 突发确认: {part_number} @ {store_number} 有货，"
+                            f"优先查询 {added} 个相关组合（{self.window:.0f}秒内）")
+    
+    def peek_unit(self, rate_per_minute: float) -> Optional[Dict]:
+        """
+        查看下一个到期的相关组合（突发预算不足或没有到期组合时返回 None）
+        
+        只查看不占用：确实发送时调用 commit_unit() 扣减突发预算并拉长该组合的查询间隔，
+        被熔断器拒绝时组合保持到期，下次仍可以取出
+        
+        Args:
+            rate_per_minute: 主限速器当前速率（突发预算按比例跟随）
+        
+        Returns:
+            请求单元 {'store_number', 'combos', 'burst': True}
+        """
+        if not self.active:
+            return None
+        
+        now = time.monotonic()
+        for key in [key for key, state in self.active.items() if state.expires <= now]:
+            del self.active[key]
+        
+        due = [(state.due, key) for key, state in self.active.items() if state.due <= now]
+        if not due:
+            return None
+        
+        burst_rate = max(0.1, rate_per_minute * self.budget_fraction)
+        if self.limiter is None:
+            self.limiter = TokenBucket(burst_rate, burst=3, jitter=0, name='burst')
+        elif self.limiter.rate_per_minute != burst_rate:
+            self.limiter.rate_per_minute = burst_rate
+        if self.limiter.peek() > 0:
+            return None
+        
+        _, key = min(due)
+        state = self.active[key]
+        part_number, store_number = key
+        return {
+            'store_number': store_number,
+            'burst': True,
+            'combos': [{
+                'product': state.product,
+                'part_number': part_number,
+                'product_name': state.product.get('name', part_number),
+                'store_number': store_number
+            }]
+        }
+    
+    def commit_unit(self, unit: Dict):
+        """确认发送 peek_unit() 取出的单元：扣减突发预算，该组合的下一次查询按间隔顺延"""
+        self.limiter.try_acquire()
+        self.probes += 1
+        
+        state = self.active.get((unit['combos'][0]['part_number'], unit['store_number']))
+        if state is not None:
+            state.due = time.monotonic() + state.interval
+            state.interval *= self.decay_factor
+    
+    def next_due(self) -> Optional[float]:
+        """距下一个突发确认请求可以发出的秒数（没有确认中的组合时返回 None）"""
+        if not self.active:
+            return None
+        
+        wait = min(state.due for state in self.active.values()) - time.monotonic()
+        if self.limiter is not None:
+            # 已有到期组合时，还要等突发预算补充令牌
+            wait = max(wait, self.limiter.peek())
+        return max(0.0, wait)
+    
+    def get_stats(self) -> Dict:
+        """获取突发确认统计"""
+        return {
+            'detections': self.detections,
+            'probes': self.probes,
+            'confirmed': self.confirmed,
+            'active': len(self.active)
+        }
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+监控状态检查点模块
+定期把监控器的运行状态原子地写入检查点文件（先写临时文件、fsync，再替换），
+进程崩溃或重启后从检查点热启动，不必从零开始：
+    - 每个"型号-门店"组合最近的库存状态（第一轮不会把所有组合当成新观测，状态矩阵的变化基准也随之恢复）
+    - 连续模式下各请求单元的到期时间（按原计划继续，而不是全部立即到期、集中发出一批请求）
+    - 响应缓存中仍在有效期内的条目
+学到的请求速率和补货时段分布已有各自的状态文件，保存检查点时一并写入
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from result_model import StoreStock
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_CHECKPOINT_FILE = 'checkpoint_{region}.json'
+DEFAULT_INTERVAL = 30.0        # 两次保存之间的最短间隔（秒）
+DEFAULT_MAX_AGE = 86400.0      # 超过该时长（秒）的检查点不再使用
+CHECKPOINT_FORMAT = 'checkpoint-v1'
+
+
+class MonitorCheckpoint:
+    """
+    监控器检查点
+    
+    save() 收集监控器各组件的状态写入文件，restore() 在监控器初始化时恢复
+    """
+    
+    def __init__(self, path: str, interval: float = DEFAULT_INTERVAL, max_age: float = DEFAULT_MAX_AGE):
+        """
+        初始化检查点
+        
+        Args:
+            path: 检查点文件路径
+            interval: maybe_save() 两次保存之间的最短间隔（秒）
+            max_age: 超过该时长（秒）的检查点不再使用
+        """
+        self.path = path
+        self.interval = max(1.0, float(interval))
+        self.max_age = max(0.0, float(max_age))
+        
+        self._last_save = time.monotonic()
+        self.saves = 0
+    
+    @classmethod
+    def from_config(cls, config: dict, region: str) -> Optional['MonitorCheckpoint']:
+        """
+        根据配置文件的 checkpoint 段创建检查点
+        
+        checkpoint.enabled 为 false 时返回 None；文件名中的 {region} 替换为区域代码
+        """
+        checkpoint_config = config.get('checkpoint', {}) or {}
+        if not checkpoint_config.get('enabled', False):
+            return None
+        
+        return cls(
+            path=checkpoint_config.get('file', DEFAULT_CHECKPOINT_FILE).replace('{region}', region),
+            interval=checkpoint_config.get('interval', DEFAULT_INTERVAL),
+            max_age=checkpoint_config.get('max_age', DEFAULT_MAX_AGE)
+        )
+    
+    def capture(self, monitor) -> Dict:
+        """收集监控器的当前状态"""
+        state = {
+            'format': CHECKPOINT_FORMAT,
+            'region': monitor.region,
+            'saved_at': time.time(),
+            'saved_at_iso': datetime.now().isoformat(timespec='seconds'),
+            'states': monitor.history.current_to_dict()
+        }
+        if monitor.rolling_scheduler is not None:
+            state['schedule'] = monitor.rolling_scheduler.snapshot()
+        if monitor.response_cache is not None:
+            state['cache'] = [
+                [part_number, store_number, round(remaining, 3),
+                 stock.get('store_name', ''), stock.get('pickup_display'), stock.get('pickup_quote', '')]
+                for part_number, store_number, remaining, stock in monitor.response_cache.snapshot(monitor.region)
+            ]
+        return state
+    
+    def save(self, monitor):
+        """原子地写入检查点（崩溃时文件要么是旧的完整版本，要么是新的完整版本）"""
+        self._last_save = time.monotonic()
+        try:
+            state = self.capture(monitor)
+            tmp_file = f"{self.path}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.path)
+            self.saves += 1
+        except Exception as e:
+            logger.warning(f"保存检查点失败: {e}")
+            return
+        
+        # 学到的速率和补货时段分布写入各自的状态文件
+        if monitor.pacing is not None:
+            monitor.pacing.save()
+        if monitor.restock_profile is not None:
+            monitor.restock_profile.save()
+    
+    def maybe_save(self, monitor):
+        """距上次保存超过 interval 时保存"""
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save(monitor)
+    
+    def load(self, region: str) -> Optional[Dict]:
+        """
+        读取检查点
+        
+        Returns:
+            检查点字典；文件不存在、格式不符、区域不同或已过期时返回 None
+        """
+        if not os.path.exists(self.path):
+            return None
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取检查点失败: {e}，冷启动")
+            return None
+        
+        if state.get('format') != CHECKPOINT_FORMAT or state.get('region') != region:
+            logger.warning(f"检查点 {self.path} 格式或区域不符，冷启动")
+            return None
+        
+        age = time.time() - float(state.get('saved_at', 0))
+        if self.max_age and age > self.max_age:
+            logger.info(f"检查点已保存 {age / 3600:.1f} 小时，超过有效期，冷启动")
+            return None
+        return state
+    
+    def restore(self, monitor) -> bool:
+        """
+        从检查点恢复监控器状态（在监控器初始化时调用）
+        
+        Returns:
+            是否热启动
+        """
+        started = time.perf_counter()
+        state = self.load(monitor.region)
+        if state is None:
+            return False
+        
+        elapsed = max(0.0, time.time() - float(state['saved_at']))
+        
+        # 启用 SQLite 历史存储时当前状态以数据库为准（每轮提交，比检查点新）
+        if monitor.history_store is None:
+            monitor.history.load_current(state.get('states'))
+        
+        if monitor.rolling_scheduler is not None and state.get('schedule'):
+            monitor.rolling_scheduler.restore(state['schedule'], elapsed)
+        
+        restored_cache = 0
+        if monitor.response_cache is not None and state.get('cache'):
+            entries = [
+                (part_number, store_number, remaining - elapsed,
+                 StoreStock(monitor._store_ref(store_number, store_name), pickup_display, pickup_quote))
+                for part_number, store_number, remaining, store_name, pickup_display, pickup_quote in state['cache']
+                if remaining > elapsed
+            ]
+            monitor.response_cache.restore(monitor.region, entries)
+            restored_cache = len(entries)
+        
+        logger.info(f"♻️  已从检查点热启动（{elapsed:.0f}秒前保存）: {len(monitor.history.current)} 个组合的状态，"
+                    f"{len(state.get('schedule') or [])} 个请求单元的到期时间，{restored_cache} 条缓存，"
+                    f"耗时 {(time.perf_counter() - started) * 1000:.0f} 毫秒")
+        return True
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+区域熔断器模块
+某个区域的 API 在一段时间内失败率过高（541 风暴、大量超时）时暂停该区域的请求，
+冷却结束后先发一个试探请求，成功才恢复正常查询
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Dict, Optional
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+# 熔断器状态
+STATE_CLOSED = 'closed'        # 正常放行
+STATE_OPEN = 'open'            # 熔断中，拒绝请求
+STATE_HALF_OPEN = 'half_open'  # 冷却结束，只放行一个试探请求
+
+STATE_LABELS = {
+    STATE_CLOSED: '正常',
+    STATE_OPEN: '熔断中',
+    STATE_HALF_OPEN: '试探中'
+}
+
+
+class CircuitBreaker:
+    """
+    熔断器（关闭 → 打开 → 半开 → 关闭）
+    
+    关闭状态下统计最近 window_size 次请求的结果，样本数达到 min_requests
+    且失败率达到 failure_rate_threshold 时打开熔断器。打开后 cooldown 秒内
+    拒绝所有请求；冷却结束进入半开状态，只放行一个试探请求：
+    试探成功则关闭熔断器，失败则重新打开并把冷却时间翻倍（不超过 max_cooldown）。
+    """
+    
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, window_size: int = 10,
+                 min_requests: int = 5, cooldown: float = 120, max_cooldown: float = 900):
+        """
+        初始化熔断器
+        
+        Args:
+            name: 名称（通常为区域代码）
+            failure_rate_threshold: 打开熔断器的失败率（0-1）
+            window_size: 统计失败率的最近请求数
+            min_requests: 窗口内至少多少个样本才判断失败率
+            cooldown: 打开后的冷却时间（秒）
+            max_cooldown: 连续试探失败时冷却时间的上限（秒）
+        """
+        self.name = name
+        self.failure_rate_threshold = min(max(0.05, float(failure_rate_threshold)), 1.0)
+        self.window_size = max(1, int(window_size))
+        self.min_requests = min(max(1, int(min_requests)), self.window_size)
+        self.base_cooldown = max(1.0, float(cooldown))
+        self.max_cooldown = max(self.base_cooldown, float(max_cooldown))
+        
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._outcomes = deque(maxlen=self.window_size)
+        self._cooldown = self.base_cooldown
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.open_count = 0
+        self.rejected_count = 0
+    
+    @classmethod
+    def from_config(cls, config: dict, name: str) -> Optional['CircuitBreaker']:
+        """
+        根据配置文件的 circuit_breaker 段创建熔断器
+        
+        circuit_breaker.enabled 为 false 时返回 None
+        """
+        breaker_config = config.get('circuit_breaker', {}) or {}
+        if not breaker_config.get('enabled', False):
+            return None
+        
+        return cls(
+            name=name,
+            failure_rate_threshold=breaker_config.get('failure_rate_threshold', 0.5),
+            window_size=breaker_config.get('window_size', 10),
+            min_requests=breaker_config.get('min_requests', 5),
+            cooldown=breaker_config.get('cooldown', 120),
+            max_cooldown=breaker_config.get('max_cooldown', 900)
+        )
+    
+    @property
+    def state(self) -> str:
+        """当前状态（冷却结束的打开状态视为半开）"""
+        with self._lock:
+            self._check_cooldown(time.monotonic())
+            return self._state
+    
+    @property
+    def probe_in_flight(self) -> bool:
+        """半开状态下试探请求是否还没有返回"""
+        with self._lock:
+            return self._probe_in_flight
+    
+    def remaining_cooldown(self) -> float:
+        """距离可以发出试探请求还有多少秒（非打开状态为0）"""
+        with self._lock:
+            now = time.monotonic()
+            self._check_cooldown(now)
+            if self._state != STATE_OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._cooldown - now)
+    
+    def _check_cooldown(self, now: float):
+        """冷却时间已到则进入半开状态"""
+        if self._state == STATE_OPEN and now >= self._opened_at + self._cooldown:
+            self._state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"🔌 [{self.name}] 熔断冷却结束，准备发送试探请求")
+    
+    def _open(self, now: float, reason: str):
+        """打开熔断器"""
+        self._state = STATE_OPEN
+        self._opened_at = now
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        self.open_count += 1
+        logger.warning(f"⛔ [{self.name}] 熔断器打开（{reason}），{self._cooldown:.0f}秒内暂停请求")
+    
+    def can_attempt(self) -> bool:
+        """
+        是否可能放行一个请求（不占用半开状态的试探名额）
+        
+        用于"先判断再取出请求"的场景，真正发送前仍要调用 allow_request()
+        """
+        with self._lock:
+            self._check_cooldown(time.monotonic())
+            return self._state == STATE_CLOSED or (self._state == STATE_HALF_OPEN and not self._probe_in_flight)
+    
+    def allow_request(self) -> bool:
+        """
+        是否放行一个请求
+        
+        半开状态下只放行第一个调用者（试探请求），其余调用者被拒绝直到试探结果返回
+        """
+        with self._lock:
+            self._check_cooldown(time.monotonic())
+            
+            if self._state == STATE_CLOSED:
+                return True
+            
+            if self._state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logger.info(f"🔍 [{self.name}] 发送熔断试探请求")
+                return True
+            
+            self.rejected_count += 1
+            return False
+    
+    def record_success(self):
+        """记录一次成功的请求"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._state = STATE_CLOSED
+                self._probe_in_flight = False
+                self._cooldown = self.base_cooldown
+                self._outcomes.clear()
+                logger.info(f"✅ [{self.name}] 试探成功，熔断器关闭，恢复正常查询")
+                return
+            
+            self._outcomes.append(True)
+    
+    def record_failure(self):
+        """记录一次失败的请求（限流、服务端错误或网络错误）"""
+        with self._lock:
+            now = time.monotonic()
+            
+            if self._state == STATE_HALF_OPEN:
+                self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+                self._open(now, "试探请求失败")
+                return
+            
+            if self._state == STATE_OPEN:
+                # 熔断前已发出的在途请求，不重复计算
+                return
+            
+            self._outcomes.append(False)
+            if len(self._outcomes) < self.min_requests:
+                return
+            
+            failure_rate = self._outcomes.count(False) / len(self._outcomes)
+            if failure_rate >= self.failure_rate_threshold:
+                self._open(now, f"最近 {len(self._outcomes)} 次请求失败率 {failure_rate:.0%}")
+    
+    def get_stats(self) -> Dict:
+        """获取熔断器状态"""
+        remaining = self.remaining_cooldown()
+        with self._lock:
+            failures = self._outcomes.count(False)
+            return {
+                'name': self.name,
+                'state': self._state,
+                'state_label': STATE_LABELS[self._state],
+                'failure_rate': failures / len(self._outcomes) if self._outcomes else 0.0,
+                'remaining_cooldown': remaining,
+                'cooldown': self._cooldown,
+                'open_count': self.open_count,
+                'rejected_count': self.rejected_count
+            }
+
+
+# 每个区域一个熔断器，同一进程内的监控器共享
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(config: dict, region: str) -> Optional[CircuitBreaker]:
+    """
+    获取区域的熔断器（同一区域在进程内只创建一次）
+    
+    Args:
+        config: 配置字典（读取 circuit_breaker 段）
+        region: 区域代码（CN / HK）
+    
+    Returns:
+        熔断器；未启用时返回 None
+    """
+    with _breakers_lock:
+        if region not in _breakers:
+            breaker = CircuitBreaker.from_config(config, region)
+            if breaker is None:
+                return None
+            _breakers[region] = breaker
+        return _breakers[region]
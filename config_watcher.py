@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+配置热加载模块
+后台线程定期检查配置文件的修改时间（也可以发送 SIGHUP 立即触发），
+文件变化后读取并校验新配置，交给监控器在自己的线程中应用：
+新增的商品/门店组合加入调度，移除的组合不再查询，
+历史记录、响应缓存、连接池和节奏状态全部保留，不需要重启
+"""
+
+import os
+import json
+import signal
+import threading
+from typing import Callable, Optional
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_POLL_INTERVAL = 2.0  # 检查配置文件修改时间的间隔（秒）
+
+
+def load_config_file(config_path: str) -> Optional[dict]:
+    """
+    读取并校验配置文件
+    
+    Returns:
+        配置字典；文件不存在、格式错误或缺少必要字段时返回 None（保留当前配置）
+    """
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"配置文件不存在: {config_path}，保留当前配置")
+        return None
+    except json.JSONDecodeError as e:
+        logger.warning(f"配置文件格式错误: {e}，保留当前配置")
+        return None
+    except Exception as e:
+        logger.warning(f"读取配置文件失败: {e}，保留当前配置")
+        return None
+    
+    if not isinstance(config, dict):
+        logger.warning("新配置格式错误，保留当前配置")
+        return None
+    if not config.get('target_products') and not (config.get('subscriptions') or {}).get('enabled'):
+        logger.warning("新配置缺少 target_products，保留当前配置")
+        return None
+    return config
+
+
+class ConfigWatcher:
+    """
+    配置文件监视器
+    
+    检测到文件修改（或调用 trigger()）时读取新配置并调用 on_change(新配置)。
+    on_change 在监视线程中执行，应只登记新配置（例如 monitor.request_config_reload），
+    由监控线程在安全的时机应用
+    """
+    
+    def __init__(self, config_path: str, on_change: Callable[[dict], None],
+                 poll_interval: float = DEFAULT_POLL_INTERVAL):
+        """
+        初始化监视器
+        
+        Args:
+            config_path: 配置文件路径
+            on_change: 回调 (新配置)
+            poll_interval: 检查修改时间的间隔（秒）
+        """
+        self.config_path = config_path
+        self.on_change = on_change
+        self.poll_interval = max(0.2, float(poll_interval))
+        
+        self._signature = self._file_signature()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        
+        self.reload_count = 0
+    
+    @classmethod
+    def from_config(cls, config: dict, config_path: str,
+                    on_change: Callable[[dict], None]) -> Optional['ConfigWatcher']:
+        """
+        根据配置文件的 config_reload 段创建监视器
+        
+        config_reload.enabled 为 false 时返回 None
+        """
+        reload_config = config.get('config_reload', {}) or {}
+        if not reload_config.get('enabled', False):
+            return None
+        
+        return cls(config_path, on_change,
+                   poll_interval=reload_config.get('poll_interval', DEFAULT_POLL_INTERVAL))
+    
+    def _file_signature(self) -> Optional[tuple]:
+        """文件的 (修改时间, 大小)，文件不存在时为 None"""
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def trigger(self):
+        """立即重新加载（可以在信号处理函数中调用）"""
+        self._wakeup.set()
+    
+    def check(self, force: bool = False) -> bool:
+        """
+        检查配置文件，有变化时加载并调用 on_change
+        
+        Args:
+            force: 忽略修改时间，直接重新加载
+        
+        Returns:
+            是否加载了新配置
+        """
+        signature = self._file_signature()
+        if not force and signature == self._signature:
+            return False
+        self._signature = signature
+        
+        config = load_config_file(self.config_path)
+        if config is None:
+            return False
+        
+        self.reload_count += 1
+        logger.info(f"🔁 {'收到重新加载请求' if force else '检测到配置变更'}: {self.config_path}")
+        self.on_change(config)
+        return True
+    
+    def _run(self):
+        """监视线程主循环"""
+        while not self._stopped:
+            forced = self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            if self._stopped:
+                break
+            try:
+                self.check(force=forced)
+            except Exception as e:
+                logger.warning(f"应用新配置失败: {e}")
+    
+    def start(self):
+        """启动监视线程"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='config-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"👀 正在监视配置文件: {self.config_path}（修改后自动生效）")
+    
+    def stop(self):
+        """停止监视线程"""
+        self._stopped = True
+        self._wakeup.set()
+
+
+def install_sighup_handler(watchers):
+    """
+    收到 SIGHUP 时让所有监视器立即重新加载（不支持 SIGHUP 的平台上忽略）
+    
+    Args:
+        watchers: ConfigWatcher 列表
+    """
+    if not hasattr(signal, 'SIGHUP'):
+        return
+    
+    def handler(sig, frame):
+        # 信号处理函数中只做唤醒，读取和日志在监视线程中进行
+        for watcher in watchers:
+            watcher.trigger()
+    
+    signal.signal(signal.SIGHUP, handler)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+门店覆盖规划模块
+利用 pickup-message 接口 pl=true 时返回附近门店的特性，减少每轮请求数
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+
+class CoveragePlanner:
+    """
+    门店覆盖规划器
+    
+    查询某个门店（锚点）时，响应的 body.stores 会同时带回若干附近门店。
+    规划器记录每个锚点实际返回了哪些门店，然后用贪心集合覆盖
+    选出尽量少的锚点，使其响应覆盖全部目标门店。
+    还没有观测记录的目标门店直接查询（顺便学习它的邻居）。
+    """
+    
+    def __init__(self):
+        """初始化规划器"""
+        # 锚点门店编号 -> 最近一次查询返回的门店编号集合
+        self.neighbours: Dict[str, Set[str]] = {}
+    
+    def observe(self, anchor: str, returned_stores: Iterable[str]):
+        """
+        记录一次查询返回的门店
+        
+        以最近一次观测为准，附近门店列表变化时自动更新
+        
+        Args:
+            anchor: 被查询的门店编号
+            returned_stores: 响应中包含的门店编号
+        """
+        stores = set(returned_stores)
+        if not stores:
+            return
+        stores.add(anchor)
+        
+        if self.neighbours.get(anchor) != stores:
+            logger.debug(f"覆盖规划: {anchor} 返回 {len(stores)} 个门店")
+        self.neighbours[anchor] = stores
+    
+    def forget(self, anchor: str):
+        """删除某个锚点的观测记录（下次会重新直接查询学习）"""
+        self.neighbours.pop(anchor, None)
+    
+    def plan(self, target_stores: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        计算覆盖全部目标门店的最小锚点集合（贪心集合覆盖）
+        
+        Args:
+            target_stores: 目标门店编号列表
+        
+        Returns:
+            (锚点列表, 需直接查询的未知门店列表)
+        """
+        targets = set(target_stores)
+        
+        # 还没有观测记录的目标门店只能直接查询
+        unknown = [store for store in target_stores if store not in self.neighbours]
+        uncovered = targets - set(unknown)
+        
+        anchors = []
+        while uncovered:
+            best_anchor = None
+            best_gain = 0
+            for anchor, covered in self.neighbours.items():
+                gain = len(covered & uncovered)
+                # 覆盖数相同时优先选择目标门店本身
+                if gain > best_gain or (gain == best_gain and gain > 0
+                                        and anchor in targets and best_anchor not in targets):
+                    best_anchor = anchor
+                    best_gain = gain
+            
+            if best_anchor is None:
+                break
+            
+            anchors.append(best_anchor)
+            uncovered -= self.neighbours[best_anchor]
+        
+        # 理论上不会发生：已观测的目标门店至少能被自身覆盖
+        unknown.extend(sorted(uncovered))
+        
+        return anchors, unknown
+    
+    def get_stats(self) -> Dict:
+        """获取规划器统计信息"""
+        return {
+            'known_anchors': len(self.neighbours),
+            'avg_stores_per_response': (
+                sum(len(stores) for stores in self.neighbours.values()) / len(self.neighbours)
+                if self.neighbours else 0
+            )
+        }
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+流式历史导出模块
+每次状态变化、每轮检查结束时向 JSONL 文件追加一行紧凑的 JSON，
+退出时不必再把整个历史序列化成一个大文件，只需把缓冲区写完。
+可选 gzip 压缩，文件超过指定大小时按 文件名.1、文件名.2 ... 轮转
+
+每行的格式：
+    {"type":"transition","ts":...,"region":"CN","part":"MG034CH/A","store":"R320",
+     "old":"unavailable","new":"available","quote":"..."}
+    {"type":"round","ts":...,"region":"CN","products":3,"combinations":12,"requests":4,"available":1,"failed":0}
+"""
+
+import os
+import gzip
+import json
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_EXPORT_FILE = 'stock_history_{region}.jsonl'
+DEFAULT_MAX_MB = 50.0          # 单个文件的大小上限（MB），0 表示不轮转
+DEFAULT_BACKUP_COUNT = 5       # 保留的轮转文件个数
+DEFAULT_FLUSH_INTERVAL = 1.0   # 连续模式下两次写盘之间的最短间隔（秒）
+
+
+def _dumps(record: Dict) -> str:
+    """紧凑格式的一行 JSON"""
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class JSONLHistoryExporter:
+    """
+    JSONL 历史导出器
+    
+    write_*() 只把行放入缓冲区，flush() 一次性写入文件并检查是否需要轮转
+    """
+    
+    def __init__(self, path: str, compress: bool = False, max_mb: float = DEFAULT_MAX_MB,
+                 backup_count: int = DEFAULT_BACKUP_COUNT, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        初始化导出器
+        
+        Args:
+            path: 导出文件路径（启用 gzip 时自动补上 .gz 后缀）
+            compress: 是否 gzip 压缩
+            max_mb: 单个文件的大小上限（MB），超过后轮转，0 表示不轮转
+            backup_count: 保留的轮转文件个数
+            flush_interval: maybe_flush() 两次写盘之间的最短间隔（秒）
+        """
+        self.compress = compress
+        self.path = path + '.gz' if compress and not path.endswith('.gz') else path
+        self.max_bytes = int(max(0.0, float(max_mb)) * 1024 * 1024)
+        self.backup_count = max(0, int(backup_count))
+        self.flush_interval = max(0.0, float(flush_interval))
+        
+        self._buffer: List[str] = []
+        self._file = None
+        self._last_flush = time.monotonic()
+        
+        self.lines = 0
+        self.rotations = 0
+    
+    @classmethod
+    def from_config(cls, config: dict, region: str) -> Optional['JSONLHistoryExporter']:
+        """
+        根据配置文件的 history_export 段创建导出器
+        
+        history_export.enabled 为 false 时返回 None；文件名中的 {region} 替换为区域代码
+        """
+        export_config = config.get('history_export', {}) or {}
+        if not export_config.get('enabled', False):
+            return None
+        
+        return cls(
+            path=export_config.get('file', DEFAULT_EXPORT_FILE).replace('{region}', region),
+            compress=export_config.get('gzip', False),
+            max_mb=export_config.get('max_mb', DEFAULT_MAX_MB),
+            backup_count=export_config.get('backup_count', DEFAULT_BACKUP_COUNT),
+            flush_interval=export_config.get('flush_interval', DEFAULT_FLUSH_INTERVAL)
+        )
+    
+    def write_transitions(self, transitions: Iterable[Tuple]):
+        """
+        追加状态变化记录
+        
+        Args:
+            transitions: (时间, 区域, 型号, 门店, 原状态, 新状态, 取货提示)
+        """
+        for ts, region, part_number, store_number, old_state, new_state, quote in transitions:
+            self._buffer.append(_dumps({
+                'type': 'transition', 'ts': ts, 'region': region, 'part': part_number, 'store': store_number,
+                'old': old_state, 'new': new_state, 'quote': quote
+            }))
+    
+    def write_round(self, region: str, summary: Dict):
+        """追加一轮检查的汇总"""
+        record = {'type': 'round', 'ts': datetime.now().isoformat(timespec='seconds'), 'region': region}
+        record.update(summary)
+        self._buffer.append(_dumps(record))
+    
+    def _open(self):
+        """以追加方式打开当前文件"""
+        if self.compress:
+            # 每次打开追加一个新的 gzip 成员，gzip 工具和 gzip.open 都能连续读取
+            return gzip.open(self.path, 'at', encoding='utf-8')
+        return open(self.path, 'a', encoding='utf-8')
+    
+    def _rotated_name(self, index: int) -> str:
+        """第 index 个轮转文件的文件名（压缩文件保留 .gz 后缀）"""
+        if self.compress:
+            return f"{self.path[:-3]}.{index}.gz"
+        return f"{self.path}.{index}"
+    
+    def iter_all_paths(self) -> Iterator[str]:
+        """已存在的导出文件，按时间从旧到新：轮转文件 .N ... .1，最后是当前文件"""
+        for index in range(self.backup_count, 0, -1):
+            path = self._rotated_name(index)
+            if os.path.exists(path):
+                yield path
+        if os.path.exists(self.path):
+            yield self.path
+    
+    def _rotate(self):
+        """关闭当前文件，依次改名为 .1、.2 ...，超出 backup_count 的删除"""
+        self._file.close()
+        self._file = None
+        
+        if self.backup_count == 0:
+            os.remove(self.path)
+        else:
+            # 最旧的文件被 os.replace 覆盖
+            for index in range(self.backup_count - 1, 0, -1):
+                source = self._rotated_name(index)
+                if os.path.exists(source):
+                    os.replace(source, self._rotated_name(index + 1))
+            os.replace(self.path, self._rotated_name(1))
+        
+        self.rotations += 1
+        logger.info(f"🗂  历史导出文件已轮转: {self.path}")
+    
+    def flush(self):
+        """把缓冲区写入文件（超过大小上限时轮转）"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        
+        lines, self._buffer = self._buffer, []
+        try:
+            if self._file is None:
+                self._file = self._open()
+            self._file.write(''.join(lines))
+            self._file.flush()
+            self.lines += len(lines)
+            
+            if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            # 放回缓冲区，下次写盘时重试
+            self._buffer[:0] = lines
+            logger.warning(f"写入历史导出文件失败: {e}")
+    
+    def maybe_flush(self):
+        """距上次写盘超过 flush_interval 时写盘（连续模式下避免每个响应一次写盘）"""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def close(self):
+        """写完缓冲区并关闭文件"""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """逐行读取 JSONL 导出文件（支持 .gz），跳过无法解析的行（例如崩溃时写了一半的最后一行）"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except EOFError:
+            # 压缩文件末尾的 gzip 成员不完整（进程被强制结束），之前的内容仍然有效
+            return
+
+
+def iter_transitions(path: str) -> Iterator[Tuple]:
+    """从 JSONL 导出文件读取状态变化记录 (时间, 区域, 型号, 门店, 原状态, 新状态, 取货提示)"""
+    for record in iter_records(path):
+        if record.get('type') == 'transition':
+            yield (record.get('ts'), record.get('region'), record.get('part'), record.get('store'),
+                   record.get('old'), record.get('new'), record.get('quote', ''))
+
+
+def is_jsonl_file(path: str) -> bool:
+    """文件名是否为 JSONL 导出文件（含压缩和轮转后的文件）"""
+    name = path[:-3] if path.endswith('.gz') else path
+    return name.endswith('.jsonl') or '.jsonl.' in name
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+库存历史查询模块
+查询 history_store.py 写入的 SQLite 历史数据库（只读打开，监控运行中也可以查询）
+
+用法:
+    python history_query.py last MFYN4CH/A R448        # 该组合最近一次有货的时间段
+    python history_query.py log [型号] [门店] [--since 2025-10-01] [--limit 50]
+    python history_query.py now                         # 当前有货的组合
+    python history_query.py restocks [--since 2025-10-01]   # 各组合的补货次数
+    以上命令都可以加 --db 文件名 指定数据库（默认 stock_history.db）
+"""
+
+import sys
+import time
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+from history_store import DEFAULT_HISTORY_DB_FILE
+
+TRANSITION_COLUMNS = ('ts', 'region', 'part_number', 'store_number', 'old_state', 'new_state', 'pickup_quote')
+
+
+def open_history(db_file: str = DEFAULT_HISTORY_DB_FILE) -> sqlite3.Connection:
+    """以只读方式打开历史数据库"""
+    return sqlite3.connect(f'file:{db_file}?mode=ro', uri=True, timeout=10)
+
+
+def last_available(conn: sqlite3.Connection, part_number: str, store_number: str,
+                   region: Optional[str] = None) -> Optional[Dict]:
+    """
+    某个组合最近一次有货的时间段
+    
+    Returns:
+        {'available_now', 'since', 'until', 'last_seen'}（until 为 None 表示现在仍有货）；
+        从未有货时返回 None
+    """
+    region_filter, params = ('AND region = ?', (region,)) if region else ('', ())
+    
+    current = conn.execute(
+        f'SELECT state, since, last_seen FROM current_state '
+        f'WHERE part_number = ? AND store_number = ? {region_filter}',
+        (part_number, store_number) + params
+    ).fetchone()
+    if current and current[0] == 'available':
+        return {'available_now': True, 'since': current[1], 'until': None, 'last_seen': current[2]}
+    
+    ended = conn.execute(
+        f'SELECT ts FROM transitions WHERE part_number = ? AND store_number = ? {region_filter} '
+        f"AND old_state = 'available' ORDER BY ts DESC LIMIT 1",
+        (part_number, store_number) + params
+    ).fetchone()
+    if ended is None:
+        return None
+    
+    started = conn.execute(
+        f'SELECT ts FROM transitions WHERE part_number = ? AND store_number = ? {region_filter} '
+        f"AND new_state = 'available' AND ts <= ? ORDER BY ts DESC LIMIT 1",
+        (part_number, store_number) + params + (ended[0],)
+    ).fetchone()
+    return {
+        'available_now': False,
+        'since': started[0] if started else None,
+        'until': ended[0],
+        'last_seen': current[2] if current else None
+    }
+
+
+def transitions(conn: sqlite3.Connection, part_number: Optional[str] = None, store_number: Optional[str] = None,
+                since: Optional[str] = None, until: Optional[str] = None, limit: int = 100) -> List[Dict]:
+    """
+    按条件查询状态变化记录（最新的在前）
+    
+    Args:
+        part_number: 型号
+        store_number: 门店编号
+        since: 起始时间（ISO 格式，可以只写日期）
+        until: 截止时间
+        limit: 最多返回条数
+    """
+    conditions, params = [], []
+    for column, operator, value in (('part_number', '=', part_number), ('store_number', '=', store_number),
+                                    ('ts', '>=', since), ('ts', '<', until)):
+        if value:
+            conditions.append(f'{column} {operator} ?')
+            params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    rows = conn.execute(
+        f"SELECT {', '.join(TRANSITION_COLUMNS)} FROM transitions {where} ORDER BY ts DESC, id DESC LIMIT ?",
+        params + [max(1, int(limit))]
+    ).fetchall()
+    return [dict(zip(TRANSITION_COLUMNS, row)) for row in rows]
+
+
+def available_now(conn: sqlite3.Connection, region: Optional[str] = None) -> List[Dict]:
+    """当前有货的组合（按有货开始时间排序）"""
+    region_filter, params = ('AND region = ?', (region,)) if region else ('', ())
+    rows = conn.execute(
+        f"SELECT region, part_number, store_number, pickup_quote, since, last_seen FROM current_state "
+        f"WHERE state = 'available' {region_filter} ORDER BY since",
+        params
+    ).fetchall()
+    columns = ('region', 'part_number', 'store_number', 'pickup_quote', 'since', 'last_seen')
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def restock_counts(conn: sqlite3.Connection, since: Optional[str] = None,
+                   part_number: Optional[str] = None) -> List[Tuple[str, str, int]]:
+    """
+    各组合从无货变为有货的次数（不含首次观测）
+    
+    Returns:
+        [(型号, 门店, 次数)]，次数多的在前
+    """
+    conditions = ["new_state = 'available'", "old_state IS NOT NULL", "old_state != 'available'"]
+    params = []
+    if since:
+        conditions.append('ts >= ?')
+        params.append(since)
+    if part_number:
+        conditions.append('part_number = ?')
+        params.append(part_number)
+    
+    return conn.execute(
+        f"SELECT part_number, store_number, COUNT(*) AS restocks FROM transitions "
+        f"WHERE {' AND '.join(conditions)} GROUP BY part_number, store_number ORDER BY restocks DESC",
+        params
+    ).fetchall()
+
+
+def _parse_args(args: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """拆分位置参数和 --选项 值"""
+    positional, options = [], {}
+    i = 0
+    while i < len(args):
+        if args[i].startswith('--') and i + 1 < len(args):
+            options[args[i][2:]] = args[i + 1]
+            i += 2
+        else:
+            positional.append(args[i])
+            i += 1
+    return positional, options
+
+
+def main():
+    """命令行入口"""
+    positional, options = _parse_args(sys.argv[1:])
+    if not positional:
+        print(__doc__)
+        return
+    
+    command, rest = positional[0], positional[1:]
+    db_file = options.get('db', DEFAULT_HISTORY_DB_FILE)
+    try:
+        conn = open_history(db_file)
+    except sqlite3.Error as e:
+        print(f"❌ 无法打开历史数据库 {db_file}: {e}")
+        return
+    
+    started = time.perf_counter()
+    if command == 'last' and len(rest) == 2:
+        span = last_available(conn, rest[0], rest[1], options.get('region'))
+        if span is None:
+            print(f"○ {rest[0]} @ {rest[1]}: 没有有货记录")
+        elif span['available_now']:
+            print(f"✅ {rest[0]} @ {rest[1]}: 现在有货（自 {span['since']} 起，最近确认 {span['last_seen']}）")
+        else:
+            print(f"🕒 {rest[0]} @ {rest[1]}: 最近一次有货 {span['since'] or '?'} → {span['until']}")
+    elif command == 'log':
+        rows = transitions(conn, rest[0] if rest else None, rest[1] if len(rest) > 1 else None,
+                           since=options.get('since'), until=options.get('until'),
+                           limit=int(options.get('limit', 100)))
+        for row in rows:
+            print(f"{row['ts']}  [{row['region']}] {row['part_number']} @ {row['store_number']}: "
+                  f"{row['old_state'] or '-'} → {row['new_state']}  {row['pickup_quote'] or ''}")
+        print(f"共 {len(rows)} 条")
+    elif command == 'now':
+        rows = available_now(conn, options.get('region'))
+        for row in rows:
+            print(f"✅ [{row['region']}] {row['part_number']} @ {row['store_number']}  "
+                  f"自 {row['since']} 起  {row['pickup_quote'] or ''}")
+        print(f"共 {len(rows)} 个组合有货")
+    elif command == 'restocks':
+        rows = restock_counts(conn, options.get('since'), options.get('part'))
+        for part_number, store_number, count in rows:
+            print(f"{part_number} @ {store_number}: {count} 次")
+        print(f"共 {len(rows)} 个组合")
+    else:
+        print(__doc__)
+        return
+    
+    print(f"⏱  查询耗时 {(time.perf_counter() - started) * 1000:.1f} 毫秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite 库存历史存储模块
+状态变化记录和当前状态表写入 SQLite（WAL 模式），每轮批量提交一次：
+程序崩溃也不会丢失之前的历史，任何时候都可以用 history_query.py 按型号、门店、时间查询，
+不必等退出时导出 JSON 再整个文件加载
+"""
+
+import time
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_HISTORY_DB_FILE = 'stock_history.db'
+DEFAULT_FLUSH_INTERVAL = 1.0  # 连续模式下两次提交之间的最短间隔（秒）
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS transitions ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT NOT NULL, region TEXT NOT NULL, '
+    'part_number TEXT NOT NULL, store_number TEXT NOT NULL, '
+    'old_state TEXT, new_state TEXT NOT NULL, pickup_quote TEXT)',
+    'CREATE INDEX IF NOT EXISTS idx_transitions_pair ON transitions (part_number, store_number, ts)',
+    'CREATE INDEX IF NOT EXISTS idx_transitions_store ON transitions (store_number, ts)',
+    'CREATE INDEX IF NOT EXISTS idx_transitions_ts ON transitions (ts)',
+    'CREATE TABLE IF NOT EXISTS current_state ('
+    'region TEXT NOT NULL, part_number TEXT NOT NULL, store_number TEXT NOT NULL, '
+    'state TEXT NOT NULL, pickup_quote TEXT, since TEXT NOT NULL, last_seen TEXT NOT NULL, '
+    'PRIMARY KEY (region, part_number, store_number))',
+    'CREATE INDEX IF NOT EXISTS idx_current_state ON current_state (state)',
+)
+
+
+def connect(db_file: str) -> sqlite3.Connection:
+    """打开历史数据库（WAL 模式，读写互不阻塞）并确保表结构存在"""
+    conn = sqlite3.connect(db_file, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    for statement in SCHEMA:
+        conn.execute(statement)
+    return conn
+
+
+class SQLiteHistoryStore:
+    """
+    SQLite 历史存储
+    
+    add() 只把记录放入缓冲区，flush() 在一个事务内批量写入：
+    新的状态变化追加到 transitions，本轮观测到的组合更新 current_state
+    """
+    
+    def __init__(self, db_file: str = DEFAULT_HISTORY_DB_FILE, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        初始化历史存储
+        
+        Args:
+            db_file: SQLite 数据库文件
+            flush_interval: maybe_flush() 两次提交之间的最短间隔（秒）
+        """
+        self.db_file = db_file
+        self.flush_interval = max(0.0, float(flush_interval))
+        
+        self._conn = connect(db_file)
+        self._pending_transitions: List[Tuple] = []
+        self._pending_states: Dict[Tuple[str, str, str], Tuple] = {}
+        self._last_flush = time.monotonic()
+        
+        self.written = 0
+    
+    @classmethod
+    def from_config(cls, config: dict) -> Optional['SQLiteHistoryStore']:
+        """
+        根据配置文件的 history 段创建历史存储
+        
+        history.backend 不是 sqlite 时返回 None（只在内存中保留变化日志）
+        """
+        history_config = config.get('history', {}) or {}
+        if history_config.get('backend', 'memory') != 'sqlite':
+            return None
+        
+        try:
+            return cls(
+                db_file=history_config.get('db_file', DEFAULT_HISTORY_DB_FILE),
+                flush_interval=history_config.get('flush_interval', DEFAULT_FLUSH_INTERVAL)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"打开历史数据库失败: {e}，历史记录只保存在内存中")
+            return None
+    
+    def add(self, transitions: Iterable[Tuple], states: Iterable[Tuple]):
+        """
+        放入待写入的记录
+        
+        Args:
+            transitions: 状态变化记录 (时间, 区域, 型号, 门店, 原状态, 新状态, 取货提示)
+            states: 当前状态 (区域, 型号, 门店, 状态, 取货提示, 状态开始时间, 最近观测时间)
+        """
+        self._pending_transitions.extend(transitions)
+        for state in states:
+            self._pending_states[state[:3]] = state
+    
+    def flush(self):
+        """在一个事务内写入缓冲区中的全部记录"""
+        self._last_flush = time.monotonic()
+        if not self._pending_transitions and not self._pending_states:
+            return
+        
+        transitions, self._pending_transitions = self._pending_transitions, []
+        states, self._pending_states = list(self._pending_states.values()), {}
+        
+        conn = self._conn
+        try:
+            conn.execute('BEGIN')
+            conn.executemany(
+                'INSERT INTO transitions (ts, region, part_number, store_number, old_state, new_state, pickup_quote) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                transitions
+            )
+            conn.executemany(
+                'INSERT INTO current_state (region, part_number, store_number, state, pickup_quote, since, last_seen) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(region, part_number, store_number) DO UPDATE SET state = excluded.state, '
+                'pickup_quote = excluded.pickup_quote, since = excluded.since, last_seen = excluded.last_seen',
+                states
+            )
+            conn.execute('COMMIT')
+            self.written += len(transitions)
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            # 放回缓冲区，下次提交时重试（期间新观测到的状态优先）
+            self._pending_transitions[:0] = transitions
+            for state in states:
+                self._pending_states.setdefault(state[:3], state)
+            logger.warning(f"写入历史数据库失败: {e}")
+    
+    def maybe_flush(self):
+        """距上次提交超过 flush_interval 时提交（连续模式下避免每个响应一次事务）"""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def load_current(self, region: str) -> Dict[Tuple[str, str], List]:
+        """
+        读取某个区域的当前状态表（重启后接着判断状态变化）
+        
+        Returns:
+            {(型号, 门店): [状态, 取货提示, 状态开始时间, 最近观测时间]}
+        """
+        rows = self._conn.execute(
+            'SELECT part_number, store_number, state, pickup_quote, since, last_seen '
+            'FROM current_state WHERE region = ?', (region,)
+        ).fetchall()
+        return {(part, store): [state, quote or '', since, last_seen]
+                for part, store, state, quote, since, last_seen in rows}
+    
+    def load_transitions(self, region: str) -> List[Tuple]:
+        """
+        读取某个区域的全部变化记录（按时间排序，用于重启后热启动补货学习）
+        
+        Returns:
+            [(时间, 区域, 型号, 门店, 原状态, 新状态, 取货提示)]
+        """
+        return self._conn.execute(
+            'SELECT ts, region, part_number, store_number, old_state, new_state, pickup_quote '
+            'FROM transitions WHERE region = ? ORDER BY ts, id', (region,)
+        ).fetchall()
+    
+    def close(self):
+        """写入剩余记录并关闭数据库"""
+        self.flush()
+        self._conn.close()
@@ -10,8 +10,9 @@ import sys
 import json
 import time
 import signal
+import asyncio
 from pathlib import Path
-from threading import Thread, Event, Lock
+from threading import Thread, Lock
 from datetime import datetime
 from colorama import init, Fore, Style
 from tabulate import tabulate
@@ -24,20 +25,32 @@ except ImportError:
     USING_ENHANCED = False
 from notifier import Notifier
 from logger_config import setup_logger
+from timer_core import WakeupEvent
+from config_watcher import ConfigWatcher, install_sighup_handler
+from subscriptions import SubscriptionHub
+from availability_matrix import AvailabilityMatrix, UNKNOWN
 
 # 初始化colorama
 init(autoreset=True)
 
-# 全局停止事件
-stop_event = Event()
+# 全局停止事件（也用于唤醒等待中的监控循环，见 timer_core.py）
+stop_event = WakeupEvent()
 # 线程锁
 print_lock = Lock()
 
 logger = setup_logger()
 
 
-def load_config(config_path='config.json'):
-    """加载配置文件"""
+CONFIG_FILE = 'config.json'
+
+
+def load_config(config_path=CONFIG_FILE):
+    """
+    加载配置文件
+    
+    Returns:
+        (配置字典, 实际加载的配置文件路径)（config.json 不存在时为示例配置的路径）
+    """
     try:
         # 如果config.json不存在，尝试使用示例配置
         config_file = Path(config_path)
@@ -52,13 +65,13 @@ def load_config(config_path='config.json'):
         with open(config_path, 'r', encoding='utf-8') as f:
             config = json.load(f)
         
-        # 验证必要字段
-        required_fields = ['target_products']
+        # 验证必要字段（多人订阅模式下商品列表由各订阅合并生成）
+        required_fields = [] if (config.get('subscriptions') or {}).get('enabled') else ['target_products']
         for field in required_fields:
             if field not in config:
                 raise ValueError(f"配置文件缺少必要字段: {field}")
         
-        return config
+        return config, config_path
     
     except FileNotFoundError:
         logger.error(f"配置文件未找到: {config_path}")
@@ -139,7 +152,12 @@ def print_config_summary(config: dict, monitor):
     
     # 监控参数
     print(f"\n{Fore.YELLOW}⚙️  监控参数:{Style.RESET_ALL}")
-    print(f"  • 检查间隔: {config.get('check_interval', 3)}秒")
+    if is_continuous_mode(config, monitor):
+        print("  • 检查方式: 🔄 连续滚动（按请求速率轮转，不分轮次）")
+    else:
+        print(f"  • 检查间隔: {config.get('check_interval', 3)}秒")
+    if config.get('async_mode', False):
+        print(f"  • 异步引擎: ✅ 开启 (并发上限 {config.get('max_concurrency', 4)})")
     print(f"  • 桌面通知: {'✅ 开启' if config.get('enable_notification', True) else '❌ 关闭'}")
     print(f"  • 声音提醒: {'✅ 开启' if config.get('enable_sound', True) else '❌ 关闭'}")
     print(f"  • 保存历史: {'✅ 开启' if config.get('save_history', True) else '❌ 关闭'}")
@@ -147,20 +165,22 @@ def print_config_summary(config: dict, monitor):
     print(f"\n{Fore.GREEN}{'='*70}{Style.RESET_ALL}\n")
 
 
-def display_stock_status(results: dict, monitor: AppleStoreMonitor):
+def display_stock_status(results: dict, monitor: AppleStoreMonitor, label: str = ''):
     """
     显示库存状态
     
     Args:
         results: 查询结果
         monitor: 监控器实例
+        label: 标题中的区域标签（多区域监控时使用）
     """
     with print_lock:
         # 清屏（可选）
         # os.system('clear' if os.name == 'posix' else 'cls')
         
         print(f"\n{Fore.CYAN}{'='*100}{Style.RESET_ALL}")
-        print(f"{Fore.CYAN}📊 库存查询结果 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}{Style.RESET_ALL}")
+        title = f"📊 库存查询结果 [{label}]" if label else "📊 库存查询结果"
+        print(f"{Fore.CYAN}{title} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}{'='*100}{Style.RESET_ALL}\n")
         
         for part_number, data in results.items():
@@ -233,10 +253,130 @@ def display_stock_status(results: dict, monitor: AppleStoreMonitor):
                     print(f"      {Fore.YELLOW}○{Style.RESET_ALL} {store}")
                 print()
         
+        # 本轮状态变化（启用库存状态矩阵时由监控器整矩阵比较得出，首次观测不列出）
+        changes = [change for change in getattr(monitor, 'round_changes', []) if change[2] != UNKNOWN]
+        if changes:
+            print(f"{Fore.MAGENTA}🔀 本轮状态变化 ({len(changes)}个):{Style.RESET_ALL}")
+            for change in changes:
+                print(f"   {AvailabilityMatrix.describe(change)}")
+            print()
+        
         print(f"{Fore.CYAN}{'='*100}{Style.RESET_ALL}\n")
 
 
-def monitor_loop(monitor: AppleStoreMonitor, notifier: Notifier, config: dict):
+def print_stock_update(part_number: str, data: dict, label: str = ''):
+    """
+    连续模式下输出单个响应的结果（每个型号一行）
+    
+    Args:
+        part_number: 商品型号编号
+        data: 结果字典（格式与 display_stock_status 的单个产品相同）
+        label: 行首的区域标签（多区域监控时使用）
+    """
+    result = data.get('result', {})
+    product_name = data.get('name', part_number)
+    store_numbers = ', '.join(result.get('requested_stores') or [])
+    stamp = f"[{datetime.now().strftime('%H:%M:%S')}]"
+    if label:
+        stamp = f"{stamp} [{label}]"
+    
+    with print_lock:
+        if not result.get('success', False):
+            print(f"{Fore.RED}{stamp} ❌ {product_name} @ {store_numbers}: {result.get('error', 'Unknown')}{Style.RESET_ALL}")
+            return
+        
+        available_stores = result.get('available_stores', [])
+        if available_stores:
+            names = ', '.join(f"{store.get('store_name')} ({store.get('city', '')})" for store in available_stores)
+            print(f"{Fore.GREEN}{stamp} ✅ {product_name} 有货: {names}{Style.RESET_ALL}")
+        else:
+            print(f"{stamp} ○ {product_name} @ {store_numbers}: 暂无库存")
+
+
+def notify_if_available(notifier: Notifier, data: dict):
+    """
+    有货时发送通知（持续提醒模式：只要有货就通知）
+    
+    Args:
+        notifier: 通知器实例
+        data: 单个产品的结果字典
+    """
+    product = data.get('product', {})
+    result = data.get('result', {})
+    
+    if not result.get('success'):
+        return
+    
+    available_stores = result.get('available_stores', [])
+    if not available_stores:
+        return
+    
+    if len(available_stores) == 1:
+        notifier.notify_stock_available(product, available_stores[0])
+    else:
+        notifier.notify_multiple_stores_available(product, available_stores)
+    
+    logger.info(f"🎉 {product.get('name')} 在 {len(available_stores)} 个门店有货！")
+
+
+def notify_result(notifier: Notifier, data: dict, hub: SubscriptionHub = None):
+    """有货时通知：多人订阅模式下分发给关注该组合的订阅，否则使用默认通知器"""
+    if hub is not None:
+        hub.fan_out(data)
+    else:
+        notify_if_available(notifier, data)
+
+
+def run_check_round(monitor: AppleStoreMonitor, products: list, target_stores, config: dict) -> dict:
+    """
+    执行一轮库存检查
+    
+    配置 async_mode 为 true 且监控器支持时使用异步引擎，否则使用同步引擎
+    """
+    if config.get('async_mode', False) and hasattr(monitor, 'check_multiple_products_async'):
+        return asyncio.run(monitor.check_multiple_products_async(products, target_stores))
+    return monitor.check_multiple_products(products, target_stores)
+
+
+def next_round_delay(monitor: AppleStoreMonitor, check_interval: float) -> float:
+    """
+    计算距离下一轮检查的等待时间
+    
+    启用补货时段分布时按当前时段调整检查间隔；
+    区域熔断器打开时，下一轮安排在冷却结束的时刻（直接发送试探请求），
+    既不在冷却期内浪费请求，也不必多等一个 check_interval
+    """
+    if hasattr(monitor, 'get_check_interval'):
+        check_interval = monitor.get_check_interval(check_interval)
+    
+    circuit_state = monitor.get_circuit_state() if hasattr(monitor, 'get_circuit_state') else None
+    if not circuit_state or circuit_state['state'] == 'closed':
+        return check_interval
+    
+    remaining = circuit_state['remaining_cooldown']
+    logger.warning(f"⛔ 区域熔断器状态: {circuit_state['state_label']}"
+                   f"（已熔断 {circuit_state['open_count']} 次），{remaining:.0f}秒后发送试探请求")
+    return remaining
+
+
+def wait_next_round(monitor: AppleStoreMonitor, seconds: float):
+    """
+    等到下一轮的时刻、停止信号或有新配置待生效
+    
+    stop_event 被 notify() 提前唤醒（既没有停止也没有新配置）时继续等待剩余时间，
+    不会提前开始下一轮
+    """
+    deadline = time.monotonic() + seconds
+    while not stop_event.is_set():
+        if hasattr(monitor, 'has_pending_config') and monitor.has_pending_config():
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        stop_event.wait(remaining)
+
+
+def monitor_loop(monitor: AppleStoreMonitor, notifier: Notifier, config: dict, hub: SubscriptionHub = None):
     """
     主监控循环
     
@@ -244,52 +384,101 @@ def monitor_loop(monitor: AppleStoreMonitor, notifier: Notifier, config: dict):
         monitor: 监控器实例
         notifier: 通知器实例
         config: 配置字典
+        hub: 多人订阅合并器（未启用时为 None）
     """
-    products = config['target_products']
-    target_stores = config.get('target_stores', []) if not config.get('all_stores', False) else None
-    check_interval = config.get('check_interval', 3)
-    
     iteration = 0
     
     while not stop_event.is_set():
         try:
+            # 配置热加载：新配置在两轮之间生效（config 与监控器共用同一个字典）
+            if hasattr(monitor, 'apply_pending_config'):
+                monitor.apply_pending_config()
+            products = config['target_products']
+            target_stores = config.get('target_stores', []) if not config.get('all_stores', False) else None
+            check_interval = config.get('check_interval', 3)
+            
             iteration += 1
             logger.info(f"开始第 {iteration} 轮库存检查...")
             
             # 检查所有商品
-            results = monitor.check_multiple_products(products, target_stores)
+            results = run_check_round(monitor, products, target_stores, config)
             
             # 显示结果
             display_stock_status(results, monitor)
             
             # 检查库存并发送通知（持续提醒模式）
             for part_number, data in results.items():
-                product = data.get('product', {})
-                result = data.get('result', {})
-                
-                if not result.get('success'):
-                    continue
-                
-                available_stores = result.get('available_stores', [])
-                
-                if available_stores:
-                    # 持续提醒模式：只要有货就通知
-                    if len(available_stores) == 1:
-                        notifier.notify_stock_available(product, available_stores[0])
-                    else:
-                        notifier.notify_multiple_stores_available(product, available_stores)
-                    
-                    logger.info(f"🎉 {product.get('name')} 在 {len(available_stores)} 个门店有货！")
+                notify_result(notifier, data, hub)
             
-            # 等待下次检查
-            logger.info(f"本轮检查完成，{check_interval}秒后进行下一轮...")
-            stop_event.wait(check_interval)
+            # 等待下次检查（区域熔断中则等到冷却结束再发试探请求）
+            wait_seconds = next_round_delay(monitor, check_interval)
+            logger.info(f"本轮检查完成，{wait_seconds:.0f}秒后进行下一轮...")
+            wait_next_round(monitor, wait_seconds)
             
         except KeyboardInterrupt:
             break
         except Exception as e:
             logger.error(f"监控循环出错: {e}")
             notifier.notify_error(str(e))
+            wait_next_round(monitor, 5)
+    
+    logger.info("监控循环已退出")
+
+
+def check_staleness_sla(monitor: AppleStoreMonitor, config: dict) -> bool:
+    """
+    启动前的准入检查：按 staleness_sla 规划请求
+    
+    Returns:
+        是否可以启动（只有 staleness_sla.strict 为 true 且预算不足时返回 False）
+    """
+    if not hasattr(monitor, 'plan_staleness'):
+        return True
+    
+    target_stores = config.get('target_stores', []) if not config.get('all_stores', False) else None
+    plan = monitor.plan_staleness(config['target_products'], target_stores)
+    if plan is None or plan['feasible']:
+        return True
+    
+    if (config.get('staleness_sla', {}) or {}).get('strict', False):
+        logger.error("🛑 新鲜度目标无法在请求预算内满足，拒绝启动。"
+                     "请放宽上述组合的 max_staleness、减少商品/门店或提高 rate_limit 预算")
+        return False
+    
+    logger.warning("⚠️  新鲜度目标无法全部满足，按放宽后的计划运行")
+    return True
+
+
+def is_continuous_mode(config: dict, monitor: AppleStoreMonitor) -> bool:
+    """是否使用连续滚动模式（需要增强版监控器）"""
+    return (config.get('continuous_mode', {}) or {}).get('enabled', False) and hasattr(monitor, 'run_continuous')
+
+
+def continuous_loop(monitor: AppleStoreMonitor, notifier: Notifier, config: dict, hub: SubscriptionHub = None):
+    """
+    连续监控循环：请求按到期时间不间断发出，每个响应到达后立即输出和通知
+    
+    Args:
+        monitor: 监控器实例
+        notifier: 通知器实例
+        config: 配置字典
+        hub: 多人订阅合并器（未启用时为 None）
+    """
+    def on_result(part_number: str, data: dict):
+        print_stock_update(part_number, data)
+        notify_result(notifier, data, hub)
+    
+    while not stop_event.is_set():
+        try:
+            # 正常情况下一直运行到收到停止信号；出错后保留调度状态重新进入
+            products, target_stores = monitor.get_targets()
+            monitor.run_continuous(products, target_stores, on_result)
+            break
+        except KeyboardInterrupt:
+            break
+        except Exception as e:
+            logger.error(f"连续监控出错: {e}")
+            notifier.notify_error(str(e))
             stop_event.wait(5)
     
     logger.info("监控循环已退出")
@@ -306,7 +495,12 @@ def main():
     
     # 加载配置
     logger.info("正在加载配置...")
-    config = load_config()
+    config, config_path = load_config()
+    
+    # 多人订阅：按所有订阅的并集（去重后的组合）查询
+    hub = SubscriptionHub.from_config(config)
+    if hub is not None:
+        hub.apply_to_config(config)
     
     # 初始化监控器
     logger.info("正在初始化监控器...")
@@ -315,9 +509,28 @@ def main():
     # 打印配置摘要
     print_config_summary(config, monitor)
     
+    # 按新鲜度目标规划请求（strict 模式下预算不足时拒绝启动）
+    if not check_staleness_sla(monitor, config):
+        sys.exit(1)
+    
     # 初始化通知器
     notifier = Notifier(config)
     
+    # 配置热加载（修改配置文件或发送 SIGHUP 后，不重启即可生效）
+    def on_config_change(new_config: dict):
+        if hub is not None:
+            hub.load(new_config)
+            hub.apply_to_config(new_config)
+        monitor.request_config_reload(new_config)
+    
+    watcher = None
+    if hasattr(monitor, 'request_config_reload'):
+        # 监视实际加载的文件（回退到示例配置时监视示例配置）
+        watcher = ConfigWatcher.from_config(config, config_path, on_config_change)
+    if watcher is not None:
+        install_sighup_handler([watcher])
+        watcher.start()
+    
     # 计算监控范围
     product_count = len(config['target_products'])
     if config.get('all_stores', False):
@@ -331,15 +544,25 @@ def main():
     print(f"{Fore.GREEN}✨ 监控已启动！正在实时检查库存...{Style.RESET_ALL}\n")
     print(f"{Fore.YELLOW}💡 提示: 按 Ctrl+C 可随时停止监控{Style.RESET_ALL}\n")
     
-    # 开始监控
+    # 开始监控（启用连续模式时不分轮次）
     try:
-        monitor_loop(monitor, notifier, config)
+        if is_continuous_mode(config, monitor):
+            continuous_loop(monitor, notifier, config, hub)
+        else:
+            monitor_loop(monitor, notifier, config, hub)
     except KeyboardInterrupt:
         pass
     except Exception as e:
         logger.error(f"程序异常: {e}")
         notifier.notify_error(str(e))
     
+    if watcher is not None:
+        watcher.stop()
+    
+    # 保存检查点（下次启动时热启动）
+    if hasattr(monitor, 'save_checkpoint'):
+        monitor.save_checkpoint()
+    
     # 导出历史记录
     if config.get('save_history', True):
         logger.info("正在导出历史记录...")
@@ -11,7 +11,6 @@ import json
 import signal
 import time
 from pathlib import Path
-from threading import Event
 from datetime import datetime
 from colorama import init, Fore, Style
 from tabulate import tabulate
@@ -20,9 +19,10 @@ from tabulate import tabulate
 from apple_store_monitor_enhanced import AppleStoreMonitorEnhanced
 from notifier import Notifier
 from logger_config import setup_logger
+from timer_core import WakeupEvent
 
 init(autoreset=True)
-stop_event = Event()
+stop_event = WakeupEvent()
 logger = setup_logger()
 
 
@@ -9,8 +9,12 @@ Apple Store 库存监控系统 - 统一入口
 import json
 import os
 import sys
+import signal
 from datetime import datetime
 from colorama import init, Fore, Style
+from main import stop_event, signal_handler, display_stock_status, print_stock_update, notify_if_available
+from multi_region import MultiRegionRunner
+from notifier import Notifier
 
 init(autoreset=True)
 
@@ -76,6 +80,9 @@ class UnifiedMonitor:
         self.region = None
         self.config = None
         self.stores = None
+        self.regions = []         # 要监控的区域（选择"同时监控"时为全部区域）
+        self.region_configs = {}  # {区域代码: 配置}
+        self.config_files = {}    # {区域代码: 配置文件}（用于配置热加载）
     
     def print_banner(self):
         """打印欢迎横幅"""
@@ -97,16 +104,26 @@ class UnifiedMonitor:
             print(f"     API: {region_info['api_base']}")
             print()
         
+        all_names = ' + '.join(self.REGIONS[region_code]['name'] for region_code in regions)
+        print(f"  {len(regions) + 1}. {Fore.GREEN}同时监控{Style.RESET_ALL} ({all_names})")
+        print(f"     单进程并发运行，各区域独立限速，结果统一显示和通知")
+        print()
+        
         while True:
             try:
-                choice = input(f"{Fore.YELLOW}请选择 (1-{len(regions)}): {Style.RESET_ALL}").strip()
+                choice = input(f"{Fore.YELLOW}请选择 (1-{len(regions) + 1}): {Style.RESET_ALL}").strip()
                 choice_idx = int(choice) - 1
                 
                 if 0 <= choice_idx < len(regions):
                     self.region = regions[choice_idx]
+                    self.regions = [self.region]
                     region_info = self.REGIONS[self.region]
                     print(f"\n{Fore.GREEN}✅ 已选择: {region_info['name']} ({self.region}){Style.RESET_ALL}\n")
                     return True
+                elif choice_idx == len(regions):
+                    self.regions = regions
+                    print(f"\n{Fore.GREEN}✅ 已选择: 同时监控 {all_names}{Style.RESET_ALL}\n")
+                    return True
                 else:
                     print(f"{Fore.RED}无效选择，请重新输入{Style.RESET_ALL}")
             except (ValueError, KeyboardInterrupt):
@@ -274,12 +291,49 @@ class UnifiedMonitor:
         print(f"正在启动监控系统...")
         print(f"{'='*70}{Style.RESET_ALL}\n")
         
-        # TODO: 这里调用实际的监控模块
-        # 需要根据区域选择不同的监控实现
+        return self.run_regions()
+    
+    def run_regions(self):
+        """按已选择的区域和配置运行监控（多个区域在同一进程内并发），直到按 Ctrl+C"""
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+        
+        runner = MultiRegionRunner(self.region_configs, stop_event)
+        runner.watch_config_files(self.config_files)
+        if not runner.check_staleness_sla():
+            print(f"{Fore.RED}❌ 新鲜度目标无法在请求预算内满足，已取消启动{Style.RESET_ALL}\n")
+            return False
+        
+        # 通知设置使用第一个区域的配置
+        notifier = Notifier(next(iter(self.region_configs.values())))
+        product_count = sum(len(config.get('target_products', [])) for config in self.region_configs.values())
+        store_count = sum(len(config.get('target_stores', [])) for config in self.region_configs.values())
+        notifier.notify_monitoring_started(product_count, store_count)
+        
+        multi_region = len(runner.monitors) > 1
+        
+        def label_for(region):
+            return self.REGIONS[region]['name'] if multi_region else ''
+        
+        def on_round(region, results):
+            display_stock_status(results, runner.monitors[region], label_for(region))
+            for data in results.values():
+                notify_if_available(notifier, data)
+        
+        def on_result(region, part_number, data):
+            print_stock_update(part_number, data, label_for(region))
+            notify_if_available(notifier, data)
+        
+        def on_error(region, error):
+            notifier.notify_error(f"[{region}] {error}")
         
-        print(f"{Fore.CYAN}提示: 实际监控功能需要集成到 main.py 或创建区域特定的监控器{Style.RESET_ALL}\n")
-        print(f"{Fore.YELLOW}当前为演示模式{Style.RESET_ALL}\n")
+        print(f"{Fore.GREEN}✨ 监控已启动！正在实时检查库存...{Style.RESET_ALL}\n")
+        print(f"{Fore.YELLOW}💡 提示: 按 Ctrl+C 可随时停止监控{Style.RESET_ALL}\n")
         
+        runner.run(on_round=on_round, on_result=on_result, on_error=on_error)
+        runner.export_history()
+        
+        print(f"\n{Fore.CYAN}程序已退出。感谢使用 Apple Store 库存监控系统！{Style.RESET_ALL}\n")
         return True
     
     def run(self):
@@ -290,21 +344,26 @@ class UnifiedMonitor:
         if not self.select_region():
             return
         
-        # 2. 加载门店信息
-        if not self.load_stores():
-            return
-        
-        # 3. 选择配置
-        config_file = self.select_preset()
-        if not config_file:
-            return
-        
-        # 4. 加载配置
-        if not self.load_config(config_file):
-            return
-        
-        # 5. 显示摘要
-        self.show_summary()
+        for region in self.regions:
+            self.region = region
+            
+            # 2. 加载门店信息
+            if not self.load_stores():
+                return
+            
+            # 3. 选择配置
+            config_file = self.select_preset()
+            if not config_file:
+                return
+            
+            # 4. 加载配置
+            if not self.load_config(config_file):
+                return
+            
+            # 5. 显示摘要
+            self.show_summary()
+            self.region_configs[region] = self.config
+            self.config_files[region] = config_file
         
         # 6. 启动监控
         self.start_monitoring()
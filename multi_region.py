@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多区域并发监控模块
+在一个进程内同时运行中国大陆和香港的监控器：每个区域一个工作线程，
+各自使用独立的接口地址、限速预算、会话连接池和熔断器，两个区域的时间线互不阻塞；
+所有结果汇入同一个队列，由调用 run() 的线程统一显示和通知
+"""
+
+import os
+import time
+import queue
+import asyncio
+import threading
+from functools import partial
+from typing import Callable, Dict, List, Optional
+from apple_store_monitor_enhanced import AppleStoreMonitorEnhanced
+from restock_profile import DEFAULT_PROFILE_FILE
+from config_watcher import ConfigWatcher, install_sighup_handler
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+# 结果队列中的事件类型
+EVENT_ROUND = 'round'    # 一轮检查完成 (区域, 结果)
+EVENT_RESULT = 'result'  # 连续模式的单个结果 (区域, 型号, 结果字典)
+EVENT_ERROR = 'error'    # 区域工作线程出错 (区域, 错误信息)
+EVENT_EXIT = 'exit'      # 区域工作线程退出 (区域,)
+
+ERROR_RETRY_DELAY = 5  # 出错后重试前的等待（秒）
+
+
+def build_region_config(config: dict, region: str, multi_region: bool = True) -> dict:
+    """
+    生成单个区域使用的配置副本
+    
+    多区域运行时，补货时段分布按区域分文件保存（两个市场的补货时段不同，
+    共用一个文件会互相覆盖）；节奏状态文件本身按区域分键，可以共用
+    
+    Args:
+        config: 该区域的配置
+        region: 区域代码
+        multi_region: 是否与其他区域同时运行
+    """
+    config = dict(config, region=region)
+    
+    profile_config = config.get('restock_profile') or {}
+    if multi_region and profile_config.get('enabled', False):
+        stem, ext = os.path.splitext(profile_config.get('profile_file', DEFAULT_PROFILE_FILE))
+        if not stem.endswith(f'_{region}'):
+            config['restock_profile'] = dict(profile_config, profile_file=f"{stem}_{region}{ext or '.json'}")
+    
+    return config
+
+
+class MultiRegionRunner:
+    """
+    多区域监控运行器
+    
+    每个区域按自己的配置运行轮次模式或连续模式（continuous_mode），
+    工作线程只负责查询，显示和通知都通过 run() 的回调在调用方线程中串行执行。
+    所有区域共用同一个停止事件，一次 Ctrl+C 即可全部退出
+    """
+    
+    def __init__(self, region_configs: Dict[str, dict], stop_event):
+        """
+        初始化运行器
+        
+        Args:
+            region_configs: {区域代码: 该区域的配置}
+            stop_event: 停止事件（建议使用 timer_core.WakeupEvent）
+        """
+        if not region_configs:
+            raise ValueError("至少需要一个区域的配置")
+        
+        self.stop_event = stop_event
+        self.events: queue.Queue = queue.Queue()
+        self.configs: Dict[str, dict] = {}
+        self.monitors: Dict[str, AppleStoreMonitorEnhanced] = {}
+        self.watchers: List[ConfigWatcher] = []
+        
+        self.multi_region = len(region_configs) > 1
+        for region, config in region_configs.items():
+            config = build_region_config(config, region, self.multi_region)
+            self.configs[region] = config
+            self.monitors[region] = AppleStoreMonitorEnhanced(config, stop_event)
+    
+    def is_continuous(self, region: str) -> bool:
+        """该区域是否使用连续滚动模式"""
+        return self.monitors[region].rolling_scheduler is not None
+    
+    def check_staleness_sla(self) -> bool:
+        """
+        启动前按各区域的 staleness_sla 规划请求
+        
+        Returns:
+            是否可以启动（任一区域 strict 且预算不足时返回 False）
+        """
+        admitted = True
+        for region, monitor in self.monitors.items():
+            config = self.configs[region]
+            plan = monitor.plan_staleness(*monitor.get_targets())
+            if plan is None or plan['feasible']:
+                continue
+            
+            if (config.get('staleness_sla', {}) or {}).get('strict', False):
+                logger.error(f"🛑 区域 {region} 的新鲜度目标无法在请求预算内满足")
+                admitted = False
+            else:
+                logger.warning(f"⚠️  区域 {region} 的新鲜度目标无法全部满足，按放宽后的计划运行")
+        return admitted
+    
+    def watch_config_files(self, config_files: Dict[str, str]):
+        """
+        监视各区域的配置文件，修改（或收到 SIGHUP）后在该区域的下一个安全时机生效
+        
+        只为启用了 config_reload 的区域创建监视器
+        
+        Args:
+            config_files: {区域代码: 配置文件路径}
+        """
+        for region, config_file in config_files.items():
+            monitor = self.monitors.get(region)
+            if monitor is None:
+                continue
+            watcher = ConfigWatcher.from_config(self.configs[region], config_file,
+                                                partial(self._request_config_reload, region))
+            if watcher is not None:
+                self.watchers.append(watcher)
+        
+        if self.watchers:
+            install_sighup_handler(self.watchers)
+    
+    def _request_config_reload(self, region: str, new_config: dict):
+        """登记某个区域重新加载的配置（与启动时一样经过 build_region_config，保留按区域分开的文件名）"""
+        self.monitors[region].request_config_reload(build_region_config(new_config, region, self.multi_region))
+    
+    def _wait_until(self, region: str, deadline: float):
+        """等到指定时刻、停止信号或该区域有新配置（被其他区域的 notify 唤醒时继续等待）"""
+        monitor = self.monitors[region]
+        while not self.stop_event.is_set() and not monitor.has_pending_config():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.stop_event.wait(remaining)
+    
+    def _run_round(self, region: str) -> Dict:
+        """执行该区域的一轮检查"""
+        monitor = self.monitors[region]
+        config = self.configs[region]
+        products, target_stores = monitor.get_targets()
+        
+        if config.get('async_mode', False):
+            # 每个工作线程有自己的事件循环
+            return asyncio.run(monitor.check_multiple_products_async(products, target_stores))
+        return monitor.check_multiple_products(products, target_stores)
+    
+    def _next_round_delay(self, region: str) -> float:
+        """距该区域下一轮检查的秒数（熔断中则等到冷却结束）"""
+        monitor = self.monitors[region]
+        check_interval = monitor.get_check_interval(self.configs[region].get('check_interval', 3))
+        
+        circuit_state = monitor.get_circuit_state()
+        if not circuit_state or circuit_state['state'] == 'closed':
+            return check_interval
+        return circuit_state['remaining_cooldown']
+    
+    def _region_worker(self, region: str):
+        """区域工作线程：不断查询，把结果放入队列，直到收到停止信号"""
+        monitor = self.monitors[region]
+        
+        def on_result(part_number: str, data: Dict):
+            self.events.put((EVENT_RESULT, region, part_number, data))
+        
+        iteration = 0
+        while not self.stop_event.is_set():
+            try:
+                if self.is_continuous(region):
+                    monitor.run_continuous(*monitor.get_targets(), on_result)
+                    break
+                
+                # 配置热加载：新配置在两轮之间生效
+                monitor.apply_pending_config()
+                iteration += 1
+                logger.info(f"[{region}] 开始第 {iteration} 轮库存检查...")
+                results = self._run_round(region)
+                self.events.put((EVENT_ROUND, region, results))
+                
+                wait_seconds = self._next_round_delay(region)
+                logger.info(f"[{region}] 本轮检查完成，{wait_seconds:.0f}秒后进行下一轮...")
+                self._wait_until(region, time.monotonic() + wait_seconds)
+            except Exception as e:
+                logger.error(f"[{region}] 监控出错: {e}")
+                self.events.put((EVENT_ERROR, region, str(e)))
+                self._wait_until(region, time.monotonic() + ERROR_RETRY_DELAY)
+        
+        monitor.save_checkpoint()
+        self.events.put((EVENT_EXIT, region))
+    
+    def run(self, on_round: Optional[Callable[[str, Dict], None]] = None,
+            on_result: Optional[Callable[[str, str, Dict], None]] = None,
+            on_error: Optional[Callable[[str, str], None]] = None):
+        """
+        启动所有区域并在当前线程处理结果，直到收到停止信号且所有区域退出
+        
+        Args:
+            on_round: 回调 (区域, 本轮结果)，轮次模式每轮结束时调用
+            on_result: 回调 (区域, 型号, 结果字典)，连续模式每个结果到达时调用
+            on_error: 回调 (区域, 错误信息)
+        """
+        workers = [
+            threading.Thread(target=self._region_worker, args=(region,), name=f"monitor-{region}", daemon=True)
+            for region in self.monitors
+        ]
+        for worker in workers:
+            worker.start()
+        for watcher in self.watchers:
+            watcher.start()
+        logger.info(f"🌏 多区域监控已启动: {', '.join(self.monitors)}")
+        
+        running = len(workers)
+        while running:
+            event = self.events.get()
+            kind, region = event[0], event[1]
+            
+            try:
+                if kind == EVENT_EXIT:
+                    running -= 1
+                elif kind == EVENT_ROUND and on_round is not None:
+                    on_round(region, event[2])
+                elif kind == EVENT_RESULT and on_result is not None:
+                    on_result(region, event[2], event[3])
+                elif kind == EVENT_ERROR and on_error is not None:
+                    on_error(region, event[2])
+            except Exception as e:
+                # 显示或通知失败不影响其他结果
+                logger.error(f"[{region}] 处理结果出错: {e}")
+        
+        for watcher in self.watchers:
+            watcher.stop()
+        for worker in workers:
+            worker.join(timeout=1)
+        logger.info("多区域监控已退出")
+    
+    def export_history(self):
+        """导出各区域的历史记录（每个区域一个文件）"""
+        for region, monitor in self.monitors.items():
+            if self.configs[region].get('save_history', True):
+                monitor.export_history()
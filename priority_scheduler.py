@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+优先级调度模块
+按商品优先级（product.priority）和门店偏好为每个"产品-门店"组合分配权重，
+权重高的组合每轮都查询，权重低的组合隔几轮查询一次。
+总请求速率仍由限速器控制，省下的请求让每一轮更短，高优先级组合因此被更频繁地刷新
+"""
+
+import random
+from typing import Dict, List, Optional, Tuple
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+# 默认商品优先级权重（未知优先级按 medium 处理）
+DEFAULT_PRIORITY_WEIGHTS = {
+    'high': 4,
+    'medium': 2,
+    'low': 1,
+    'test': 1
+}
+DEFAULT_PRIORITY = 'medium'
+
+
+class PriorityScheduler:
+    """
+    加权轮询调度器
+    
+    每个组合的权重 = 商品优先级权重 × 门店权重。每轮每个组合累积
+    权重/最大权重 的额度，额度满 1 时本轮查询并扣除 1：
+    最高权重的组合每轮都查询，权重为其 1/4 的组合每 4 轮查询一次。
+    新组合第一轮一定查询，之后的相位随机错开，避免低权重组合集中在同一轮
+    """
+    
+    def __init__(self, priority_weights: Optional[Dict[str, float]] = None,
+                 store_weights: Optional[Dict[str, float]] = None, default_store_weight: float = 1.0):
+        """
+        初始化调度器
+        
+        Args:
+            priority_weights: {优先级: 权重}
+            store_weights: {门店编号: 权重}，未列出的门店使用 default_store_weight
+            default_store_weight: 默认门店权重
+        """
+        self.priority_weights = dict(DEFAULT_PRIORITY_WEIGHTS)
+        if priority_weights:
+            self.priority_weights.update(priority_weights)
+        self.store_weights = dict(store_weights or {})
+        self.default_store_weight = float(default_store_weight)
+        
+        # (型号, 门店编号) -> 累积额度
+        self.credits: Dict[Tuple[str, str], float] = {}
+        self.selected_count: Dict[str, int] = {}
+        self.rounds = 0
+    
+    @classmethod
+    def from_config(cls, config: dict) -> Optional['PriorityScheduler']:
+        """
+        根据配置文件的 priority_scheduling 段创建调度器
+        
+        priority_scheduling.enabled 为 false 时返回 None
+        """
+        scheduling_config = config.get('priority_scheduling', {}) or {}
+        if not scheduling_config.get('enabled', False):
+            return None
+        
+        return cls(
+            priority_weights=scheduling_config.get('priority_weights'),
+            store_weights=scheduling_config.get('store_weights'),
+            default_store_weight=scheduling_config.get('default_store_weight', 1.0)
+        )
+    
+    def product_weight(self, product: Dict) -> float:
+        """商品优先级权重"""
+        priority = product.get('priority', DEFAULT_PRIORITY)
+        return float(self.priority_weights.get(priority, self.priority_weights[DEFAULT_PRIORITY]))
+    
+    def pair_weight(self, product: Dict, store_number: str) -> float:
+        """组合权重 = 商品优先级权重 × 门店权重"""
+        store_weight = float(self.store_weights.get(store_number, self.default_store_weight))
+        return max(0.0, self.product_weight(product) * store_weight)
+    
+    def select(self, products: List[Dict], target_stores: List[str],
+               product_stores: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[str]]:
+        """
+        选出本轮需要查询的组合
+        
+        Args:
+            products: 商品列表
+            target_stores: 目标门店编号列表
+            product_stores: {型号: 该型号要查询的门店}（商品带 stores 字段时只在这些门店中选择）
+        
+        Returns:
+            {型号: [本轮要查询的门店编号]}（门店顺序与 target_stores 相同，没有组合的型号不出现）
+        """
+        product_stores = product_stores or {}
+        weights = {}
+        for product in products:
+            part_number = product.get('part_number')
+            if not part_number:
+                continue
+            for store_number in product_stores.get(part_number, target_stores):
+                weights[(part_number, store_number)] = self.pair_weight(product, store_number)
+        
+        max_weight = max(weights.values(), default=0.0)
+        if max_weight <= 0:
+            return {}
+        
+        self.rounds += 1
+        due: Dict[str, List[str]] = {}
+        for key, weight in weights.items():
+            share = weight / max_weight
+            credit = self.credits.get(key)
+            if credit is None:
+                # 新组合：本轮查询，之后的相位随机错开
+                credit = 1.0 + random.uniform(0.0, 1.0 - share) if share < 1.0 else 1.0
+            else:
+                credit += share
+            
+            if share > 0 and credit >= 1.0:
+                credit -= 1.0
+                part_number, store_number = key
+                due.setdefault(part_number, []).append(store_number)
+                self.selected_count[part_number] = self.selected_count.get(part_number, 0) + 1
+            
+            self.credits[key] = credit
+        
+        # 清理已不在配置中的组合
+        for key in [key for key in self.credits if key not in weights]:
+            del self.credits[key]
+        
+        return due
+    
+    def get_stats(self) -> Dict:
+        """获取调度统计（各型号被选中的次数）"""
+        return {
+            'rounds': self.rounds,
+            'tracked_pairs': len(self.credits),
+            'selected_count': dict(self.selected_count)
+        }
@@ -82,6 +82,107 @@ def calculate_safe_interval(product_count, store_count, store_delay=1, target_ra
     return max(10, check_interval)
 
 
+DEFAULT_MAX_STALENESS = 300  # 未匹配任何规则的组合允许的最长数据新鲜度（秒）
+
+
+def staleness_target(sla_config, product, store_number):
+    """
+    按 staleness_sla 配置计算组合的新鲜度目标（秒）
+    
+    规则可按 part_number、store、priority 匹配（未写的条件视为匹配），
+    多条规则匹配时取最严格的 max_staleness；都不匹配时使用 default_max_staleness
+    
+    Args:
+        sla_config: 配置文件的 staleness_sla 段
+        product: 商品信息
+        store_number: 门店编号
+    """
+    matched = [
+        float(rule['max_staleness'])
+        for rule in sla_config.get('rules', [])
+        if 'max_staleness' in rule
+        and rule.get('part_number', product.get('part_number')) == product.get('part_number')
+        and rule.get('store', store_number) == store_number
+        and rule.get('priority', product.get('priority')) == product.get('priority')
+    ]
+    if matched:
+        return min(matched)
+    return float(sla_config.get('default_max_staleness', DEFAULT_MAX_STALENESS))
+
+
+def plan_staleness(targets, requests_per_minute, continuous=True):
+    """
+    按新鲜度目标规划请求（运行时准入检查）
+    
+    每个请求单元（一个"产品-门店"组合，批量模式下为一个门店的一组型号）
+    要求至少每 targets[单元] 秒查询一次：
+    - 连续模式：单元 i 需要 1/T_i 次/秒，总和不超过预算即可行；
+      不可行时找出新鲜度下限 F，使所有目标低于 F 的单元放宽到 F 后总请求数恰好等于预算
+      （只放宽要求最严的单元，其余单元保持原目标）
+    - 轮询模式：所有单元每轮查询一次，一轮至少需要 单元数 / 预算 的时间，
+      因此最严格的目标决定 check_interval，目标低于一轮耗时的单元必须放宽
+    
+    Args:
+        targets: {请求单元: 最长允许的数据新鲜度（秒）}
+        requests_per_minute: 区域请求预算（次/分钟）
+        continuous: 是否为连续滚动模式
+    
+    Returns:
+        规划结果：feasible、budget、required_rate（满足全部目标所需的次/分钟）、
+        utilization、periods（{单元: 计划刷新周期}）、relax（{单元: 可达到的新鲜度}）、
+        round_interval（轮询模式下的 check_interval）
+    """
+    count = len(targets)
+    budget = float(requests_per_minute)
+    plan = {
+        'feasible': True,
+        'budget': budget,
+        'required_rate': 0.0,
+        'utilization': 0.0,
+        'periods': {},
+        'relax': {},
+        'round_interval': None
+    }
+    if not count:
+        return plan
+    if budget <= 0:
+        raise ValueError(f"请求预算必须大于0: {budget}")
+    
+    tightest = min(targets.values())
+    
+    if not continuous:
+        round_time = count * 60.0 / budget
+        plan['required_rate'] = count * 60.0 / tightest
+        plan['feasible'] = round_time <= tightest
+        plan['round_interval'] = max(0.0, tightest - round_time)
+        period = max(tightest, round_time)
+        plan['periods'] = {key: period for key in targets}
+        plan['relax'] = {key: round_time for key, target in targets.items() if target < round_time}
+        plan['utilization'] = min(1.0, plan['required_rate'] / budget)
+        return plan
+    
+    required = sum(60.0 / target for target in targets.values())
+    plan['required_rate'] = required
+    plan['utilization'] = min(1.0, required / budget)
+    if required <= budget:
+        plan['periods'] = dict(targets)
+        return plan
+    
+    # 二分查找新鲜度下限 F：sum(60 / max(T_i, F)) = budget
+    low, high = tightest, max(max(targets.values()), count * 60.0 / budget)
+    for _ in range(60):
+        floor = (low + high) / 2
+        if sum(60.0 / max(target, floor) for target in targets.values()) > budget:
+            low = floor
+        else:
+            high = floor
+    
+    plan['feasible'] = False
+    plan['periods'] = {key: max(target, high) for key, target in targets.items()}
+    plan['relax'] = {key: high for key, target in targets.items() if target < high}
+    return plan
+
+
 def print_calculation_result(result):
     """打印计算结果"""
     print(f"\n{Fore.CYAN}{'='*70}")
@@ -160,6 +261,72 @@ def analyze_config_file(config_path='config.json'):
         return None
 
 
+def analyze_staleness_sla(config_path='config.json'):
+    """按配置文件的 staleness_sla 段检查新鲜度目标能否在请求预算内满足"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except Exception as e:
+        print(f"{Fore.RED}❌ 读取配置文件失败：{e}{Style.RESET_ALL}")
+        return None
+    
+    # 与监控器相同的请求预算和请求单元（见 AppleStoreMonitorEnhanced.plan_staleness）
+    from rate_limiter import TokenBucket
+    from shared_budget import DEFAULT_SHARED_REQUESTS_PER_MINUTE
+    from rolling_scheduler import unit_key
+    from apple_store_monitor_enhanced import AppleStoreMonitorEnhanced, build_combinations, build_query_units
+    
+    budget = TokenBucket.from_config(config).rate_per_minute
+    shared_config = (config.get('rate_limit') or {}).get('shared_budget') or {}
+    if shared_config.get('enabled', False):
+        budget = min(budget, float(shared_config.get('requests_per_minute', DEFAULT_SHARED_REQUESTS_PER_MINUTE)))
+    
+    if config.get('all_stores', False):
+        region_config = AppleStoreMonitorEnhanced.REGIONS.get(config.get('region', 'CN'))
+        if region_config is None:
+            print(f"{Fore.RED}❌ 不支持的区域：{config.get('region')}{Style.RESET_ALL}")
+            return None
+        try:
+            with open(region_config['stores_file'], 'r', encoding='utf-8') as f:
+                target_stores = [store['storeNumber'] for store in json.load(f).get('stores', [])]
+        except Exception as e:
+            print(f"{Fore.RED}❌ 读取门店列表失败：{e}{Style.RESET_ALL}")
+            return None
+    else:
+        target_stores = config.get('target_stores', [])
+    
+    sla_config = config.get('staleness_sla') or {}
+    continuous = (config.get('continuous_mode') or {}).get('enabled', False)
+    units = build_query_units(build_combinations(config.get('target_products', []), target_stores),
+                              config, shuffle=False)
+    unit_by_key = {unit_key(unit): unit for unit in units}
+    targets = {
+        key: min(staleness_target(sla_config, combo['product'], unit['store_number']) for combo in unit['combos'])
+        for key, unit in unit_by_key.items()
+    }
+    plan = plan_staleness(targets, budget, continuous)
+    
+    print(f"\n{Fore.CYAN}{'='*70}")
+    print(f"📐 新鲜度规划：{config_path}（{'连续模式' if continuous else '轮询模式'}）")
+    print(f"{'='*70}{Style.RESET_ALL}\n")
+    print(f"  • 请求单元：{len(targets)} 个（{sum(len(unit['combos']) for unit in units)} 个组合）")
+    print(f"  • 请求预算：{budget:.1f} 次/分钟")
+    print(f"  • 满足全部目标需要：{plan['required_rate']:.2f} 次/分钟")
+    if plan['round_interval'] is not None:
+        print(f"  • 建议 check_interval：{plan['round_interval']:.0f} 秒")
+    
+    if plan['feasible']:
+        print(f"\n{Fore.GREEN}✅ 新鲜度目标可以满足（预算利用率 {plan['utilization']:.0%}）{Style.RESET_ALL}\n")
+    else:
+        print(f"\n{Fore.RED}❌ 预算不足，以下组合需要放宽：{Style.RESET_ALL}")
+        for key, achievable in sorted(plan['relax'].items(), key=lambda item: targets[item[0]]):
+            store_number, part_numbers = key
+            print(f"  • {', '.join(part_numbers)} @ {store_number}: 目标 {targets[key]:.0f}秒 → 最快 {achievable:.0f}秒")
+        print()
+    
+    return plan
+
+
 def interactive_mode():
     """交互式模式"""
     print(f"\n{Fore.CYAN}{'='*70}")
@@ -250,9 +417,10 @@ def main():
     print("  2. 交互式计算")
     print("  3. 查看推荐的安全配置")
     print("  4. 分析指定配置文件")
+    print("  5. 检查新鲜度目标 (staleness_sla)")
     
     try:
-        choice = input("\n请选择 (1-4): ").strip()
+        choice = input("\n请选择 (1-5): ").strip()
         
         if choice == '1':
             analyze_config_file('config.json')
@@ -263,6 +431,9 @@ def main():
         elif choice == '4':
             config_path = input("配置文件路径: ").strip()
             analyze_config_file(config_path)
+        elif choice == '5':
+            config_path = input("配置文件路径 (默认 config.json): ").strip() or 'config.json'
+            analyze_staleness_sla(config_path)
         else:
             print(f"{Fore.YELLOW}无效选择，分析默认配置{Style.RESET_ALL}")
             analyze_config_file('config.json')
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+请求节奏控制模块
+令牌桶限速器，所有监控器和扫描工具统一通过它控制请求频率；
+以及根据 HTTP 541 反馈自动调整速率的 AIMD 控制器
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from typing import Optional
+from datetime import datetime
+from logger_config import setup_logger
+from timer_core import wait_for_stop_async
+
+logger = setup_logger()
+
+# 未配置 rate_limit 时的默认值（与原先 1.5-2.5 秒随机间隔的平均频率一致）
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_BURST = 1
+DEFAULT_JITTER = 0.15
+
+# 同一进程内多个区域的节奏控制器共用状态文件，读-改-写需要串行
+_state_file_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    令牌桶限速器
+    
+    令牌以 rate_per_minute 的速度匀速补充，桶容量为 burst（另加 jitter 余量）。
+    每次请求消耗一个令牌（jitter 让每次消耗量在 1±jitter 之间随机浮动，
+    请求间隔因此不固定，但长期平均频率严格等于配置值）。
+    """
+    
+    def __init__(self, rate_per_minute: float, burst: int = DEFAULT_BURST,
+                 jitter: float = DEFAULT_JITTER, name: str = 'default'):
+        """
+        初始化限速器
+        
+        Args:
+            rate_per_minute: 每分钟请求数
+            burst: 桶容量（允许的最大突发请求数）
+            jitter: 间隔随机浮动比例（0表示固定间隔）
+            name: 名称（用于日志）
+        """
+        if rate_per_minute <= 0:
+            raise ValueError(f"rate_per_minute 必须大于0: {rate_per_minute}")
+        
+        self.name = name
+        self.burst = max(1, int(burst))
+        self.jitter = min(max(0.0, float(jitter)), 0.9)
+        self._rate_per_minute = float(rate_per_minute)
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._next_cost = self._draw_cost()
+        self._lock = threading.Lock()
+        self.total_acquired = 0
+    
+    @classmethod
+    def from_config(cls, config: dict, name: str = 'default') -> 'TokenBucket':
+        """
+        根据配置文件的 rate_limit 段创建限速器
+        
+        支持的字段：max_requests_per_minute、burst、jitter；
+        未配置 max_requests_per_minute 时按 delay_between_requests 换算
+        
+        Args:
+            config: 配置字典
+            name: 名称（用于日志）
+        """
+        rate_config = config.get('rate_limit', {}) or {}
+        
+        rate = rate_config.get('max_requests_per_minute')
+        if not rate:
+            delay = rate_config.get('delay_between_requests')
+            rate = 60.0 / delay if delay else DEFAULT_REQUESTS_PER_MINUTE
+        
+        return cls(
+            rate_per_minute=rate,
+            burst=rate_config.get('burst', DEFAULT_BURST),
+            jitter=rate_config.get('jitter', DEFAULT_JITTER),
+            name=name
+        )
+    
+    @property
+    def rate_per_minute(self) -> float:
+        """当前每分钟请求数"""
+        return self._rate_per_minute
+    
+    @rate_per_minute.setter
+    def rate_per_minute(self, value: float):
+        """调整速率（先按旧速率结算已积累的令牌）"""
+        if value <= 0:
+            raise ValueError(f"rate_per_minute 必须大于0: {value}")
+        with self._lock:
+            self._refill(time.monotonic())
+            self._rate_per_minute = float(value)
+    
+    def _draw_cost(self) -> float:
+        """本次请求消耗的令牌数（平均为1）"""
+        if not self.jitter:
+            return 1.0
+        return 1.0 + random.uniform(-self.jitter, self.jitter)
+    
+    def _refill(self, now: float):
+        """按经过的时间补充令牌"""
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            capacity = self.burst + self.jitter
+            self._tokens = min(capacity, self._tokens + elapsed * self._rate_per_minute / 60.0)
+            self._last_refill = now
+    
+    def try_acquire(self) -> float:
+        """
+        尝试获取一个请求许可（不阻塞）
+        
+        Returns:
+            0 表示已获取；否则为还需等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            
+            if self._tokens >= self._next_cost:
+                self._tokens -= self._next_cost
+                self._next_cost = self._draw_cost()
+                self.total_acquired += 1
+                return 0.0
+            
+            return (self._next_cost - self._tokens) * 60.0 / self._rate_per_minute
+    
+    def peek(self) -> float:
+        """
+        距下一个请求许可可用还有多少秒（不获取许可）
+        
+        Returns:
+            0 表示现在调用 try_acquire() 可以获取
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (self._next_cost - self._tokens) * 60.0 / self._rate_per_minute)
+    
+    def acquire(self, stop_event=None) -> bool:
+        """
+        阻塞直到获取一个请求许可
+        
+        Args:
+            stop_event: 停止事件，设置后立即返回
+        
+        Returns:
+            是否获取成功（收到停止信号时返回 False）
+        """
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            
+            logger.debug(f"⏳ [{self.name}] 等待 {wait:.3f}秒 后发送下一个请求...")
+            if stop_event is not None:
+                stop_event.wait(wait)
+            else:
+                time.sleep(wait)
+    
+    async def acquire_async(self, stop_event=None) -> bool:
+        """
+        异步等待直到获取一个请求许可
+        
+        Args:
+            stop_event: 停止事件（threading.Event），设置后尽快返回
+        
+        Returns:
+            是否获取成功（收到停止信号时返回 False）
+        """
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            
+            logger.debug(f"⏳ [{self.name}] 等待 {wait:.3f}秒 后发送下一个请求...")
+            # 收到停止信号时立即返回（见 timer_core.py）
+            await wait_for_stop_async(stop_event, wait)
+    
+    def get_stats(self) -> dict:
+        """获取限速器状态"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'name': self.name,
+                'rate_per_minute': self._rate_per_minute,
+                'burst': self.burst,
+                'jitter': self.jitter,
+                'tokens': round(self._tokens, 3),
+                'total_acquired': self.total_acquired
+            }
+
+
+def create_rate_limiter(config: dict, name: str = 'default', budget_key: Optional[str] = None) -> TokenBucket:
+    """
+    根据配置创建限速器
+    
+    指定 budget_key 且启用了 rate_limit.shared_budget 时，
+    返回受整机共享预算约束的限速器（见 shared_budget.py）
+    
+    Args:
+        config: 配置字典（读取 rate_limit 段）
+        name: 名称（用于日志，通常为区域代码）
+        budget_key: 共享预算键（通常为区域的 API 端点）
+    """
+    limiter = None
+    if budget_key:
+        from shared_budget import create_shared_rate_limiter
+        limiter = create_shared_rate_limiter(config, budget_key, name=name)
+    if limiter is None:
+        limiter = TokenBucket.from_config(config, name=name)
+    logger.info(f"请求节奏: {limiter.rate_per_minute:.1f} 次/分钟 "
+                f"(突发 {limiter.burst}, 抖动 ±{limiter.jitter:.0%}) [{name}]")
+    return limiter
+
+
+# 视为"限流/服务端过载"的HTTP状态码（5xx另行判断）
+THROTTLE_STATUS_CODES = (429, 541)
+
+
+def is_throttle_status(status_code: Optional[int]) -> bool:
+    """判断状态码是否表示被限流或服务端过载（541/429/5xx）"""
+    if status_code is None:
+        return False
+    return status_code in THROTTLE_STATUS_CODES or 500 <= status_code < 600
+
+
+class AdaptiveRateController:
+    """
+    AIMD 自适应节奏控制器
+    
+    响应正常时每 increase_every 次成功把速率加 increase_step（加性增），
+    遇到 541/429/5xx 时速率乘以 decrease_factor（乘性减），
+    速率始终在 [min_rate, max_rate] 之间。学到的速率按区域保存到
+    state_file，重启后从上次的安全速率继续。
+    """
+    
+    def __init__(self, limiter: TokenBucket, key: str, min_rate: float, max_rate: float,
+                 increase_step: float = 1.0, increase_every: int = 10,
+                 decrease_factor: float = 0.5, state_file: Optional[str] = None):
+        """
+        初始化控制器
+        
+        Args:
+            limiter: 被控制的限速器
+            key: 状态键（通常为区域代码）
+            min_rate: 速率下限（次/分钟）
+            max_rate: 速率上限（次/分钟，即配置的预算）
+            increase_step: 每次加性增加的速率（次/分钟）
+            increase_every: 连续多少次成功后增加一次
+            decrease_factor: 乘性减少系数（0-1）
+            state_file: 状态持久化文件，None表示不持久化
+        """
+        self.limiter = limiter
+        self.key = key
+        self.min_rate = max(0.1, float(min_rate))
+        self.max_rate = max(self.min_rate, float(max_rate))
+        self.increase_step = float(increase_step)
+        self.increase_every = max(1, int(increase_every))
+        self.decrease_factor = min(max(0.05, float(decrease_factor)), 0.95)
+        self.state_file = state_file
+        
+        self._lock = threading.Lock()
+        self._success_streak = 0
+        self._hold_until = 0.0
+        self.last_throttle_rate = None
+        self.throttle_count = 0
+        
+        self._load_state()
+    
+    @classmethod
+    def from_config(cls, config: dict, limiter: TokenBucket, key: str) -> Optional['AdaptiveRateController']:
+        """
+        根据配置文件的 rate_limit 段创建控制器
+        
+        rate_limit.adaptive 为 false 时返回 None；
+        max_requests_per_minute 作为速率上限
+        """
+        rate_config = config.get('rate_limit', {}) or {}
+        if not rate_config.get('adaptive', False):
+            return None
+        
+        return cls(
+            limiter=limiter,
+            key=key,
+            min_rate=rate_config.get('min_requests_per_minute', 4),
+            max_rate=limiter.rate_per_minute,
+            increase_step=rate_config.get('increase_step', 1.0),
+            increase_every=rate_config.get('increase_every', 10),
+            decrease_factor=rate_config.get('decrease_factor', 0.5),
+            state_file=rate_config.get('state_file', 'pacing_state.json')
+        )
+    
+    @property
+    def rate_per_minute(self) -> float:
+        """当前速率"""
+        return self.limiter.rate_per_minute
+    
+    @property
+    def at_floor(self) -> bool:
+        """是否已降到速率下限"""
+        return self.limiter.rate_per_minute <= self.min_rate
+    
+    def on_success(self):
+        """记录一次正常响应（加性增）"""
+        with self._lock:
+            self._success_streak += 1
+            if self._success_streak < self.increase_every:
+                return
+            self._success_streak = 0
+            
+            rate = self.limiter.rate_per_minute
+            new_rate = min(self.max_rate, rate + self.increase_step)
+            if new_rate > rate:
+                self.limiter.rate_per_minute = new_rate
+                logger.debug(f"📈 [{self.key}] 响应正常，速率提升到 {new_rate:.1f} 次/分钟")
+    
+    def on_throttle(self, status_code: Optional[int] = None):
+        """
+        记录一次限流响应（乘性减）
+        
+        降速后的一小段时间内（约两个请求间隔）不再重复降速，
+        避免同一批在途请求的连续 541 把速率压到底
+        """
+        with self._lock:
+            self._success_streak = 0
+            self.throttle_count += 1
+            
+            now = time.monotonic()
+            if now < self._hold_until:
+                return
+            
+            rate = self.limiter.rate_per_minute
+            new_rate = max(self.min_rate, rate * self.decrease_factor)
+            self.last_throttle_rate = rate
+            self.limiter.rate_per_minute = new_rate
+            self._hold_until = now + 2 * 60.0 / new_rate
+        
+        logger.warning(f"📉 [{self.key}] 收到 HTTP {status_code}，速率 {rate:.1f} → {new_rate:.1f} 次/分钟")
+        self.save()
+    
+    def _load_state(self):
+        """从状态文件恢复上次学到的速率"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f).get(self.key)
+        except Exception as e:
+            logger.warning(f"读取节奏状态失败: {e}")
+            return
+        
+        if not state:
+            return
+        
+        rate = min(self.max_rate, max(self.min_rate, float(state.get('rate_per_minute', self.max_rate))))
+        self.limiter.rate_per_minute = rate
+        self.last_throttle_rate = state.get('last_throttle_rate')
+        logger.info(f"已恢复 [{self.key}] 上次学到的请求速率: {rate:.1f} 次/分钟")
+    
+    def save(self):
+        """保存当前速率到状态文件（原子替换）"""
+        if not self.state_file:
+            return
+        
+        try:
+            with _state_file_lock:
+                state = {}
+                if os.path.exists(self.state_file):
+                    with open(self.state_file, 'r', encoding='utf-8') as f:
+                        state = json.load(f)
+                
+                state[self.key] = {
+                    'rate_per_minute': round(self.limiter.rate_per_minute, 3),
+                    'last_throttle_rate': self.last_throttle_rate,
+                    'updated_at': datetime.now().isoformat()
+                }
+                
+                tmp_file = f"{self.state_file}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            logger.warning(f"保存节奏状态失败: {e}")
+    
+    def get_stats(self) -> dict:
+        """获取控制器状态"""
+        return {
+            'rate_per_minute': round(self.limiter.rate_per_minute, 3),
+            'min_rate': self.min_rate,
+            'max_rate': self.max_rate,
+            'last_throttle_rate': self.last_throttle_rate,
+            'throttle_count': self.throttle_count
+        }
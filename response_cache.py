@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+库存响应缓存模块
+pickup-message 接口 pl=true 时一次响应会带回多个附近门店的库存，
+把每个 (区域, 型号, 门店) 的结果缓存一小段时间，
+有效期内的查询（包括其他产品、其他配置的监控器）直接使用缓存，不再发请求
+"""
+
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_TTL = 30            # 缓存有效期（秒）
+DEFAULT_MAX_ENTRIES = 20000
+
+
+class ResponseCache:
+    """
+    TTL 缓存，键为 (区域, 型号, 门店编号)，值为该门店的库存结果
+    
+    不论结果来自直接查询的门店还是响应中附带的附近门店，都一样写入缓存
+    """
+    
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        初始化缓存
+        
+        Args:
+            ttl: 有效期（秒）
+            max_entries: 最多缓存多少条（超出时先清理过期条目，仍超出则丢弃最早的）
+        """
+        self.ttl = max(0.1, float(ttl))
+        self.max_entries = max(1, int(max_entries))
+        
+        self._entries: Dict[Tuple[str, str, str], Tuple[float, Dict]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+    
+    def get(self, region: str, part_number: str, store_number: str) -> Optional[Dict]:
+        """
+        读取一条有效的缓存
+        
+        Returns:
+            门店库存结果；没有或已过期时返回 None
+        """
+        key = (region, part_number, store_number)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, region: str, part_number: str, stores: Dict[str, Dict]):
+        """
+        写入一个型号在若干门店的库存结果
+        
+        Args:
+            region: 区域代码
+            part_number: 商品型号编号
+            stores: {门店编号: 门店库存结果}
+        """
+        if not stores:
+            return
+        
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for store_number, store_result in stores.items():
+                self._entries[(region, part_number, store_number)] = (expires_at, store_result)
+            self.stored += len(stores)
+            
+            if len(self._entries) > self.max_entries:
+                self._evict()
+    
+    def _evict(self):
+        """清理过期条目；仍然超出上限时丢弃最早写入的条目"""
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            for key in list(self._entries)[:overflow]:
+                del self._entries[key]
+    
+    def snapshot(self, region: str) -> List[Tuple[str, str, float, Dict]]:
+        """
+        某个区域仍然有效的条目（用于检查点）
+        
+        Returns:
+            [(型号, 门店编号, 剩余有效秒数, 门店库存结果)]
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [(part_number, store_number, expires_at - now, store_result)
+                    for (entry_region, part_number, store_number), (expires_at, store_result) in self._entries.items()
+                    if entry_region == region and expires_at > now]
+    
+    def restore(self, region: str, entries: List[Tuple[str, str, float, Dict]]):
+        """
+        恢复检查点中的条目（剩余有效期已扣除检查点保存至今的时间，≤ 0 的丢弃）
+        
+        Args:
+            region: 区域代码
+            entries: [(型号, 门店编号, 剩余有效秒数, 门店库存结果)]
+        """
+        now = time.monotonic()
+        with self._lock:
+            for part_number, store_number, remaining, store_result in entries:
+                if remaining > 0:
+                    self._entries[(region, part_number, store_number)] = (now + min(remaining, self.ttl), store_result)
+            if len(self._entries) > self.max_entries:
+                self._evict()
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict:
+        """获取缓存统计（命中、未命中、命中率、条目数）"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'ttl': self.ttl,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stored': self.stored
+            }
+
+
+# 进程内共享的缓存（多个监控器、多个配置共用）
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache(config: dict) -> Optional[ResponseCache]:
+    """
+    获取进程内共享的响应缓存
+    
+    读取 response_cache 段；未启用时返回 None。
+    第一个启用缓存的配置决定有效期
+    
+    Args:
+        config: 配置字典
+    """
+    global _shared_cache
+    
+    cache_config = config.get('response_cache', {}) or {}
+    if not cache_config.get('enabled', False):
+        return None
+    
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                ttl=cache_config.get('ttl', DEFAULT_TTL),
+                max_entries=cache_config.get('max_entries', DEFAULT_MAX_ENTRIES)
+            )
+            logger.info(f"响应缓存: 有效期 {_shared_cache.ttl:.0f}秒")
+        return _shared_cache
+
+
+def split_cached(cache: Optional[ResponseCache], region: str, part_numbers: List[str],
+                 store_number: str) -> Tuple[Dict[str, Dict], List[str]]:
+    """
+    按缓存把一次查询拆成已缓存部分和需要请求的部分
+    
+    Args:
+        cache: 响应缓存（None 表示未启用）
+        region: 区域代码
+        part_numbers: 商品型号编号列表
+        store_number: 门店编号
+    
+    Returns:
+        ({型号: 门店库存结果}, 需要请求的型号列表)
+    """
+    if cache is None or not store_number:
+        return {}, list(part_numbers)
+    
+    cached = {}
+    missing = []
+    for part_number in part_numbers:
+        store_result = cache.get(region, part_number, store_number)
+        if store_result is None:
+            missing.append(part_number)
+        else:
+            cached[part_number] = store_result
+    return cached, missing
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+pickup-message 响应解码模块
+优先使用 orjson 解析 JSON（未安装时使用标准库 json）
+"""
+
+import json
+from typing import Dict
+
+# 尝试导入更快的 JSON 解析器（可选）
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def decode_json(raw) -> Dict:
+    """
+    解析 JSON 响应内容
+    
+    Args:
+        raw: 响应内容（bytes 或 str）
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def iter_store_availability(data: Dict, part_numbers):
+    """
+    遍历响应中每个门店、每个型号的库存字段
+    
+    只读取 storeNumber、storeName 和 partsAvailability[型号] 的
+    pickupDisplay / pickupSearchQuote，其余字段（地址、营业时间、提示文案）不访问
+    
+    Args:
+        data: 解析后的响应
+        part_numbers: 需要的商品型号编号列表
+    
+    Yields:
+        (门店编号, 门店名称, 型号, pickupDisplay, pickupSearchQuote)
+    """
+    body = data.get('body') if isinstance(data, dict) else None
+    if not isinstance(body, dict):
+        return
+    
+    for store in body.get('stores') or ():
+        store_number = store.get('storeNumber')
+        store_name = store.get('storeName')
+        parts_availability = store.get('partsAvailability') or {}
+        
+        for part_number in part_numbers:
+            product_info = parts_availability.get(part_number) or {}
+            yield (store_number, store_name, part_number,
+                   product_info.get('pickupDisplay', 'unavailable'),
+                   product_info.get('pickupSearchQuote', ''))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+补货规律学习模块
+根据库存历史估计每个"产品-门店"组合的库存变化频率（Gamma-Poisson 贝叶斯估计），
+每轮用 Thompson 采样把有限的请求优先分给经常在有货/无货之间切换的组合，
+长期无变化的组合少查，但任何组合都不会超过 min_revisit_interval 不被查询
+"""
+
+import math
+import time
+import random
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from transition_log import is_available_state
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_SAMPLE_FRACTION = 0.5
+DEFAULT_MIN_REVISIT_INTERVAL = 600   # 秒
+DEFAULT_PRIOR_FLIPS = 1.0            # 先验：prior_hours 小时内发生 prior_flips 次变化
+DEFAULT_PRIOR_HOURS = 24.0
+
+
+class PairStats:
+    """单个组合的观测统计"""
+    
+    __slots__ = ('available', 'last_seen', 'flips', 'exposure_hours')
+    
+    def __init__(self):
+        self.available: Optional[bool] = None
+        self.last_seen = 0.0
+        self.flips = 0
+        self.exposure_hours = 0.0
+
+
+class RestockLearner:
+    """
+    库存变化率学习器
+    
+    每个组合的变化率 λ（次/小时）服从 Gamma(prior_flips + 变化次数, prior_hours + 观测小时数)。
+    选择时从后验中采样 λ，距上次查询 age 小时内发生变化的概率为 1 - exp(-λ·age)，
+    按该概率（乘以优先级权重）从高到低选出本轮预算内的组合；
+    从未查询过或超过 min_revisit_interval 未查询的组合总是入选
+    """
+    
+    def __init__(self, sample_fraction: float = DEFAULT_SAMPLE_FRACTION,
+                 min_revisit_interval: float = DEFAULT_MIN_REVISIT_INTERVAL,
+                 prior_flips: float = DEFAULT_PRIOR_FLIPS, prior_hours: float = DEFAULT_PRIOR_HOURS):
+        """
+        初始化学习器
+        
+        Args:
+            sample_fraction: 每轮查询的组合比例（0-1）
+            min_revisit_interval: 每个组合最长多少秒必须查询一次
+            prior_flips: 先验变化次数
+            prior_hours: 先验观测小时数
+        """
+        self.sample_fraction = min(max(0.01, float(sample_fraction)), 1.0)
+        self.min_revisit_interval = max(1.0, float(min_revisit_interval))
+        self.prior_flips = max(0.01, float(prior_flips))
+        self.prior_hours = max(0.01, float(prior_hours))
+        
+        self.pairs: Dict[Tuple[str, str], PairStats] = {}
+        self.rounds = 0
+        self.forced_count = 0
+    
+    @classmethod
+    def from_config(cls, config: dict) -> Optional['RestockLearner']:
+        """
+        根据配置文件的 adaptive_sampling 段创建学习器
+        
+        adaptive_sampling.enabled 为 false 时返回 None
+        """
+        sampling_config = config.get('adaptive_sampling', {}) or {}
+        if not sampling_config.get('enabled', False):
+            return None
+        
+        return cls(
+            sample_fraction=sampling_config.get('sample_fraction', DEFAULT_SAMPLE_FRACTION),
+            min_revisit_interval=sampling_config.get('min_revisit_interval', DEFAULT_MIN_REVISIT_INTERVAL),
+            prior_flips=sampling_config.get('prior_flips', DEFAULT_PRIOR_FLIPS),
+            prior_hours=sampling_config.get('prior_hours', DEFAULT_PRIOR_HOURS)
+        )
+    
+    def observe(self, part_number: str, store_number: str, available: bool, when: Optional[float] = None):
+        """
+        记录一次观测
+        
+        Args:
+            part_number: 商品型号编号
+            store_number: 门店编号
+            available: 是否有货
+            when: 观测时间（时间戳），默认为当前时间
+        """
+        when = time.time() if when is None else when
+        stats = self.pairs.get((part_number, store_number))
+        if stats is None:
+            stats = PairStats()
+            self.pairs[(part_number, store_number)] = stats
+        
+        if stats.available is not None and when > stats.last_seen:
+            stats.exposure_hours += (when - stats.last_seen) / 3600.0
+            if available != stats.available:
+                stats.flips += 1
+        
+        stats.available = available
+        stats.last_seen = max(stats.last_seen, when)
+    
+    def observe_result(self, part_number: str, result, when: Optional[float] = None):
+        """
+        记录一个型号一轮的查询结果（只记录有响应的请求门店）
+        
+        Args:
+            part_number: 商品型号编号
+            result: 本轮结果（ProductStock 或同结构的字典）
+            when: 观测时间（时间戳）
+        """
+        stores = result.get('stores') or {}
+        requested = result.get('requested_stores') or stores.keys()
+        for store_number in requested:
+            store = stores.get(store_number)
+            if store is not None:
+                self.observe(part_number, store_number, bool(store.get('available')), when)
+    
+    def learn_from_transitions(self, transitions: Iterable,
+                               current: Optional[Dict[Tuple[str, str], List]] = None) -> int:
+        """
+        从状态变化记录热启动（重启后不必从先验重新学起）
+        
+        每个组合的观测时长从它的第一条记录算到最近一次观测，期间有货/无货之间的切换计入变化次数
+        
+        Args:
+            transitions: 按时间排序的变化记录 [时间, 区域, 型号, 门店, 原状态, 新状态, 取货提示]
+            current: 当前状态表 {(型号, 门店): [状态, 取货提示, 状态开始时间, 最近观测时间]}
+        
+        Returns:
+            计入的变化次数
+        """
+        spans: Dict[Tuple[str, str], List] = {}  # {组合: [首次时间, 最近时间, 变化次数, 是否有货]}
+        count = 0
+        for timestamp, _, part_number, store_number, old_state, new_state, _ in transitions:
+            try:
+                when = datetime.fromisoformat(timestamp).timestamp()
+            except (TypeError, ValueError):
+                continue
+            span = spans.setdefault((part_number, store_number), [when, when, 0, False])
+            span[1] = max(span[1], when)
+            span[3] = is_available_state(new_state)
+            if old_state is not None and is_available_state(old_state) != span[3]:
+                span[2] += 1
+                count += 1
+        
+        for key, entry in (current or {}).items():
+            try:
+                since = datetime.fromisoformat(entry[2]).timestamp()
+                last_seen = datetime.fromisoformat(entry[3]).timestamp()
+            except (TypeError, ValueError):
+                continue
+            span = spans.setdefault(key, [since, last_seen, 0, False])
+            span[0] = min(span[0], since)
+            span[1] = max(span[1], last_seen)
+            span[3] = is_available_state(entry[0])
+        
+        for key, (first, last, flips, available) in spans.items():
+            stats = self.pairs.get(key)
+            if stats is None:
+                stats = PairStats()
+                self.pairs[key] = stats
+            stats.flips += flips
+            stats.exposure_hours += max(0.0, last - first) / 3600.0
+            if last >= stats.last_seen:
+                stats.available = available
+                stats.last_seen = last
+        
+        if spans:
+            logger.info(f"📚 补货学习: 已从历史记录学习 {count} 次变化，{len(spans)} 个组合")
+        return count
+    
+    def change_rate(self, part_number: str, store_number: str) -> float:
+        """后验平均变化率（次/小时）"""
+        stats = self.pairs.get((part_number, store_number))
+        if stats is None:
+            return self.prior_flips / self.prior_hours
+        return (self.prior_flips + stats.flips) / (self.prior_hours + stats.exposure_hours)
+    
+    def _sample_change_probability(self, stats: PairStats, now: float) -> float:
+        """从后验采样变化率，返回距上次查询至今发生变化的概率"""
+        rate = random.gammavariate(self.prior_flips + stats.flips, 1.0) / (self.prior_hours + stats.exposure_hours)
+        age_hours = max(0.0, now - stats.last_seen) / 3600.0
+        return 1.0 - math.exp(-rate * age_hours)
+    
+    def select(self, products: List[Dict], target_stores: List[str],
+               weight_fn: Optional[Callable[[Dict, str], float]] = None,
+               product_stores: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[str]]:
+        """
+        选出本轮需要查询的组合
+        
+        Args:
+            products: 商品列表
+            target_stores: 目标门店编号列表
+            weight_fn: 组合权重函数 (product, store_number) -> 权重（例如优先级调度器的 pair_weight）
+            product_stores: {型号: 该型号要查询的门店}（商品带 stores 字段时只在这些门店中选择）
+        
+        Returns:
+            {型号: [本轮要查询的门店编号]}（门店顺序与 target_stores 相同）
+        """
+        product_stores = product_stores or {}
+        now = time.time()
+        forced = []
+        candidates = []
+        
+        for product in products:
+            part_number = product.get('part_number')
+            if not part_number:
+                continue
+            for store_number in product_stores.get(part_number, target_stores):
+                key = (part_number, store_number)
+                stats = self.pairs.get(key)
+                if stats is None or stats.available is None or now - stats.last_seen >= self.min_revisit_interval:
+                    forced.append(key)
+                    continue
+                
+                score = self._sample_change_probability(stats, now)
+                if weight_fn is not None:
+                    score *= weight_fn(product, store_number)
+                candidates.append((score, key))
+        
+        budget = math.ceil((len(forced) + len(candidates)) * self.sample_fraction)
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        chosen = set(forced)
+        chosen.update(key for _, key in candidates[:max(0, budget - len(forced))])
+        
+        self.rounds += 1
+        self.forced_count += len(forced)
+        
+        due: Dict[str, List[str]] = {}
+        for product in products:
+            part_number = product.get('part_number')
+            for store_number in product_stores.get(part_number, target_stores):
+                if (part_number, store_number) in chosen:
+                    due.setdefault(part_number, []).append(store_number)
+        return due
+    
+    def get_stats(self) -> Dict:
+        """获取学习统计（组合数、变化最频繁的组合）"""
+        ranked = sorted(self.pairs, key=lambda key: self.change_rate(*key), reverse=True)
+        return {
+            'rounds': self.rounds,
+            'tracked_pairs': len(self.pairs),
+            'forced_count': self.forced_count,
+            'total_flips': sum(stats.flips for stats in self.pairs.values()),
+            'most_active': [
+                {'part_number': part, 'store_number': store,
+                 'flips': self.pairs[(part, store)].flips,
+                 'rate_per_hour': round(self.change_rate(part, store), 4)}
+                for part, store in ranked[:5]
+            ]
+        }
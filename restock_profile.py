@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+补货时段分析模块
+按"星期几 × 小时"统计库存变化（有货/无货切换）次数，
+把每天的检查轮数集中到变化多的时段：热门时段缩短检查间隔，冷门时段拉长，
+每天的总轮数（即总请求数）保持不变
+
+也可以单独运行，从导出的历史记录文件生成时段分布：
+    python restock_profile.py stock_history_CN_20251006_120000.json ...
+"""
+
+import os
+import sys
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from logger_config import setup_logger
+from transition_log import LOG_FORMAT, is_available_state
+from history_exporter import is_jsonl_file, iter_transitions
+
+logger = setup_logger()
+
+HOURS_PER_WEEK = 7 * 24
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+DEFAULT_PROFILE_FILE = 'restock_profile.json'
+DEFAULT_MIN_FACTOR = 0.25  # 冷门时段检查频率最低为平均的 1/4
+DEFAULT_MAX_FACTOR = 4.0   # 热门时段检查频率最高为平均的 4 倍
+DEFAULT_PRIOR = 1.0        # 每个时段的平滑计数（数据少时接近均匀分布）
+
+
+def hour_of_week(when: datetime) -> int:
+    """时间对应的"星期几 × 小时"编号（0 = 周一 0点）"""
+    return when.weekday() * 24 + when.hour
+
+
+class RestockProfile:
+    """
+    每周 168 个小时的库存变化分布
+    
+    每天单独归一化：某小时的检查频率系数 = 该小时变化数 / 当天平均每小时变化数，
+    限制在 [min_factor, max_factor] 内并重新归一化，使当天系数平均值为 1，
+    检查间隔 = check_interval / 系数，因此一天内的总轮数与固定间隔时相同
+    """
+    
+    def __init__(self, min_factor: float = DEFAULT_MIN_FACTOR, max_factor: float = DEFAULT_MAX_FACTOR,
+                 prior: float = DEFAULT_PRIOR, profile_file: Optional[str] = None):
+        """
+        初始化时段分布
+        
+        Args:
+            min_factor: 检查频率系数下限
+            max_factor: 检查频率系数上限
+            prior: 每个时段的平滑计数
+            profile_file: 分布持久化文件，None表示不持久化
+        """
+        self.min_factor = min(max(0.01, float(min_factor)), 1.0)
+        self.max_factor = max(1.0, float(max_factor))
+        self.prior = max(0.0, float(prior))
+        self.profile_file = profile_file
+        
+        self.counts = [0.0] * HOURS_PER_WEEK
+        self._last_state: Dict[Tuple[str, str], bool] = {}
+        self._factors: Optional[List[float]] = None
+        
+        self._load()
+    
+    @classmethod
+    def from_config(cls, config: dict) -> Optional['RestockProfile']:
+        """
+        根据配置文件的 restock_profile 段创建时段分布
+        
+        restock_profile.enabled 为 false 时返回 None
+        """
+        profile_config = config.get('restock_profile', {}) or {}
+        if not profile_config.get('enabled', False):
+            return None
+        
+        return cls(
+            min_factor=profile_config.get('min_factor', DEFAULT_MIN_FACTOR),
+            max_factor=profile_config.get('max_factor', DEFAULT_MAX_FACTOR),
+            prior=profile_config.get('prior', DEFAULT_PRIOR),
+            profile_file=profile_config.get('profile_file', DEFAULT_PROFILE_FILE)
+        )
+    
+    @property
+    def total_changes(self) -> int:
+        """已记录的变化总数"""
+        return int(sum(self.counts))
+    
+    def record_change(self, when: datetime, count: float = 1.0):
+        """记录一次库存变化"""
+        self.counts[hour_of_week(when)] += count
+        self._factors = None
+    
+    def observe(self, part_number: str, store_number: str, available: bool, when: datetime):
+        """
+        记录一次观测，与上次观测不同时计为一次变化
+        
+        Args:
+            part_number: 商品型号编号
+            store_number: 门店编号
+            available: 是否有货
+            when: 观测时间
+        """
+        key = (part_number, store_number)
+        previous = self._last_state.get(key)
+        self._last_state[key] = available
+        if previous is not None and previous != available:
+            self.record_change(when)
+    
+    def observe_result(self, part_number: str, result, when: Optional[datetime] = None):
+        """
+        记录一个型号一轮的查询结果
+        
+        Args:
+            part_number: 商品型号编号
+            result: 本轮结果（ProductStock 或同结构的字典）
+            when: 观测时间，默认为当前时间
+        """
+        when = when or datetime.now()
+        stores = result.get('stores') or {}
+        for store_number in result.get('requested_stores') or stores.keys():
+            store = stores.get(store_number)
+            if store is not None:
+                self.observe(part_number, store_number, bool(store.get('available')), when)
+    
+    def learn_from_history(self, stock_history: Dict) -> int:
+        """
+        从导出的历史记录统计变化
+        
+        支持状态变化日志（transition_log.TransitionLog.to_dict() 的格式）和
+        旧的快照格式（{型号: [{'timestamp', 'data': {'result': ...}}]}）
+        
+        Returns:
+            学习的记录条数
+        """
+        if stock_history.get('format') == LOG_FORMAT:
+            return self.learn_from_transitions(stock_history.get('transitions') or [])
+        
+        count = 0
+        for part_number, entries in stock_history.items():
+            for entry in sorted(entries, key=lambda item: item.get('timestamp', '')):
+                try:
+                    when = datetime.fromisoformat(entry['timestamp'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                result = (entry.get('data') or {}).get('result')
+                if result:
+                    self.observe_result(part_number, result, when)
+                    count += 1
+        return count
+    
+    def learn_from_transitions(self, transitions: Iterable) -> int:
+        """
+        从状态变化记录 [时间, 区域, 型号, 门店, 原状态, 新状态, 取货提示] 统计有货/无货切换
+        
+        Returns:
+            计入的变化次数
+        """
+        count = 0
+        for timestamp, _, _, _, old_state, new_state, _ in transitions:
+            if old_state is None or is_available_state(old_state) == is_available_state(new_state):
+                continue
+            try:
+                self.record_change(datetime.fromisoformat(timestamp))
+            except (TypeError, ValueError):
+                continue
+            count += 1
+        return count
+    
+    def _day_factors(self, day: int) -> List[float]:
+        """计算某一天 24 个小时的检查频率系数（平均值为 1）"""
+        weights = [count + self.prior for count in self.counts[day * 24:(day + 1) * 24]]
+        total = sum(weights)
+        if total <= 0:
+            return [1.0] * 24
+        
+        factors = [weight * 24 / total for weight in weights]
+        
+        # 截断到 [min_factor, max_factor]，再把差额按比例分给未截断的小时，直到平均值回到 1
+        for _ in range(20):
+            clipped = [min(self.max_factor, max(self.min_factor, factor)) for factor in factors]
+            excess = 24 - sum(clipped)
+            if abs(excess) < 1e-9:
+                return clipped
+            
+            free = [i for i, factor in enumerate(clipped)
+                    if (excess > 0 and factor < self.max_factor) or (excess < 0 and factor > self.min_factor)]
+            free_total = sum(clipped[i] for i in free)
+            if not free or free_total <= 0:
+                return clipped
+            
+            factors = list(clipped)
+            for i in free:
+                factors[i] += excess * clipped[i] / free_total
+        
+        return [min(self.max_factor, max(self.min_factor, factor)) for factor in factors]
+    
+    def factors(self) -> List[float]:
+        """一周 168 个小时的检查频率系数"""
+        if self._factors is None:
+            self._factors = [factor for day in range(7) for factor in self._day_factors(day)]
+        return self._factors
+    
+    def interval_for(self, base_interval: float, when: Optional[datetime] = None) -> float:
+        """
+        计算当前时段的检查间隔
+        
+        Args:
+            base_interval: 配置的固定检查间隔（秒）
+            when: 时间，默认为当前时间
+        """
+        when = when or datetime.now()
+        return base_interval / self.factors()[hour_of_week(when)]
+    
+    def _load(self):
+        """从分布文件恢复统计"""
+        if not self.profile_file or not os.path.exists(self.profile_file):
+            return
+        
+        try:
+            with open(self.profile_file, 'r', encoding='utf-8') as f:
+                counts = json.load(f).get('counts', [])
+        except Exception as e:
+            logger.warning(f"读取补货时段分布失败: {e}")
+            return
+        
+        if len(counts) == HOURS_PER_WEEK:
+            self.counts = [float(count) for count in counts]
+            logger.info(f"已加载补货时段分布: {self.total_changes} 次库存变化")
+    
+    def save(self):
+        """保存统计到分布文件（原子替换）"""
+        if not self.profile_file:
+            return
+        
+        try:
+            tmp_file = f"{self.profile_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'counts': self.counts,
+                    'updated_at': datetime.now().isoformat()
+                }, f, ensure_ascii=False)
+            os.replace(tmp_file, self.profile_file)
+        except Exception as e:
+            logger.warning(f"保存补货时段分布失败: {e}")
+    
+    def format_table(self) -> str:
+        """生成按天、按小时的变化次数表"""
+        lines = ['      ' + ' '.join(f'{hour:>3}' for hour in range(24))]
+        for day in range(7):
+            row = self.counts[day * 24:(day + 1) * 24]
+            lines.append(f"{WEEKDAY_NAMES[day]}  " + ' '.join(f'{int(count):>3}' for count in row))
+        return '\n'.join(lines)
+
+
+def main():
+    """从导出的历史记录文件生成补货时段分布"""
+    files = sys.argv[1:]
+    if not files:
+        print("用法: python restock_profile.py stock_history_*.json|stock_history_*.jsonl[.gz] [...]")
+        return
+    
+    profile = RestockProfile()
+    for filename in files:
+        try:
+            if is_jsonl_file(filename):
+                count = profile.learn_from_transitions(iter_transitions(filename))
+            else:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    count = profile.learn_from_history(json.load(f))
+            print(f"✅ {filename}: {count} 条记录")
+        except Exception as e:
+            print(f"❌ {filename}: {e}")
+    
+    print(f"\n📊 库存变化次数（共 {profile.total_changes} 次）\n")
+    print(profile.format_table())
+    
+    profile.profile_file = DEFAULT_PROFILE_FILE
+    profile.save()
+    print(f"\n📄 已保存到: {DEFAULT_PROFILE_FILE}")
+
+
+if __name__ == "__main__":
+    main()
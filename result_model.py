@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+库存结果数据模型
+用 __slots__ 对象代替每个门店、每次响应都新建的嵌套字典：
+门店元数据（名称、城市、区域）每个门店只保存一份，库存结果只引用它；
+产品的有货门店列表和门店计数按需计算，不再重复保存。
+
+所有对象都提供只读的字典接口（get / [] / in / keys），
+main.py、notifier.py 等按字典使用结果的代码无需修改
+"""
+
+from typing import Dict, List, Optional
+
+
+class DictAdapter:
+    """
+    只读字典接口
+    
+    子类在 KEYS 中列出对外暴露的键，每个键对应一个同名属性；
+    值为 None 的键视为不存在（与原先字典中没有该键的行为一致）
+    """
+    
+    __slots__ = ()
+    KEYS = ()
+    
+    def __getitem__(self, key):
+        if key in self.KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+    
+    def get(self, key, default=None):
+        """与 dict.get 相同"""
+        if key in self.KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        return default
+    
+    def __contains__(self, key) -> bool:
+        return key in self.KEYS and getattr(self, key) is not None
+    
+    def keys(self) -> List[str]:
+        """存在的键"""
+        return [key for key in self.KEYS if getattr(self, key) is not None]
+    
+    def items(self):
+        """(键, 值) 列表"""
+        return [(key, getattr(self, key)) for key in self.keys()]
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self) -> int:
+        return len(self.keys())
+    
+    def to_dict(self) -> Dict:
+        """转换为普通字典（嵌套对象一并转换，用于 JSON 导出）"""
+        return {key: to_jsonable(value) for key, value in self.items()}
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class StoreInfo:
+    """门店元数据（每个门店只创建一次，所有库存结果共享引用）"""
+    
+    __slots__ = ('store_number', 'store_name', 'city', 'district', 'region')
+    
+    def __init__(self, store_number: str, store_name: str, city: str = '',
+                 district: str = '', region: str = ''):
+        self.store_number = store_number
+        self.store_name = store_name
+        self.city = city
+        self.district = district
+        self.region = region
+
+
+class StoreStock(DictAdapter):
+    """某个型号在某个门店的库存"""
+    
+    __slots__ = ('info', 'available', 'pickup_display', 'pickup_quote')
+    KEYS = ('store_number', 'store_name', 'city', 'district', 'available',
+            'pickup_display', 'pickup_quote', 'region')
+    
+    def __init__(self, info: StoreInfo, pickup_display: str, pickup_quote: str = ''):
+        self.info = info
+        self.pickup_display = pickup_display
+        self.pickup_quote = pickup_quote
+        self.available = pickup_display == 'available'
+    
+    @property
+    def store_number(self) -> str:
+        return self.info.store_number
+    
+    @property
+    def store_name(self) -> str:
+        return self.info.store_name
+    
+    @property
+    def city(self) -> str:
+        return self.info.city
+    
+    @property
+    def district(self) -> str:
+        return self.info.district
+    
+    @property
+    def region(self) -> str:
+        return self.info.region
+
+
+class ProductStock(DictAdapter):
+    """
+    某个型号的查询结果（单次请求或一整轮）
+    
+    stores 为 {门店编号: StoreStock}；available_stores、
+    requested_stores_count、responded_stores_count 都由 stores 和
+    requested_stores 即时计算
+    """
+    
+    __slots__ = ('success', 'part_number', 'stores', 'requested_stores', 'timestamp',
+                 'region', 'error', 'status_code', 'from_cache')
+    KEYS = ('success', 'part_number', 'stores', 'available_stores', 'requested_stores',
+            'requested_stores_count', 'responded_stores_count', 'timestamp', 'region',
+            'error', 'status_code', 'from_cache')
+    
+    def __init__(self, part_number: Optional[str] = None, success: bool = True,
+                 stores: Optional[Dict[str, StoreStock]] = None, requested_stores: Optional[List[str]] = None,
+                 timestamp: Optional[str] = None, region: Optional[str] = None,
+                 error: Optional[str] = None, status_code: Optional[int] = None, from_cache: bool = False):
+        self.success = success
+        self.part_number = part_number
+        self.stores = {} if stores is None and success else stores
+        self.requested_stores = requested_stores
+        self.timestamp = timestamp
+        self.region = region
+        self.error = error
+        self.status_code = status_code
+        self.from_cache = from_cache or None
+    
+    @classmethod
+    def failure(cls, part_number: str, error: str, status_code: Optional[int] = None) -> 'ProductStock':
+        """创建失败结果"""
+        return cls(part_number, success=False, error=error, status_code=status_code)
+    
+    @property
+    def available_stores(self) -> Optional[List[StoreStock]]:
+        """有货门店列表"""
+        if self.stores is None:
+            return None
+        return [stock for stock in self.stores.values() if stock.available]
+    
+    @property
+    def requested_stores_count(self) -> Optional[int]:
+        """请求的门店数"""
+        if self.requested_stores is None:
+            return None
+        return len(self.requested_stores)
+    
+    @property
+    def responded_stores_count(self) -> Optional[int]:
+        """有响应的门店数"""
+        if self.stores is None:
+            return None
+        return len(self.stores)
+
+
+def to_jsonable(value):
+    """把结果对象（含嵌套的列表、字典）转换为可 JSON 序列化的值"""
+    if isinstance(value, DictAdapter):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    return value
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+连续滚动调度模块
+不再按"整轮查询 → 显示 → 休眠 check_interval"的节奏运行，
+而是把所有请求单元放进按下次到期时间排序的堆中，按限速器节奏不间断地取出最早到期的单元查询，
+查询完成后立即按它的刷新周期重新排入队列。每个组合的数据新鲜度因此均匀，轮次之间也没有空闲
+"""
+
+import heapq
+import time
+import random
+from typing import Dict, List, Optional, Tuple
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_MIN_PERIOD = 0.0       # 单个请求单元的最短刷新周期（秒），0表示完全由请求速率决定
+DEFAULT_STATS_INTERVAL = 60.0  # 输出统计日志的间隔（秒）
+
+
+def unit_key(unit: Dict) -> Tuple[str, Tuple[str, ...]]:
+    """请求单元的标识：(门店编号, 型号元组)"""
+    return unit['store_number'], tuple(combo['part_number'] for combo in unit['combos'])
+
+
+class RollingScheduler:
+    """
+    按到期时间排序的请求单元队列
+    
+    每个单元的刷新周期 = 总权重 / (单元权重 × 每秒请求数)，
+    即按请求速率轮转一遍所有单元所需的时间（权重高的单元按比例更频繁），
+    并且不短于 min_period。堆中按到期时间取出，速率不足时所有单元一起顺延，先到期的仍然先查询
+    """
+    
+    def __init__(self, min_period: float = DEFAULT_MIN_PERIOD, stats_interval: float = DEFAULT_STATS_INTERVAL):
+        """
+        初始化调度器
+        
+        Args:
+            min_period: 单个请求单元的最短刷新周期（秒）
+            stats_interval: 输出统计日志的间隔（秒）
+        """
+        self.min_period = max(0.0, float(min_period))
+        self.stats_interval = max(1.0, float(stats_interval))
+        
+        self.units: Dict[Tuple, Dict] = {}
+        self.weights: Dict[Tuple, float] = {}
+        self.due: Dict[Tuple, float] = {}
+        self.last_checked: Dict[Tuple, float] = {}
+        self._heap: List[Tuple[float, int, Tuple]] = []
+        self._seq = 0
+        self._restored: Dict[Tuple, Tuple[float, Optional[float]]] = {}  # 检查点中的 {单元标识: (距到期秒数, 距上次查询秒数)}
+        
+        self.dispatched = 0
+        self.max_lag = 0.0
+    
+    @classmethod
+    def from_config(cls, config: dict) -> Optional['RollingScheduler']:
+        """
+        根据配置文件的 continuous_mode 段创建调度器
+        
+        continuous_mode.enabled 为 false 时返回 None
+        """
+        continuous_config = config.get('continuous_mode', {}) or {}
+        if not continuous_config.get('enabled', False):
+            return None
+        
+        return cls(
+            min_period=continuous_config.get('min_period', DEFAULT_MIN_PERIOD),
+            stats_interval=continuous_config.get('stats_interval', DEFAULT_STATS_INTERVAL)
+        )
+    
+    def _push(self, key: Tuple, due: float):
+        """把单元按到期时间放入堆（旧的堆条目在取出时丢弃）"""
+        self.due[key] = due
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, key))
+    
+    def sync(self, units: List[Dict], weights: Optional[Dict[Tuple, float]] = None) -> Tuple[int, int]:
+        """
+        用新的请求单元列表更新队列
+        
+        新单元立即到期（按随机顺序），已有单元保留原到期时间，不在列表中的单元移除
+        
+        Args:
+            units: 请求单元列表
+            weights: {单元标识: 权重}，未列出的单元权重为 1
+        
+        Returns:
+            (新增单元数, 移除单元数)
+        """
+        weights = weights or {}
+        incoming = {unit_key(unit): unit for unit in units}
+        
+        removed = [key for key in self.units if key not in incoming]
+        for key in removed:
+            del self.units[key]
+            self.weights.pop(key, None)
+            self.due.pop(key, None)
+            self.last_checked.pop(key, None)
+        
+        now = time.monotonic()
+        added = [key for key in incoming if key not in self.units]
+        random.shuffle(added)
+        for key in incoming:
+            self.units[key] = incoming[key]
+            self.weights[key] = max(0.0, float(weights.get(key, 1.0)))
+        for key in added:
+            # 检查点中有记录的单元按原到期时间继续，其余立即到期
+            remaining, age = self._restored.pop(key, (0.0, None))
+            if age is not None:
+                self.last_checked[key] = now - age
+            self._push(key, now + remaining)
+        
+        # 堆中只剩已移除单元的旧条目过多时重建
+        if len(self._heap) > 2 * len(self.units) + 16:
+            self._heap = [(due, seq, key) for due, seq, key in self._heap
+                          if self.due.get(key) == due]
+            heapq.heapify(self._heap)
+        
+        return len(added), len(removed)
+    
+    def peek(self) -> Optional[Tuple[Dict, float]]:
+        """
+        最早到期的单元
+        
+        Returns:
+            (请求单元, 距到期的秒数，已到期时 ≤ 0)；队列为空时返回 None
+        """
+        while self._heap:
+            due, _, key = self._heap[0]
+            if key in self.units and self.due.get(key) == due and self.weights.get(key, 0) > 0:
+                return self.units[key], due - time.monotonic()
+            heapq.heappop(self._heap)
+        return None
+    
+    def period_for(self, key: Tuple, rate_per_minute: float) -> float:
+        """
+        单元的刷新周期（秒）
+        
+        Args:
+            key: 单元标识
+            rate_per_minute: 当前请求速率
+        """
+        total_weight = sum(self.weights.values())
+        weight = self.weights.get(key, 0.0)
+        if weight <= 0 or rate_per_minute <= 0:
+            return self.min_period
+        return max(self.min_period, total_weight / weight * 60.0 / rate_per_minute)
+    
+    def complete(self, unit: Dict, rate_per_minute: float, delay: Optional[float] = None):
+        """
+        单元查询完成（或因缓存命中无需请求），按刷新周期重新排入队列
+        
+        Args:
+            unit: 请求单元
+            rate_per_minute: 当前请求速率
+            delay: 指定下次到期前的秒数（例如熔断冷却），None表示按刷新周期
+        """
+        key = unit_key(unit)
+        if key not in self.units:
+            return
+        
+        now = time.monotonic()
+        self.max_lag = max(self.max_lag, now - self.due.get(key, now))
+        self.last_checked[key] = now
+        self.dispatched += 1
+        self._push(key, now + (self.period_for(key, rate_per_minute) if delay is None else delay))
+    
+    def snapshot(self) -> List[List]:
+        """
+        各单元的到期时间（用于检查点，单调时钟换算为相对时间）
+        
+        Returns:
+            [[门店编号, [型号...], 距到期秒数, 距上次查询秒数或 None]]
+        """
+        now = time.monotonic()
+        return [[key[0], list(key[1]), round(self.due[key] - now, 3),
+                 round(now - self.last_checked[key], 3) if key in self.last_checked else None]
+                for key in self.units if key in self.due]
+    
+    def restore(self, entries: List[List], elapsed: float = 0.0):
+        """
+        登记检查点中的到期时间，下次 sync() 加入这些单元时按原计划继续（而不是全部立即到期）
+        
+        Args:
+            entries: snapshot() 的结果
+            elapsed: 检查点保存至今的秒数
+        """
+        for store_number, part_numbers, remaining, age in entries:
+            self._restored[(store_number, tuple(part_numbers))] = (
+                max(0.0, remaining - elapsed), None if age is None else age + elapsed)
+    
+    def staleness(self) -> Tuple[float, float]:
+        """
+        当前各单元距上次查询的时间
+        
+        Returns:
+            (平均秒数, 最大秒数)，尚未查询过的单元不计入
+        """
+        now = time.monotonic()
+        ages = [now - checked for checked in self.last_checked.values()]
+        if not ages:
+            return 0.0, 0.0
+        return sum(ages) / len(ages), max(ages)
+    
+    def get_stats(self) -> Dict:
+        """获取调度统计"""
+        mean_age, max_age = self.staleness()
+        return {
+            'units': len(self.units),
+            'dispatched': self.dispatched,
+            'mean_staleness': round(mean_age, 1),
+            'max_staleness': round(max_age, 1),
+            'max_lag': round(self.max_lag, 1)
+        }
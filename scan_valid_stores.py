@@ -11,9 +11,14 @@ import json
 import time
 from datetime import datetime
 from logger_config import setup_logger
+from rate_limiter import TokenBucket
 
 logger = setup_logger()
 
+# 扫描请求频率（次/分钟）
+SCAN_REQUESTS_PER_MINUTE = 20
+CONSERVATIVE_REQUESTS_PER_MINUTE = 10
+
 # 2025年最新门店列表（从web搜索获取）
 KNOWN_STORES_2025 = {
     "上海": ["浦东", "上海环贸iapm", "环球港", "七宝", "香港广场", "五角场", "南京东路", "静安"],
@@ -91,15 +96,15 @@ def test_store_number(store_number, part_number="MG0G4CH/A"):
         }
 
 
-def scan_store_range(start, end, delay=2, conservative=False):
+def scan_store_range(start, end, rate_per_minute=SCAN_REQUESTS_PER_MINUTE, conservative=False):
     """
     扫描一个范围的门店编号
     
     Args:
         start: 起始编号
         end: 结束编号
-        delay: 基础延迟（秒）
-        conservative: 保守模式（更长延迟，更安全）
+        rate_per_minute: 请求频率（次/分钟）
+        conservative: 保守模式（更低频率，更安全）
     """
     
     valid_stores = []
@@ -107,20 +112,23 @@ def scan_store_range(start, end, delay=2, conservative=False):
     error_count = 0  # 连续错误计数
     http_541_count = 0  # HTTP 541错误计数
     
-    # 保守模式使用更长延迟
+    # 保守模式使用更低频率
     if conservative:
-        delay = max(delay, 3)
-        print(f"\n⚠️  保守模式已启用：每次请求延迟{delay}秒，每10次额外休息30秒")
+        rate_per_minute = min(rate_per_minute, CONSERVATIVE_REQUESTS_PER_MINUTE)
+        print(f"\n⚠️  保守模式已启用：每分钟最多{rate_per_minute}次请求")
+    
+    rate_limiter = TokenBucket(rate_per_minute, name='scan')
     
     print(f"\n{'='*80}")
     print(f"🔍 扫描门店编号范围: R{start:03d} - R{end:03d}")
     print(f"{'='*80}")
-    print(f"⏱️  预计耗时: {(end-start+1) * delay / 60:.1f} 分钟")
+    print(f"⏱️  预计耗时: {(end-start+1) / rate_per_minute:.1f} 分钟")
     print(f"{'='*80}\n")
     
     for i in range(start, end + 1):
         store_num = f"R{i:03d}"
         
+        rate_limiter.acquire()
         print(f"测试 {store_num}...", end=' ', flush=True)
         
         result = test_store_number(store_num)
@@ -175,19 +183,8 @@ def scan_store_range(start, end, delay=2, conservative=False):
             error_count = 0  # 普通无效不算错误
             http_541_count = 0
         
-        # 基础延迟
-        time.sleep(delay)
-        
-        # 每10个编号额外休息
         if (i - start + 1) % 10 == 0:
-            extra_delay = 10 if not conservative else 30
-            print(f"\n💤 已扫描 {i-start+1}/{end-start+1}，休息{extra_delay}秒...\n")
-            time.sleep(extra_delay)
-        
-        # 保守模式：每5个编号额外休息
-        elif conservative and (i - start + 1) % 5 == 0:
-            print(f"\n💤 保守模式休息...\n")
-            time.sleep(10)
+            print(f"\n📊 已扫描 {i-start+1}/{end-start+1}\n")
     
     return valid_stores, invalid_stores
 
@@ -301,8 +298,11 @@ def main():
         print(f"🔍 测试已知门店编号")
         print(f"{'='*80}\n")
         
+        rate_limiter = TokenBucket(SCAN_REQUESTS_PER_MINUTE, name='scan')
+        
         for i, num in enumerate(known_numbers, 1):
             store_num = f"R{num:03d}"
+            rate_limiter.acquire()
             print(f"[{i}/{len(known_numbers)}] 测试 {store_num}...", end=' ', flush=True)
             
             result = test_store_number(store_num)
@@ -319,10 +319,6 @@ def main():
                     'storeNumber': store_num,
                     'error': result.get('error', 'Unknown')
                 })
-            
-            # 延迟
-            if i < len(known_numbers):
-                time.sleep(3)
         
         end_time = datetime.now()
     else:
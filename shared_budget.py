@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+跨进程共享请求预算模块
+同一台机器上运行多个监控实例（main.py、start_hk.py、不同 config_*.json）时，
+所有实例从同一个 SQLite 令牌账本取令牌，保证整机对同一 API 端点的总请求频率不超过预算
+"""
+
+import os
+import time
+import random
+import sqlite3
+import threading
+from typing import Optional
+from logger_config import setup_logger
+from rate_limiter import TokenBucket, DEFAULT_BURST, DEFAULT_JITTER
+
+logger = setup_logger()
+
+# 整机默认预算（次/分钟），与 rate_calculator.py 的安全标准一致
+DEFAULT_SHARED_REQUESTS_PER_MINUTE = 10
+DEFAULT_SHARED_DB_FILE = 'shared_budget.db'
+
+# 超过这么久没有取令牌的实例不再计入活跃实例
+ACTIVE_WINDOW_SECONDS = 120
+
+# 取令牌时等待其他实例释放账本写锁的上限（秒）。事务只有几毫秒，
+# 等不到就让调用方稍后重试，不让本实例的其他线程和异步事件循环跟着阻塞
+LEDGER_BUSY_TIMEOUT = 0.05
+BUSY_RETRY_DELAY = 0.1       # 账本被锁时的重试间隔（秒）
+BUSY_FALLBACK_SECONDS = 10   # 账本连续被锁超过这么久，改为按本地速率放行（下次仍向账本申请）
+
+
+def is_transient_error(error: sqlite3.Error) -> bool:
+    """是否为暂时性错误（账本被其他实例锁住，SQLITE_BUSY / SQLITE_LOCKED），稍后即可恢复"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    name = getattr(error, 'sqlite_errorname', None)
+    if name:
+        return name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED'))
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class SharedBudgetLedger:
+    """
+    SQLite 令牌账本
+    
+    每个预算键（通常为区域的 API 端点）一行，记录剩余令牌数和上次补充时间。
+    取令牌时在 BEGIN IMMEDIATE 事务内完成"补充-判断-扣减"，多进程之间天然互斥。
+    账本只有一个公共令牌池：空闲实例不取令牌，忙碌实例就能用满整机预算。
+    """
+    
+    def __init__(self, db_file: str, key: str, rate_per_minute: float, burst: int = DEFAULT_BURST):
+        """
+        初始化账本
+        
+        Args:
+            db_file: SQLite 数据库文件
+            key: 预算键（API 端点）
+            rate_per_minute: 整机每分钟请求数
+            burst: 整机允许的最大突发请求数
+        """
+        if rate_per_minute <= 0:
+            raise ValueError(f"rate_per_minute 必须大于0: {rate_per_minute}")
+        
+        self.db_file = db_file
+        self.key = key
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = float(max(1, int(burst)))
+        
+        self._conn = sqlite3.connect(db_file, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS budget ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, '
+            'rate_per_minute REAL NOT NULL, capacity REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS usage ('
+            'key TEXT NOT NULL, holder TEXT NOT NULL, acquired INTEGER NOT NULL, '
+            'last_seen REAL NOT NULL, PRIMARY KEY (key, holder))'
+        )
+        
+        # 以最后启动的实例的配置为准（各实例应使用相同的整机预算）
+        self._conn.execute(
+            'INSERT INTO budget (key, tokens, updated_at, rate_per_minute, capacity) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET rate_per_minute = excluded.rate_per_minute, '
+            'capacity = excluded.capacity',
+            (key, self.capacity, time.time(), self.rate_per_minute, self.capacity)
+        )
+        
+        # 建表完成后缩短忙等待，取令牌时账本被锁立即返回 SQLITE_BUSY
+        self._conn.execute(f'PRAGMA busy_timeout = {int(LEDGER_BUSY_TIMEOUT * 1000)}')
+        self._lock = threading.Lock()  # 同一连接上的事务不能在多个线程间交错
+    
+    def try_consume(self, cost: float, holder: str) -> float:
+        """
+        尝试从公共令牌池扣减 cost 个令牌
+        
+        Args:
+            cost: 消耗的令牌数
+            holder: 取令牌的实例标识（用于统计）
+        
+        Returns:
+            0 表示已扣减；否则为还需等待的秒数
+        """
+        with self._lock:
+            return self._try_consume(cost, holder)
+    
+    def _try_consume(self, cost: float, holder: str) -> float:
+        """在账本事务内完成"补充-判断-扣减"（调用方持有 self._lock）"""
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            tokens, updated_at, rate, capacity = conn.execute(
+                'SELECT tokens, updated_at, rate_per_minute, capacity FROM budget WHERE key = ?',
+                (self.key,)
+            ).fetchone()
+            
+            now = time.time()
+            tokens = min(max(capacity, cost), tokens + max(0.0, now - updated_at) * rate / 60.0)
+            
+            if tokens >= cost:
+                conn.execute('UPDATE budget SET tokens = ?, updated_at = ? WHERE key = ?',
+                             (tokens - cost, now, self.key))
+                conn.execute(
+                    'INSERT INTO usage (key, holder, acquired, last_seen) VALUES (?, ?, 1, ?) '
+                    'ON CONFLICT(key, holder) DO UPDATE SET acquired = acquired + 1, last_seen = excluded.last_seen',
+                    (self.key, holder, now)
+                )
+                wait = 0.0
+            else:
+                conn.execute('UPDATE budget SET tokens = ?, updated_at = ? WHERE key = ?',
+                             (tokens, now, self.key))
+                wait = (cost - tokens) * 60.0 / rate
+            
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+    
+    def get_stats(self) -> dict:
+        """获取账本状态（整机预算、剩余令牌、活跃实例）"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT tokens, updated_at, rate_per_minute, capacity FROM budget WHERE key = ?',
+                (self.key,)
+            ).fetchone()
+            holders = self._conn.execute(
+                'SELECT holder, acquired FROM usage WHERE key = ? AND last_seen >= ? ORDER BY holder',
+                (self.key, time.time() - ACTIVE_WINDOW_SECONDS)
+            ).fetchall()
+        tokens, updated_at, rate, capacity = row
+        tokens = min(capacity, tokens + max(0.0, time.time() - updated_at) * rate / 60.0)
+        
+        return {
+            'key': self.key,
+            'db_file': self.db_file,
+            'rate_per_minute': rate,
+            'tokens': round(tokens, 3),
+            'active_instances': {holder: acquired for holder, acquired in holders}
+        }
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    受整机预算约束的令牌桶
+    
+    本地令牌桶仍然控制本实例的速率（AIMD 控制器调整的也是它），
+    每次请求还必须同时从共享账本取到令牌才放行。
+    本地令牌在锁内预留，向账本申请在锁外进行，账本未放行时退回，不会白白浪费。
+    账本被其他实例锁住时稍后重试，连续被锁超过 BUSY_FALLBACK_SECONDS 时按本地速率放行，下次仍向账本申请；
+    账本不可用时（数据库损坏、磁盘只读等）退化为只按本地速率限速。
+    """
+    
+    def __init__(self, rate_per_minute: float, ledger: SharedBudgetLedger,
+                 burst: int = DEFAULT_BURST, jitter: float = DEFAULT_JITTER, name: str = 'default'):
+        """
+        初始化限速器
+        
+        Args:
+            rate_per_minute: 本实例每分钟请求数上限
+            ledger: 共享令牌账本
+            burst: 桶容量
+            jitter: 间隔随机浮动比例
+            name: 名称（用于日志）
+        """
+        super().__init__(rate_per_minute, burst=burst, jitter=jitter, name=name)
+        self.ledger = ledger
+        self.holder = f"{name}:{os.getpid()}"
+        self.shared_waits = 0
+        self.ledger_busy = 0  # 账本被锁的次数
+        self._busy_since: Optional[float] = None  # 本次连续被锁的开始时间
+        self._ledger_failed = False
+    
+    def try_acquire(self) -> float:
+        """
+        尝试获取一个请求许可（先预留本地令牌，再向共享账本申请）
+        
+        账本在 self._lock 之外申请，账本慢或被锁时本实例的其他线程仍可以查询本地令牌
+        
+        Returns:
+            0 表示已获取；否则为还需等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            
+            cost = self._next_cost
+            if self._tokens < cost:
+                return (cost - self._tokens) * 60.0 / self._rate_per_minute
+            
+            self._tokens -= cost
+            self._next_cost = self._draw_cost()
+            use_ledger = not self._ledger_failed
+        
+        wait = self._consume_shared(cost) if use_ledger else 0.0
+        
+        with self._lock:
+            if wait > 0:
+                # 账本未放行，退回预留的本地令牌
+                self._tokens = min(self.burst + self.jitter, self._tokens + cost)
+            else:
+                self.total_acquired += 1
+        return wait
+    
+    def _consume_shared(self, cost: float) -> float:
+        """
+        向共享账本申请 cost 个令牌
+        
+        Returns:
+            0 表示放行；否则为还需等待的秒数
+        """
+        try:
+            wait = self.ledger.try_consume(cost, self.holder)
+        except sqlite3.Error as e:
+            if not is_transient_error(e):
+                logger.warning(f"⚠️  共享预算账本不可用，改为仅按本实例速率限速: {e}")
+                self._ledger_failed = True
+                return 0.0
+            
+            now = time.monotonic()
+            self.ledger_busy += 1
+            if self._busy_since is None:
+                self._busy_since = now
+                logger.warning(f"⚠️  共享预算账本被锁，稍后重试: {e}")
+            if now - self._busy_since < BUSY_FALLBACK_SECONDS:
+                return BUSY_RETRY_DELAY * random.uniform(0.5, 1.5)
+            # 长时间被锁（例如其他实例卡住）：本次按本地速率放行，账本保持启用
+            return 0.0
+        
+        self._busy_since = None
+        if wait > 0:
+            # 等待时间随机错开，避免多个实例同时醒来抢同一个令牌
+            self.shared_waits += 1
+            return wait + random.uniform(0, 30.0 / self.ledger.rate_per_minute)
+        return 0.0
+    
+    def get_stats(self) -> dict:
+        """获取限速器状态（含共享账本状态）"""
+        stats = super().get_stats()
+        stats['shared_waits'] = self.shared_waits
+        stats['ledger_busy'] = self.ledger_busy
+        if not self._ledger_failed:
+            try:
+                stats['shared'] = self.ledger.get_stats()
+            except sqlite3.Error as e:
+                stats['shared'] = {'error': str(e)}
+        return stats
+
+
+def create_shared_rate_limiter(config: dict, budget_key: str, name: str = 'default') -> Optional[SharedTokenBucket]:
+    """
+    根据配置创建受整机预算约束的限速器
+    
+    读取 rate_limit.shared_budget 段；未启用时返回 None
+    
+    Args:
+        config: 配置字典
+        budget_key: 预算键（通常为区域的 API 端点，同一端点的实例共享预算）
+        name: 名称（用于日志）
+    """
+    rate_config = config.get('rate_limit', {}) or {}
+    shared_config = rate_config.get('shared_budget') or {}
+    if not shared_config.get('enabled', False):
+        return None
+    
+    local = TokenBucket.from_config(config, name=name)
+    
+    try:
+        ledger = SharedBudgetLedger(
+            db_file=shared_config.get('db_file', DEFAULT_SHARED_DB_FILE),
+            key=budget_key,
+            rate_per_minute=shared_config.get('requests_per_minute', DEFAULT_SHARED_REQUESTS_PER_MINUTE),
+            burst=shared_config.get('burst', DEFAULT_BURST)
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️  无法打开共享预算账本，改为仅按本实例速率限速: {e}")
+        return None
+    
+    logger.info(f"整机共享预算: {ledger.rate_per_minute:.1f} 次/分钟 [{budget_key}] ({ledger.db_file})")
+    
+    return SharedTokenBucket(
+        local.rate_per_minute,
+        ledger,
+        burst=local.burst,
+        jitter=local.jitter,
+        name=name
+    )
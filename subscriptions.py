@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多人订阅合并模块
+多位同事各自关注的"型号-门店"组合大量重叠时，不必每人运行一个监控进程：
+由一个监控器按所有订阅的并集查询，每个不同的组合只查询一次、共用同一份请求预算，
+结果再按订阅分发给各自的通知器。请求量随不同组合的数量增长，而不是随人数增长
+
+配置示例（config.json）：
+    "subscriptions": {
+        "enabled": true,
+        "subscribers": [
+            {"name": "alice", "config_file": "config_alice.json"},
+            {"name": "bob", "target_products": [...], "target_stores": ["R484", "R577"],
+             "enable_sound": false}
+        ]
+    }
+
+每个订阅可以引用已有的配置文件，也可以直接写 target_products / target_stores；
+商品可以带 stores 字段只关注部分门店。enable_notification / enable_sound /
+notification_types 按订阅单独设置，其余设置（限速、调度等）使用主配置
+"""
+
+import json
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from priority_scheduler import DEFAULT_PRIORITY, DEFAULT_PRIORITY_WEIGHTS
+from notifier import Notifier
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+# 可以按订阅单独设置的通知选项
+NOTIFY_KEYS = ('enable_notification', 'enable_sound', 'notification_types')
+
+
+class Subscription:
+    """一位订阅者关注的组合和通知方式"""
+    
+    def __init__(self, name: str, products: List[Dict], stores: List[str], notifier: Notifier):
+        """
+        初始化订阅
+        
+        Args:
+            name: 订阅者名称
+            products: 关注的商品（可带 stores 字段只关注部分门店）
+            stores: 关注的门店编号
+            notifier: 该订阅者的通知器
+        """
+        self.name = name
+        self.products = {product['part_number']: product for product in products if product.get('part_number')}
+        self.stores = list(stores)
+        self.notifier = notifier
+        
+        self.wanted: Dict[str, Set[str]] = {}
+        for part_number, product in self.products.items():
+            only = product.get('stores')
+            self.wanted[part_number] = {store for store in self.stores if not only or store in only}
+        
+        self.notified = 0
+    
+    @property
+    def pairs(self) -> Set[Tuple[str, str]]:
+        """关注的 (型号, 门店) 组合"""
+        return {(part_number, store) for part_number, stores in self.wanted.items() for store in stores}
+
+
+class SubscriptionHub:
+    """
+    订阅合并器
+    
+    merged_targets() 给出所有订阅的并集（商品带 stores 字段，监控器只查询有人关注的组合），
+    fan_out() 把一个型号的结果按各订阅关注的门店过滤后分别通知
+    """
+    
+    def __init__(self, notifier_factory: Callable[[dict], Notifier] = Notifier):
+        """
+        初始化合并器
+        
+        Args:
+            notifier_factory: 根据通知配置创建通知器的函数
+        """
+        self.notifier_factory = notifier_factory
+        self.subscriptions: Dict[str, Subscription] = {}
+        # 配置热加载在监视线程中替换订阅，分发在监控线程中进行
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: dict) -> Optional['SubscriptionHub']:
+        """
+        根据配置文件的 subscriptions 段创建合并器
+        
+        subscriptions.enabled 为 false 时返回 None
+        """
+        if not (config.get('subscriptions', {}) or {}).get('enabled', False):
+            return None
+        
+        hub = cls()
+        hub.load(config)
+        return hub
+    
+    def _load_entry(self, entry: dict, config: dict) -> Optional[Subscription]:
+        """根据一条订阅配置创建订阅（引用的配置文件读取失败时返回 None）"""
+        name = entry.get('name') or entry.get('config_file') or f"订阅{len(self.subscriptions) + 1}"
+        source = entry
+        if entry.get('config_file'):
+            try:
+                with open(entry['config_file'], 'r', encoding='utf-8') as f:
+                    source = dict(json.load(f), **entry)
+            except Exception as e:
+                logger.warning(f"读取订阅 {name} 的配置文件失败: {e}，跳过该订阅")
+                return None
+        
+        notify_config = dict(config)
+        notify_config.update({key: source[key] for key in NOTIFY_KEYS if key in source})
+        return Subscription(name, source.get('target_products', []), source.get('target_stores', []),
+                            self.notifier_factory(notify_config))
+    
+    def load(self, config: dict):
+        """按配置重新加载全部订阅（可在运行中调用）"""
+        subscriptions = {}
+        for entry in (config.get('subscriptions', {}) or {}).get('subscribers', []):
+            subscription = self._load_entry(entry, config)
+            if subscription is not None:
+                subscriptions[subscription.name] = subscription
+        
+        with self._lock:
+            self.subscriptions = subscriptions
+        self._log_plan()
+    
+    def register(self, subscription: Subscription):
+        """加入（或替换同名的）订阅"""
+        with self._lock:
+            self.subscriptions[subscription.name] = subscription
+    
+    def unregister(self, name: str):
+        """移除订阅"""
+        with self._lock:
+            self.subscriptions.pop(name, None)
+    
+    def merged_targets(self) -> Tuple[List[Dict], List[str]]:
+        """
+        所有订阅的并集
+        
+        同一型号只保留一份商品配置：优先级取各订阅中最高的，
+        stores 字段为关注该型号的门店并集（只查询有人关注的组合）
+        
+        Returns:
+            (商品列表, 门店编号列表)
+        """
+        with self._lock:
+            subscriptions = list(self.subscriptions.values())
+        
+        stores: Dict[str, None] = {}
+        products: Dict[str, Dict] = {}
+        wanted: Dict[str, Set[str]] = {}
+        for subscription in subscriptions:
+            stores.update(dict.fromkeys(subscription.stores))
+            for part_number, product in subscription.products.items():
+                wanted.setdefault(part_number, set()).update(subscription.wanted[part_number])
+                merged = products.get(part_number)
+                if merged is None:
+                    products[part_number] = dict(product)
+                elif self._priority_weight(product) > self._priority_weight(merged):
+                    merged['priority'] = product.get('priority')
+        
+        for part_number, product in products.items():
+            product['stores'] = [store for store in stores if store in wanted[part_number]]
+        return [product for product in products.values() if product['stores']], list(stores)
+    
+    @staticmethod
+    def _priority_weight(product: Dict) -> float:
+        """商品优先级对应的默认权重"""
+        priority = product.get('priority', DEFAULT_PRIORITY)
+        return DEFAULT_PRIORITY_WEIGHTS.get(priority, DEFAULT_PRIORITY_WEIGHTS[DEFAULT_PRIORITY])
+    
+    def apply_to_config(self, config: dict):
+        """用订阅的并集替换配置中的 target_products / target_stores"""
+        config['target_products'], config['target_stores'] = self.merged_targets()
+        config['all_stores'] = False
+    
+    def fan_out(self, data: Dict) -> int:
+        """
+        把一个型号的结果分发给关注它的订阅
+        
+        Args:
+            data: 单个产品的结果字典（格式与 check_multiple_products 的单个产品相同）
+        
+        Returns:
+            发出的通知数
+        """
+        result = data.get('result', {})
+        if not result.get('success'):
+            return 0
+        available_stores = result.get('available_stores') or []
+        if not available_stores:
+            return 0
+        
+        with self._lock:
+            subscriptions = list(self.subscriptions.values())
+        
+        part_number = data.get('part_number') or result.get('part_number')
+        sent = 0
+        for subscription in subscriptions:
+            wanted = subscription.wanted.get(part_number)
+            if not wanted:
+                continue
+            hits = [store for store in available_stores if store.get('store_number') in wanted]
+            if not hits:
+                continue
+            
+            product = subscription.products[part_number]
+            if len(hits) == 1:
+                subscription.notifier.notify_stock_available(product, hits[0])
+            else:
+                subscription.notifier.notify_multiple_stores_available(product, hits)
+            subscription.notified += 1
+            sent += 1
+            logger.info(f"🎉 [{subscription.name}] {product.get('name')} 在 {len(hits)} 个门店有货！")
+        return sent
+    
+    def get_stats(self) -> Dict:
+        """订阅数、各订阅组合数之和、去重后的组合数"""
+        with self._lock:
+            subscriptions = list(self.subscriptions.values())
+        
+        distinct: Set[Tuple[str, str]] = set()
+        requested = 0
+        for subscription in subscriptions:
+            pairs = subscription.pairs
+            requested += len(pairs)
+            distinct |= pairs
+        return {
+            'subscriptions': len(subscriptions),
+            'requested_pairs': requested,
+            'distinct_pairs': len(distinct)
+        }
+    
+    def _log_plan(self):
+        """输出合并效果"""
+        stats = self.get_stats()
+        saved = 1 - stats['distinct_pairs'] / stats['requested_pairs'] if stats['requested_pairs'] else 0
+        logger.info(f"👥 订阅合并: {stats['subscriptions']} 个订阅共关注 {stats['requested_pairs']} 个组合，"
+                    f"去重后查询 {stats['distinct_pairs']} 个（减少 {saved:.0%} 的请求）")
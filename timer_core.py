@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+定时等待核心模块
+监控循环、限速器和连续模式调度都通过同一个 WakeupEvent 等待：
+一直睡到下一个请求到期，或者收到停止信号、配置变更、新任务加入时立即醒来，
+不再每 0.1 秒轮询一次停止标志
+
+WakeupEvent 与 threading.Event 接口兼容（set / is_set / clear / wait），
+可以直接作为 stop_event 传给监控器和限速器
+"""
+
+import time
+import asyncio
+import threading
+from typing import List, Optional, Tuple
+
+# sleep() 的返回值
+WAKE_STOP = 'stop'        # 收到停止信号
+WAKE_NOTIFY = 'notify'    # 被 notify() 唤醒（配置变更、新任务加入）
+WAKE_TIMEOUT = 'timeout'  # 到期
+
+
+class WakeupEvent:
+    """
+    可唤醒的停止事件
+    
+    set() 表示停止，所有等待立即返回且之后不再等待；
+    notify() 只唤醒当前的等待者（例如配置已重新加载、调度队列有了更早到期的任务），
+    被唤醒的一方重新计算下一次到期时间后继续等待
+    """
+    
+    def __init__(self):
+        # 使用可重入锁：信号处理函数可能在持有锁的同一线程中调用 set()
+        self._cond = threading.Condition(threading.RLock())
+        self._flag = False
+        self._generation = 0
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+    
+    def is_set(self) -> bool:
+        """是否已收到停止信号"""
+        return self._flag
+    
+    def set(self):
+        """发出停止信号，唤醒所有等待者"""
+        with self._cond:
+            self._flag = True
+            self._wake_all()
+    
+    def clear(self):
+        """清除停止信号"""
+        with self._cond:
+            self._flag = False
+    
+    def notify(self):
+        """唤醒当前所有等待者（不停止）"""
+        with self._cond:
+            self._wake_all()
+    
+    def _wake_all(self):
+        """唤醒同步和异步等待者（调用方持有锁）"""
+        self._generation += 1
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+    
+    def sleep(self, seconds: Optional[float]) -> str:
+        """
+        等待指定秒数，期间收到停止信号或被唤醒时立即返回
+        
+        Args:
+            seconds: 等待秒数，None表示一直等到被唤醒
+        
+        Returns:
+            WAKE_STOP / WAKE_NOTIFY / WAKE_TIMEOUT
+        """
+        deadline = None if seconds is None else time.monotonic() + max(0.0, seconds)
+        with self._cond:
+            generation = self._generation
+            while not self._flag and self._generation == generation:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return WAKE_TIMEOUT
+                self._cond.wait(remaining)
+            
+            return WAKE_STOP if self._flag else WAKE_NOTIFY
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        与 threading.Event.wait 相同：等待停止信号，返回是否已停止
+        
+        被 notify() 唤醒时也会提前返回（返回 False），调用方重新计算等待时间即可
+        """
+        self.sleep(timeout)
+        return self._flag
+    
+    async def sleep_async(self, seconds: Optional[float]) -> str:
+        """sleep() 的异步版本（不阻塞事件循环）"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            if self._flag:
+                return WAKE_STOP
+            self._async_waiters.append((loop, future))
+        
+        try:
+            await asyncio.wait_for(future, seconds)
+        except asyncio.TimeoutError:
+            with self._cond:
+                if (loop, future) in self._async_waiters:
+                    self._async_waiters.remove((loop, future))
+            return WAKE_STOP if self._flag else WAKE_TIMEOUT
+        
+        return WAKE_STOP if self._flag else WAKE_NOTIFY
+
+
+def _resolve(future: asyncio.Future):
+    """在事件循环线程中完成等待中的 future"""
+    if not future.done():
+        future.set_result(None)
+
+
+def wait_for_stop(stop_event, seconds: float) -> bool:
+    """
+    等待指定秒数或停止信号（兼容 threading.Event 和 WakeupEvent）
+    
+    Returns:
+        是否已收到停止信号
+    """
+    if stop_event is None:
+        time.sleep(seconds)
+        return False
+    return stop_event.wait(seconds)
+
+
+async def wait_for_stop_async(stop_event, seconds: float) -> bool:
+    """
+    异步等待指定秒数或停止信号
+    
+    WakeupEvent 收到信号时立即返回；普通 threading.Event 只能分段检查（每 0.5 秒一次）
+    
+    Returns:
+        是否已收到停止信号
+    """
+    if stop_event is None:
+        await asyncio.sleep(seconds)
+        return False
+    
+    if hasattr(stop_event, 'sleep_async'):
+        return await stop_event.sleep_async(seconds) == WAKE_STOP
+    
+    deadline = time.monotonic() + seconds
+    while not stop_event.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(remaining, 0.5))
+    return True
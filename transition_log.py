@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+库存状态变化日志模块
+原先每轮把每个型号的完整结果（所有门店、请求门店列表、时间戳）追加到 stock_history，
+内存和导出文件随轮数增长，每个型号也只能保留最近 100 轮。
+这里只在某个"型号-门店"的库存状态真正变化时追加一条记录：
+    (时间, 区域, 型号, 门店, 原状态 → 新状态, 取货提示)
+另外用一张紧凑的当前状态表保存每个组合的最新状态，
+保留时长按天计算，占用只与变化次数有关，与轮数无关
+"""
+
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_RETENTION_DAYS = 7.0      # 变化记录保留天数
+DEFAULT_MAX_TRANSITIONS = 100000  # 变化记录条数上限（超过时丢弃最旧的记录）
+LOG_FORMAT = 'transitions-v1'     # 导出文件格式标识
+
+# 一条变化记录: (时间, 区域, 型号, 门店, 原状态, 新状态, 取货提示)，首次观测时原状态为 None
+Transition = Tuple[str, str, str, str, Optional[str], str, str]
+
+
+def is_available_state(state: Optional[str]) -> bool:
+    """状态（pickupDisplay）是否表示有货"""
+    return state == 'available'
+
+
+class TransitionLog:
+    """
+    库存状态变化日志
+    
+    current 为 {(型号, 门店): [状态, 取货提示, 状态开始时间, 最近观测时间]}，
+    transitions 为按时间追加的变化记录
+    """
+    
+    def __init__(self, region: str, retention_days: float = DEFAULT_RETENTION_DAYS,
+                 max_transitions: int = DEFAULT_MAX_TRANSITIONS):
+        """
+        初始化变化日志
+        
+        Args:
+            region: 区域代码
+            retention_days: 变化记录保留天数
+            max_transitions: 变化记录条数上限
+        """
+        self.region = region
+        self.retention = timedelta(days=max(0.01, float(retention_days)))
+        self.max_transitions = max(1, int(max_transitions))
+        
+        self.current: Dict[Tuple[str, str], List] = {}
+        self.transitions: Deque[Transition] = deque()
+        self.observations = 0
+        self._touched: Dict[Tuple[str, str], None] = {}  # 上次 drain_touched() 之后观测到的组合
+    
+    @classmethod
+    def from_config(cls, config: dict, region: str) -> 'TransitionLog':
+        """根据配置文件的 history 段创建变化日志"""
+        history_config = config.get('history', {}) or {}
+        return cls(
+            region=region,
+            retention_days=history_config.get('retention_days', DEFAULT_RETENTION_DAYS),
+            max_transitions=history_config.get('max_transitions', DEFAULT_MAX_TRANSITIONS)
+        )
+    
+    def record(self, part_number: str, result, when: Optional[datetime] = None) -> List[Transition]:
+        """
+        记录一个型号的查询结果，返回本次产生的变化记录
+        
+        失败的结果和没有响应的门店不记录（状态未知，不算变化）
+        
+        Args:
+            part_number: 商品型号编号
+            result: 查询结果（ProductStock 或同结构的字典）
+            when: 观测时间，默认为当前时间
+        """
+        if not result.get('success', False):
+            return []
+        
+        timestamp = (when or datetime.now()).isoformat(timespec='seconds')
+        stores = result.get('stores') or {}
+        changes = []
+        for store_number, stock in stores.items():
+            state = stock.get('pickup_display') or ('available' if stock.get('available') else 'unavailable')
+            quote = stock.get('pickup_quote', '') or ''
+            self.observations += 1
+            
+            key = (part_number, store_number)
+            self._touched[key] = None
+            entry = self.current.get(key)
+            if entry is not None and entry[0] == state:
+                entry[1] = quote
+                entry[3] = timestamp
+                continue
+            
+            old_state = entry[0] if entry is not None else None
+            self.current[key] = [state, quote, timestamp, timestamp]
+            transition = (timestamp, self.region, part_number, store_number, old_state, state, quote)
+            self.transitions.append(transition)
+            changes.append(transition)
+        
+        if changes:
+            self._prune()
+        return changes
+    
+    def _prune(self):
+        """丢弃超过保留时长或超出条数上限的最旧记录"""
+        cutoff = (datetime.now() - self.retention).isoformat(timespec='seconds')
+        while self.transitions and (len(self.transitions) > self.max_transitions
+                                    or self.transitions[0][0] < cutoff):
+            self.transitions.popleft()
+    
+    def iter_transitions(self, part_number: Optional[str] = None, store_number: Optional[str] = None,
+                         since: Optional[str] = None) -> Iterator[Transition]:
+        """
+        按条件遍历变化记录
+        
+        Args:
+            part_number: 只看该型号
+            store_number: 只看该门店
+            since: 只看该时间（ISO 格式）之后的记录
+        """
+        for transition in self.transitions:
+            if part_number and transition[2] != part_number:
+                continue
+            if store_number and transition[3] != store_number:
+                continue
+            if since and transition[0] < since:
+                continue
+            yield transition
+    
+    def drain_touched(self) -> List[Tuple]:
+        """
+        取出上次调用之后观测到的组合的当前状态（供持久化存储批量写入）
+        
+        Returns:
+            [(区域, 型号, 门店, 状态, 取货提示, 状态开始时间, 最近观测时间)]
+        """
+        touched, self._touched = self._touched, {}
+        return [(self.region, part_number, store_number, *self.current[(part_number, store_number)])
+                for part_number, store_number in touched]
+    
+    def available_now(self) -> List[Tuple[str, str]]:
+        """当前有货的 (型号, 门店) 列表"""
+        return [key for key, entry in self.current.items() if is_available_state(entry[0])]
+    
+    def __len__(self) -> int:
+        return len(self.transitions)
+    
+    def current_to_dict(self) -> Dict[str, Dict[str, List]]:
+        """当前状态表导出为 {型号: {门店: [状态, 取货提示, 状态开始时间, 最近观测时间]}}"""
+        current: Dict[str, Dict[str, List]] = {}
+        for (part_number, store_number), entry in self.current.items():
+            current.setdefault(part_number, {})[store_number] = list(entry)
+        return current
+    
+    def load_current(self, current: Dict[str, Dict[str, List]]):
+        """合并 current_to_dict() 格式的当前状态表"""
+        self.current.update({
+            (part_number, store_number): list(entry)
+            for part_number, stores in (current or {}).items()
+            for store_number, entry in stores.items()
+        })
+    
+    def to_dict(self) -> Dict:
+        """导出为可 JSON 序列化的字典"""
+        return {
+            'format': LOG_FORMAT,
+            'region': self.region,
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'observations': self.observations,
+            'current': self.current_to_dict(),
+            'transitions': [list(transition) for transition in self.transitions]
+        }
+    
+    def load_dict(self, data: Dict):
+        """从 to_dict() 的结果恢复（用于续接之前导出的日志）"""
+        if data.get('format') != LOG_FORMAT:
+            raise ValueError(f"不支持的历史记录格式: {data.get('format')}")
+        
+        self.current = {}
+        self.load_current(data.get('current'))
+        self.transitions = deque(tuple(transition) for transition in data.get('transitions') or [])
+        self.observations = int(data.get('observations', 0))
+        self._prune()
+    
+    def get_stats(self) -> Dict:
+        """获取日志统计"""
+        return {
+            'pairs': len(self.current),
+            'transitions': len(self.transitions),
+            'observations': self.observations,
+            'available': len(self.available_now())
+        }
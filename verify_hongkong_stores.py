@@ -8,12 +8,15 @@
 
 import requests
 import json
-import time
 from datetime import datetime
 from colorama import init, Fore, Style
+from rate_limiter import TokenBucket
 
 init(autoreset=True)
 
+# 验证/扫描请求频率（次/分钟），与原先3秒间隔一致
+VERIFY_REQUESTS_PER_MINUTE = 20
+
 
 def test_store_api(store_number, region='HK'):
     """
@@ -159,12 +162,14 @@ def verify_hongkong_stores():
     valid_stores = []
     invalid_stores = []
     
-    print(f"{Fore.CYAN}开始验证（请稍候，每次测试间隔3秒以避免限制）...{Style.RESET_ALL}\n")
+    rate_limiter = TokenBucket(VERIFY_REQUESTS_PER_MINUTE, name='HK-verify')
+    print(f"{Fore.CYAN}开始验证（请稍候，每分钟最多{VERIFY_REQUESTS_PER_MINUTE}次请求以避免限制）...{Style.RESET_ALL}\n")
     
     for i, store in enumerate(stores, 1):
         store_number = store.get('storeNumber', 'N/A')
         store_name = store.get('storeName', 'Unknown')
         
+        rate_limiter.acquire()
         print(f"[{i}/{len(stores)}] {store_name} ({store_number})")
         
         result = test_store_api(store_number, region='HK')
@@ -185,10 +190,6 @@ def verify_hongkong_stores():
                 'error': result.get('error', 'Unknown'),
                 'verified': False
             })
-        
-        # 延迟避免限制
-        if i < len(stores):
-            time.sleep(3)
     
     # 打印结果
     print(f"\n{Fore.CYAN}{'='*70}")
@@ -284,9 +285,11 @@ def search_real_hongkong_stores():
     
     valid_stores = []
     test_range = list(range(400, 700))
+    rate_limiter = TokenBucket(VERIFY_REQUESTS_PER_MINUTE, name='HK-scan')
     
     for i, num in enumerate(test_range):
         store_number = f"R{num}"
+        rate_limiter.acquire()
         
         if (i + 1) % 10 == 0:
             print(f"\n已扫描 {i+1}/{len(test_range)} 个编号...\n")
@@ -296,14 +299,6 @@ def search_real_hongkong_stores():
         if result['valid']:
             valid_stores.append(result)
             print(f"  {Fore.GREEN}发现有效门店！{Style.RESET_ALL}")
-        
-        # 延迟避免限制
-        time.sleep(2)
-        
-        # 每扫描20个休息10秒
-        if (i + 1) % 20 == 0:
-            print(f"\n💤 休息10秒避免限制...\n")
-            time.sleep(10)
     
     print(f"\n{Fore.GREEN}✅ 发现 {len(valid_stores)} 个有效的香港门店{Style.RESET_ALL}\n")
     